@@ -0,0 +1,239 @@
+"""
+Análise de risco da carteira de crédito (painel do gerente).
+
+Saldos e limites dos clientes, o valor em aberto das faturas e o histórico de
+solicitações são lidos em poucas consultas e carregados em arrays NumPy
+alinhados pelo id do cliente; utilização, exposição e faixa de risco saem de
+uma única passada vetorizada sobre a carteira inteira. O relatório fica em
+cache por ANALISE_CARTEIRA_TTL segundos.
+"""
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from faturas.models import Fatura
+from usuarios.models import Cliente
+from .models import SolicitacaoCredito
+
+CHAVE_CACHE = 'credito:analise_carteira'
+
+# Comprometimento da renda (%) até o qual o risco é baixo / médio, o mesmo
+# critério exibido em avaliar_solicitacoes
+LIMITES_COMPROMETIMENTO = (30, 60)
+
+# Utilização do limite acima da qual o risco é médio / alto
+LIMITES_UTILIZACAO = (0.6, 0.9)
+
+# Parcela do limite ainda não utilizado considerada exposição (fator de
+# conversão de crédito): o cliente pode usá-la a qualquer momento
+FATOR_CONVERSAO = 0.5
+
+FAIXAS = [
+    ('alto', 'Risco alto'),
+    ('medio', 'Risco médio'),
+    ('baixo', 'Risco baixo'),
+    ('sem_exposicao', 'Sem exposição'),
+]
+
+FAIXAS_UTILIZACAO = [0, 0.25, 0.5, 0.75, 0.9, 1.0]
+
+STATUS_FATURA_QUITADA = ['paga', 'cancelada']
+
+
+def classificar_comprometimento(percentuais):
+    """Nível de risco ('baixo', 'medio', 'alto') de cada comprometimento de renda (%)"""
+    percentuais = np.asarray(percentuais, dtype=float)
+    baixo, medio = LIMITES_COMPROMETIMENTO
+    return np.select([percentuais <= baixo, percentuais <= medio], ['baixo', 'medio'], 'alto')
+
+
+def _colunas(linhas, quantidade):
+    """Transpõe as tuplas de values_list em listas (vazias quando não há linhas)"""
+    return list(zip(*linhas)) if linhas else [()] * quantidade
+
+
+def _alinhar(ids, clientes):
+    """
+    Posição de cada cliente_id em `ids` e a máscara dos que estão lá.
+
+    As três consultas não leem o mesmo snapshot (uma transação pegaria a trava
+    de escrita do SQLite, ver DATABASES em settings): faturas e solicitações
+    de um cliente criado depois da leitura dos clientes ficam de fora, em vez
+    de caírem na posição de outro cliente.
+    """
+    clientes = np.array(clientes, dtype=np.int64)
+    posicao = np.searchsorted(ids, clientes)
+    encontrado = posicao < len(ids)
+    encontrado[encontrado] = ids[posicao[encontrado]] == clientes[encontrado]
+    return posicao[encontrado], encontrado
+
+
+def carregar_carteira(hoje=None):
+    """
+    Arrays da carteira, uma posição por cliente (ordenados por id).
+
+    Três consultas: clientes, faturas em aberto e solicitações de crédito.
+    """
+    hoje = hoje or timezone.localdate()
+    ids, saldos, limites, aprovados = _colunas(
+        list(Cliente.objects.order_by('pk').values_list('pk', 'saldo', 'limite_credito', 'limite_credito_aprovado')),
+        4,
+    )
+    ids = np.array(ids, dtype=np.int64)
+    quantidade = len(ids)
+    carteira = {
+        'ids': ids,
+        'saldo': np.array(saldos, dtype=float),
+        'limite': np.where(np.array(aprovados, dtype=bool), np.array(limites, dtype=float), 0.0),
+    }
+
+    # Faturas em aberto: valor restante por cliente e quanto dele já venceu
+    clientes, totais, pagos, vencimentos, status = _colunas(
+        list(
+            Fatura.objects.exclude(status__in=STATUS_FATURA_QUITADA)
+            .values_list('cliente_id', 'valor_total', 'valor_pago', 'data_vencimento', 'status')
+        ),
+        5,
+    )
+    posicao, encontrado = _alinhar(ids, clientes)
+    restante = np.maximum(np.array(totais, dtype=float) - np.array(pagos, dtype=float), 0.0)[encontrado]
+    vencida = (
+        (np.array(vencimentos, dtype='datetime64[D]') < np.datetime64(hoje))
+        | (np.array(status, dtype=str) == 'vencida')
+    )[encontrado]
+    carteira['utilizado'] = np.bincount(posicao, weights=restante, minlength=quantidade)
+    carteira['atraso'] = np.bincount(posicao, weights=restante * vencida, minlength=quantidade)
+
+    # Solicitações em ordem cronológica por cliente; a renda considerada é a da mais recente
+    clientes, status, valores, rendas = _colunas(
+        list(
+            SolicitacaoCredito.objects.order_by('cliente_id', 'data_solicitacao', 'pk')
+            .values_list('cliente_id', 'status', 'valor_solicitado', 'renda_mensal')
+        ),
+        4,
+    )
+    posicao, encontrado = _alinhar(ids, clientes)
+    status = np.array(status, dtype=str)[encontrado]
+    carteira['pendente'] = np.bincount(
+        posicao, weights=np.array(valores, dtype=float)[encontrado] * (status == 'pendente'), minlength=quantidade
+    )
+    carteira['reprovacoes'] = np.bincount(posicao, weights=status == 'reprovada', minlength=quantidade)
+    carteira['renda'] = np.zeros(quantidade)
+    if len(posicao):
+        _, ultima = np.unique(posicao[::-1], return_index=True)
+        ultima = len(posicao) - 1 - ultima
+        carteira['renda'][posicao[ultima]] = np.array(rendas, dtype=float)[encontrado][ultima]
+    return carteira
+
+
+def analisar(carteira):
+    """Utilização, exposição e faixa de risco de cada cliente, em uma passada"""
+    limite, utilizado = carteira['limite'], carteira['utilizado']
+
+    # Dívida sem limite aprovado conta como limite totalmente utilizado
+    utilizacao = np.divide(utilizado, limite, out=(utilizado > 0).astype(float), where=limite > 0)
+    exposicao = utilizado + FATOR_CONVERSAO * np.maximum(limite - utilizado, 0.0)
+    comprometimento = np.divide(
+        carteira['pendente'] * 100, carteira['renda'], out=np.zeros_like(limite), where=carteira['renda'] > 0
+    )
+
+    util_media, util_alta = LIMITES_UTILIZACAO
+    comp_baixo, comp_medio = LIMITES_COMPROMETIMENTO
+    faixa = np.select(
+        [
+            (carteira['atraso'] > 0) | (utilizacao > util_alta) | (comprometimento > comp_medio),
+            (utilizacao > util_media) | (comprometimento > comp_baixo) | (carteira['reprovacoes'] >= 2),
+            (exposicao == 0) & (carteira['pendente'] == 0),
+        ],
+        ['alto', 'medio', 'sem_exposicao'],
+        'baixo',
+    )
+    return {
+        'utilizacao': utilizacao,
+        'exposicao': exposicao,
+        'comprometimento': comprometimento,
+        'faixa': faixa,
+    }
+
+
+def _maiores_exposicoes(carteira, analise, quantidade):
+    ordem = np.argsort(-analise['exposicao'], kind='stable')[:quantidade]
+    ordem = ordem[analise['exposicao'][ordem] > 0]
+    ids = carteira['ids'][ordem].tolist()
+    nomes = {
+        pk: (f'{nome} {sobrenome}'.strip(), cpf)
+        for pk, nome, sobrenome, cpf in Cliente.objects.filter(pk__in=ids)
+        .values_list('pk', 'usuario__first_name', 'usuario__last_name', 'cpf')
+    }
+    return [
+        {
+            'cliente_id': pk,
+            'nome': nomes.get(pk, ('', ''))[0],
+            'cpf': nomes.get(pk, ('', ''))[1],
+            'limite': round(float(carteira['limite'][i]), 2),
+            'utilizado': round(float(carteira['utilizado'][i]), 2),
+            'utilizacao': round(float(analise['utilizacao'][i]) * 100, 1),
+            'exposicao': round(float(analise['exposicao'][i]), 2),
+            'atraso': round(float(carteira['atraso'][i]), 2),
+            'faixa': str(analise['faixa'][i]),
+        }
+        for pk, i in zip(ids, ordem.tolist())
+    ]
+
+
+def gerar_relatorio(maiores=20):
+    """Relatório da carteira (serializável com o encoder do JsonResponse)"""
+    carteira = carregar_carteira()
+    analise = analisar(carteira)
+    limite_total = float(carteira['limite'].sum())
+    utilizado_total = float(carteira['utilizado'].sum())
+
+    faixas = []
+    for faixa, rotulo in FAIXAS:
+        selecionados = analise['faixa'] == faixa
+        faixas.append({
+            'faixa': faixa,
+            'rotulo': rotulo,
+            'clientes': int(selecionados.sum()),
+            'exposicao': round(float(analise['exposicao'][selecionados].sum()), 2),
+            'atraso': round(float(carteira['atraso'][selecionados].sum()), 2),
+        })
+
+    com_limite = carteira['limite'] > 0
+    contagem, bordas = np.histogram(
+        np.clip(analise['utilizacao'][com_limite], 0, 1), bins=FAIXAS_UTILIZACAO
+    )
+    distribuicao = [
+        {'faixa': f'{inicio:.0%}–{fim:.0%}', 'clientes': int(total)}
+        for inicio, fim, total in zip(bordas[:-1], bordas[1:], contagem)
+    ]
+
+    return {
+        'gerado_em': timezone.now(),
+        'totais': {
+            'clientes': len(carteira['ids']),
+            'clientes_com_limite': int(com_limite.sum()),
+            'limite_aprovado': round(limite_total, 2),
+            'utilizado': round(utilizado_total, 2),
+            'utilizacao_media': round(utilizado_total / limite_total * 100, 1) if limite_total else 0.0,
+            'exposicao': round(float(analise['exposicao'].sum()), 2),
+            'atraso': round(float(carteira['atraso'].sum()), 2),
+            'solicitado_pendente': round(float(carteira['pendente'].sum()), 2),
+        },
+        'faixas': faixas,
+        'distribuicao_utilizacao': distribuicao,
+        'maiores_exposicoes': _maiores_exposicoes(carteira, analise, maiores),
+    }
+
+
+def relatorio_carteira():
+    """Relatório da carteira, lido do cache quando possível"""
+    return cache.get_or_set(
+        CHAVE_CACHE, gerar_relatorio, getattr(settings, 'ANALISE_CARTEIRA_TTL', 60 * 5)
+    )
+
+
+def invalidar_relatorio():
+    cache.delete(CHAVE_CACHE)
@@ -1,3 +1,129 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from faturas.models import Fatura
+from usuarios.models import Usuario, Cliente, Gerente
+from .analise_carteira import analisar, carregar_carteira
+from .models import SolicitacaoCredito
+
+
+class AnaliseCarteiraTests(TestCase):
+    """Utilização, exposição e faixas de risco calculadas para a carteira inteira"""
+
+    @classmethod
+    def setUpTestData(cls):
+        def cliente(cpf, limite=Decimal('0.00')):
+            usuario = Usuario.objects.create_user(username=f'c{cpf}', password='x', first_name=f'Cliente {cpf[-1]}')
+            return Cliente.objects.create(
+                usuario=usuario, cpf=cpf, limite_credito=limite, limite_credito_aprovado=limite > 0
+            )
+
+        hoje = timezone.localdate()
+        cls.em_dia = cliente('10000000001', Decimal('1000.00'))
+        cls.atrasado = cliente('10000000002', Decimal('1000.00'))
+        cls.sem_credito = cliente('10000000003')
+        cls.solicitante = cliente('10000000004')
+
+        Fatura.objects.create(
+            cliente=cls.em_dia, mes_referencia=hoje.replace(day=1), data_vencimento=hoje + timedelta(days=10),
+            valor_total=Decimal('300.00'), valor_pago=Decimal('100.00'),
+        )
+        Fatura.objects.create(
+            cliente=cls.atrasado, mes_referencia=date(2020, 1, 1), data_vencimento=date(2020, 1, 10),
+            valor_total=Decimal('150.00'), status='fechada',
+        )
+        Fatura.objects.create(
+            cliente=cls.atrasado, mes_referencia=date(2020, 2, 1), data_vencimento=date(2020, 2, 10),
+            valor_total=Decimal('999.00'), valor_pago=Decimal('999.00'), status='paga',
+        )
+        for renda in (Decimal('1000.00'), Decimal('2000.00')):
+            SolicitacaoCredito.objects.create(
+                cliente=cls.solicitante, valor_solicitado=Decimal('500.00'), justificativa='Teste', renda_mensal=renda
+            )
+
+        usuario = Usuario.objects.create_user(username='gerente', password='x', tipo_usuario='gerente')
+        cls.gerente = Gerente.objects.create(usuario=usuario, codigo_gerente='G1', data_admissao=hoje)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_carteira_em_tres_consultas(self):
+        with self.assertNumQueries(3):
+            carteira = carregar_carteira()
+        analise = analisar(carteira)
+        posicao = {pk: i for i, pk in enumerate(carteira['ids'].tolist())}
+
+        em_dia = posicao[self.em_dia.pk]
+        self.assertEqual(carteira['utilizado'][em_dia], 200.0)
+        self.assertAlmostEqual(analise['utilizacao'][em_dia], 0.2)
+        self.assertEqual(analise['exposicao'][em_dia], 200.0 + 0.5 * 800.0)
+        self.assertEqual(analise['faixa'][em_dia], 'baixo')
+
+        atrasado = posicao[self.atrasado.pk]
+        self.assertEqual(carteira['atraso'][atrasado], 150.0)
+        self.assertEqual(analise['faixa'][atrasado], 'alto')
+
+        self.assertEqual(analise['faixa'][posicao[self.sem_credito.pk]], 'sem_exposicao')
+
+        # 1000 pendentes sobre a renda da solicitação mais recente (2000)
+        solicitante = posicao[self.solicitante.pk]
+        self.assertEqual(analise['comprometimento'][solicitante], 50.0)
+        self.assertEqual(analise['faixa'][solicitante], 'medio')
+
+    def test_cliente_criado_entre_as_consultas(self):
+        exclude = Fatura.objects.exclude
+
+        def cadastrar_e_excluir(*args, **kwargs):
+            # Depois da consulta de clientes e antes da de faturas
+            novo = Cliente.objects.create(
+                usuario=Usuario.objects.create_user(username='novo', password='x'), cpf='10000000009'
+            )
+            Fatura.objects.create(
+                cliente=novo, mes_referencia=date(2020, 1, 1), data_vencimento=date(2020, 1, 10),
+                valor_total=Decimal('70.00'),
+            )
+            novo.solicitacoes_credito.create(
+                valor_solicitado=Decimal('10.00'), justificativa='Teste', renda_mensal=Decimal('100.00')
+            )
+            return exclude(*args, **kwargs)
+
+        with mock.patch.object(Fatura.objects, 'exclude', side_effect=cadastrar_e_excluir):
+            carteira = carregar_carteira()
+
+        self.assertNotIn(Cliente.objects.get(cpf='10000000009').pk, carteira['ids'])
+        self.assertEqual([len(valores) for valores in carteira.values()], [4] * len(carteira))
+        self.assertEqual(carteira['utilizado'].sum(), 350.0)
+        self.assertEqual(carteira['pendente'].sum(), 1000.0)
+        self.assertEqual(carteira['renda'].sum(), 2000.0)
+
+    def test_relatorio_em_cache_e_json(self):
+        self.client.force_login(self.gerente.usuario)
+        response = self.client.get(reverse('credito:analise_carteira'))
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):  # só a sessão
+            dados = self.client.get(reverse('credito:analise_carteira_json')).json()
+        self.assertEqual(dados['totais']['atraso'], 150.0)
+        self.assertEqual(dados['maiores_exposicoes'][0]['cliente_id'], self.em_dia.pk)
+        self.assertEqual({faixa['faixa']: faixa['clientes'] for faixa in dados['faixas']},
+                         {'alto': 1, 'medio': 1, 'baixo': 1, 'sem_exposicao': 1})
+
+    def test_apenas_gerentes(self):
+        self.client.force_login(self.em_dia.usuario)
+        self.assertEqual(self.client.get(reverse('credito:analise_carteira_json')).status_code, 403)
+
+        sem_perfil = Usuario.objects.create_user(username='sem-perfil', password='x', tipo_usuario='gerente')
+        self.client.force_login(sem_perfil)
+        self.assertEqual(self.client.get(reverse('credito:analise_carteira_json')).status_code, 404)
 
-# Create your tests here.
+    def test_avaliar_solicitacoes_classifica_a_pagina(self):
+        self.client.force_login(self.gerente.usuario)
+        response = self.client.get(reverse('credito:avaliar_solicitacoes'))
+        niveis = [(s.percentual_renda, s.nivel_risco) for s in response.context['solicitacoes']]
+        self.assertEqual(sorted(niveis), [(25.0, 'baixo'), (50.0, 'medio')])
@@ -14,4 +14,6 @@ urlpatterns = [
     path('solicitacao/<int:solicitacao_id>/', views.detalhes_solicitacao, name='detalhes_solicitacao'),
     path('processar/<int:solicitacao_id>/', views.processar_solicitacao, name='processar_solicitacao'),
     path('avaliadas/', views.solicitacoes_avaliadas, name='solicitacoes_avaliadas'),
+    path('carteira/', views.analise_carteira, name='analise_carteira'),
+    path('carteira/json/', views.analise_carteira_json, name='analise_carteira_json'),
 ]
\ No newline at end of file
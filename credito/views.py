@@ -7,9 +7,12 @@ from django.db import transaction
 from django.core.paginator import Paginator
 from django.utils import timezone
 from .models import SolicitacaoCredito, HistoricoCredito
+from .analise_carteira import classificar_comprometimento, relatorio_carteira, invalidar_relatorio
 from usuarios.models import Cliente, Gerente
+from usuarios.middleware import cliente_da_requisicao, gerente_da_requisicao
 from .forms import SolicitacaoCreditoForm
 from decimal import Decimal
+import numpy as np
 
 @login_required
 def solicitar_credito(request):
@@ -19,7 +22,7 @@ def solicitar_credito(request):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         
         # Verificar se já tem solicitação pendente
         solicitacao_pendente = SolicitacaoCredito.objects.filter(
@@ -62,7 +65,7 @@ def minhas_solicitacoes(request):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         solicitacoes = cliente.solicitacoes_credito.all()
         
         # Paginação
@@ -89,7 +92,7 @@ def historico_credito(request):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         historico = cliente.historico_credito.all()
         
         # Paginação
@@ -110,6 +113,19 @@ def historico_credito(request):
 
 # ===== VIEWS DO GERENTE =====
 
+def _classificar_risco(solicitacoes):
+    """Preenche percentual_renda e nivel_risco das solicitações"""
+    solicitacoes = list(solicitacoes)
+    if not solicitacoes:
+        return
+    valores = np.array([float(s.valor_solicitado) for s in solicitacoes])
+    rendas = np.array([float(s.renda_mensal or 0) for s in solicitacoes])
+    percentuais = np.divide(valores * 100, rendas, out=np.zeros_like(valores), where=rendas > 0)
+    niveis = np.where(rendas > 0, classificar_comprometimento(percentuais), 'indeterminado')
+    for solicitacao, percentual, nivel in zip(solicitacoes, percentuais.round(1).tolist(), niveis.tolist()):
+        solicitacao.percentual_renda = percentual
+        solicitacao.nivel_risco = nivel
+
 @login_required
 def avaliar_solicitacoes(request):
     """Gerente avalia solicitações de crédito"""
@@ -118,7 +134,7 @@ def avaliar_solicitacoes(request):
         return redirect('usuarios:home_redirect')
     
     try:
-        gerente = Gerente.objects.get(usuario=request.user)
+        gerente = gerente_da_requisicao(request)
         
         # Filtros
         status_filter = request.GET.get('status', '')
@@ -140,21 +156,6 @@ def avaliar_solicitacoes(request):
         else:
             solicitacoes = solicitacoes.order_by('data_solicitacao')
         
-        # Adicionar análise de risco para cada solicitação
-        for solicitacao in solicitacoes:
-            if solicitacao.renda_mensal and solicitacao.renda_mensal > 0:
-                percentual = (float(solicitacao.valor_solicitado) / float(solicitacao.renda_mensal)) * 100
-                solicitacao.percentual_renda = round(percentual, 1)
-                if percentual <= 30:
-                    solicitacao.nivel_risco = 'baixo'
-                elif percentual <= 60:
-                    solicitacao.nivel_risco = 'medio'
-                else:
-                    solicitacao.nivel_risco = 'alto'
-            else:
-                solicitacao.percentual_renda = 0
-                solicitacao.nivel_risco = 'indeterminado'
-        
         # Estatísticas
         pendentes_count = SolicitacaoCredito.objects.filter(status='pendente').count()
         hoje = timezone.now().date()
@@ -173,6 +174,9 @@ def avaliar_solicitacoes(request):
         page_number = request.GET.get('page')
         page_obj = paginator.get_page(page_number)
         
+        # Análise de risco apenas das solicitações exibidas, de uma vez
+        _classificar_risco(page_obj.object_list)
+        
         context = {
             'solicitacoes': page_obj,
             'page_obj': page_obj,
@@ -197,7 +201,7 @@ def detalhes_solicitacao(request, solicitacao_id):
         return redirect('usuarios:home_redirect')
     
     try:
-        gerente = Gerente.objects.get(usuario=request.user)
+        gerente = gerente_da_requisicao(request)
         solicitacao = get_object_or_404(SolicitacaoCredito, id=solicitacao_id)
         
         context = {
@@ -223,7 +227,7 @@ def processar_solicitacao(request, solicitacao_id):
         return redirect('usuarios:home_redirect')
     
     try:
-        gerente = Gerente.objects.get(usuario=request.user)
+        gerente = gerente_da_requisicao(request)
         solicitacao = get_object_or_404(SolicitacaoCredito, id=solicitacao_id, status='pendente')
         
         acao = request.POST.get('acao')
@@ -312,7 +316,7 @@ def solicitacoes_avaliadas(request):
         return redirect('usuarios:home_redirect')
     
     try:
-        gerente = Gerente.objects.get(usuario=request.user)
+        gerente = gerente_da_requisicao(request)
         
         # Buscar solicitações avaliadas por este gerente
         solicitacoes = SolicitacaoCredito.objects.filter(
@@ -334,3 +338,38 @@ def solicitacoes_avaliadas(request):
     except Gerente.DoesNotExist:
         messages.error(request, 'Perfil de gerente não encontrado.')
         return redirect('usuarios:home_redirect')
+
+@login_required
+def analise_carteira(request):
+    """Relatório de risco da carteira de crédito"""
+    if request.user.tipo_usuario != 'gerente':
+        messages.error(request, 'Apenas gerentes podem ver a análise da carteira.')
+        return redirect('usuarios:home_redirect')
+    
+    try:
+        gerente = gerente_da_requisicao(request)
+    except Gerente.DoesNotExist:
+        messages.error(request, 'Perfil de gerente não encontrado.')
+        return redirect('usuarios:home_redirect')
+    
+    if request.GET.get('atualizar'):
+        invalidar_relatorio()
+    
+    context = {
+        'gerente': gerente,
+        'relatorio': relatorio_carteira(),
+    }
+    return render(request, 'credito/analise_carteira.html', context)
+
+@login_required
+def analise_carteira_json(request):
+    """Relatório de risco da carteira de crédito em JSON"""
+    if request.user.tipo_usuario != 'gerente':
+        return JsonResponse({'success': False, 'message': 'Apenas gerentes podem ver a análise da carteira.'}, status=403)
+    
+    try:
+        gerente_da_requisicao(request)
+    except Gerente.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Perfil de gerente não encontrado.'}, status=404)
+    
+    return JsonResponse({'success': True, **relatorio_carteira()})
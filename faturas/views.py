@@ -8,6 +8,9 @@ from django.core.paginator import Paginator
 from django.utils import timezone
 from .models import Fatura, ConfiguracaoFatura, PagamentoFatura, criar_fatura_mensal
 from usuarios.models import Cliente
+from usuarios.idempotencia import idempotente
+from usuarios.middleware import cliente_da_requisicao
+from usuarios.services import debitar, SaldoInsuficienteError
 from decimal import Decimal
 from datetime import date
 
@@ -19,7 +22,7 @@ def minhas_faturas(request):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         print(f"DEBUG: Cliente encontrado: {cliente}")
         
         # Debug - verificar faturas existentes
@@ -103,7 +106,7 @@ def detalhes_fatura(request, fatura_id):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         fatura = get_object_or_404(Fatura, id=fatura_id, cliente=cliente)
         
         # Atualizar juros se vencida
@@ -128,6 +131,7 @@ def detalhes_fatura(request, fatura_id):
 
 @login_required
 @csrf_protect
+@idempotente
 def pagar_fatura(request, fatura_id):
     """Pagar fatura com saldo"""
     if request.method != 'POST':
@@ -138,6 +142,7 @@ def pagar_fatura(request, fatura_id):
         return redirect('usuarios:home_redirect')
     
     try:
+        # Lido do banco, e não de request.cliente, para conferir o saldo atual
         cliente = Cliente.objects.get(usuario=request.user)
         fatura = get_object_or_404(Fatura, id=fatura_id, cliente=cliente)
         
@@ -157,8 +162,7 @@ def pagar_fatura(request, fatura_id):
         
         with transaction.atomic():
             # Debitar do saldo
-            cliente.saldo -= valor_total
-            cliente.save()
+            debitar(cliente, valor_total, 'pagamento_fatura', f'Pagamento da fatura #{fatura.id}')
             
             # Registrar pagamento
             pagamento = PagamentoFatura.objects.create(
@@ -182,7 +186,7 @@ def pagar_fatura(request, fatura_id):
                         valor_item = item.valor_parcela
                         cliente.limite_credito += valor_item
                 
-                cliente.save()
+                cliente.save(update_fields=['limite_credito'])
         
         messages.success(request, f'Fatura paga com sucesso! Valor: R$ {valor_total:.2f}')
         return redirect('faturas:minhas_faturas')
@@ -190,6 +194,9 @@ def pagar_fatura(request, fatura_id):
     except Cliente.DoesNotExist:
         messages.error(request, 'Perfil de cliente não encontrado.')
         return redirect('usuarios:home_redirect')
+    except SaldoInsuficienteError:
+        messages.error(request, 'Saldo insuficiente para pagar a fatura.')
+        return redirect('faturas:detalhes_fatura', fatura_id=fatura_id)
     except Exception as e:
         messages.error(request, 'Erro ao processar pagamento.')
         return redirect('faturas:detalhes_fatura', fatura_id=fatura_id)
@@ -202,7 +209,7 @@ def configurar_vencimento(request, fatura_id):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         fatura = get_object_or_404(Fatura, id=fatura_id, cliente=cliente)
         
         if request.method == 'POST':
@@ -254,7 +261,7 @@ def fatura_atual(request):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         
         # Buscar ou criar fatura do mês atual
         mes_atual = date.today().replace(day=1)
@@ -294,7 +301,7 @@ def fechar_fatura(request, fatura_id):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         fatura = get_object_or_404(Fatura, id=fatura_id, cliente=cliente, status='aberta')
         
         data_vencimento_str = request.POST.get('data_vencimento')
@@ -336,6 +343,7 @@ def fechar_fatura(request, fatura_id):
 
 @login_required
 @csrf_protect
+@idempotente
 def pagar_fatura_completa(request, fatura_id):
     """Pagar uma fatura completamente usando o saldo"""
     if request.method != 'POST':
@@ -345,6 +353,7 @@ def pagar_fatura_completa(request, fatura_id):
         return JsonResponse({'success': False, 'message': 'Apenas clientes podem pagar faturas'})
     
     try:
+        # Lido do banco, e não de request.cliente, para conferir o saldo atual
         cliente = Cliente.objects.get(usuario=request.user)
         fatura = get_object_or_404(Fatura, id=fatura_id, cliente=cliente)
         
@@ -365,8 +374,7 @@ def pagar_fatura_completa(request, fatura_id):
         
         with transaction.atomic():
             # Debitar do saldo do cliente
-            cliente.saldo -= valor_pendente
-            cliente.save()
+            debitar(cliente, valor_pendente, 'pagamento_fatura', f'Pagamento da fatura #{fatura.id}')
             
             # Atualizar fatura
             fatura.valor_pago = fatura.valor_total
@@ -389,11 +397,14 @@ def pagar_fatura_completa(request, fatura_id):
         
     except Cliente.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Cliente não encontrado'})
+    except SaldoInsuficienteError:
+        return JsonResponse({'success': False, 'message': 'Saldo insuficiente'})
     except Exception as e:
         return JsonResponse({'success': False, 'message': 'Erro ao processar pagamento'})
 
 @login_required
 @csrf_protect
+@idempotente
 def pagar_parcela(request, pagamento_id):
     """Pagar uma parcela específica usando o saldo"""
     if request.method != 'POST':
@@ -403,6 +414,7 @@ def pagar_parcela(request, pagamento_id):
         return JsonResponse({'success': False, 'message': 'Apenas clientes podem pagar parcelas'})
     
     try:
+        # Lido do banco, e não de request.cliente, para conferir o saldo atual
         cliente = Cliente.objects.get(usuario=request.user)
         pagamento = get_object_or_404(PagamentoFatura, id=pagamento_id, fatura__cliente=cliente)
         
@@ -414,8 +426,10 @@ def pagar_parcela(request, pagamento_id):
         
         with transaction.atomic():
             # Debitar do saldo do cliente
-            cliente.saldo -= pagamento.valor_parcela
-            cliente.save()
+            debitar(
+                cliente, pagamento.valor_parcela, 'pagamento_fatura',
+                f'Pagamento de parcela da fatura #{pagamento.fatura_id}',
+            )
             
             # Marcar parcela como paga
             pagamento.pago = True
@@ -436,5 +450,7 @@ def pagar_parcela(request, pagamento_id):
         
     except Cliente.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Cliente não encontrado'})
+    except SaldoInsuficienteError:
+        return JsonResponse({'success': False, 'message': 'Saldo insuficiente'})
     except Exception as e:
         return JsonResponse({'success': False, 'message': 'Erro ao processar pagamento'})
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'galaxybank.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Streams SSE de /eventos/ são atendidos fora do handler do Django
+# (importado depois do setup, pois carrega modelos)
+from usuarios.rota_eventos import RotaEventos  # noqa: E402
+
+application = RotaEventos(django_application)
@@ -0,0 +1,63 @@
+"""
+Utilitários compartilhados pelos comandos de benchmark do Galaxy Bank.
+
+Os benchmarks nunca tocam o banco configurado em settings: cada execução
+cria um banco SQLite temporário, aplica as migrações e o descarta no final.
+"""
+
+import os
+import resource
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.db import connections
+
+
+@contextmanager
+def banco_temporario(alias='default'):
+    """Aponta a conexão para um banco SQLite temporário já migrado"""
+    conexao = connections[alias]
+    conexao.close()
+
+    diretorio = tempfile.mkdtemp(prefix='galaxybank-bench-')
+    nome_original = conexao.settings_dict['NAME']
+    # Todas as threads compartilham este dicionário, então novas conexões
+    # abertas durante o benchmark também usam o banco temporário.
+    conexao.settings_dict['NAME'] = os.path.join(diretorio, 'benchmark.sqlite3')
+    try:
+        call_command('migrate', database=alias, verbosity=0, interactive=False)
+        yield conexao.settings_dict['NAME']
+    finally:
+        connections.close_all()
+        conexao.settings_dict['NAME'] = nome_original
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+@contextmanager
+def preservar_datas(*campos):
+    """
+    Desliga auto_now/auto_now_add dos campos (pares modelo, nome) enquanto
+    durar o bloco, para que o bulk_create grave as datas históricas informadas
+    """
+    originais = []
+    for modelo, nome in campos:
+        campo = modelo._meta.get_field(nome)
+        originais.append((campo, campo.auto_now, campo.auto_now_add))
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originais:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def rss_pico_mb():
+    """Retorna o pico de memória residente do processo em MB"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    if sys.platform == 'darwin':
+        return pico / (1024 * 1024)
+    return pico / 1024
@@ -10,6 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +52,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'usuarios.middleware.PerfilMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,6 +84,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # BEGIN IMMEDIATE faz as transações de escrita esperarem na fila
+            # (até `timeout` segundos) em vez de falharem com "database is locked".
+            # Vale para todo atomic(), inclusive os que só leem: eles também
+            # pegam o lock de escrita e esperam na mesma fila. Leituras ficam
+            # fora de atomic() (autocommit), que não trava o banco.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -102,6 +115,38 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hash de senhas. Com o argon2-cffi instalado, SENHA_HASHER_PREFERIDO passa a
+# ser o algoritmo padrão: verifica senhas bem mais rápido que o PBKDF2 (que
+# continua na lista) e cada hash antigo é regravado no próximo login do usuário.
+SENHA_HASHER_PREFERIDO = 'usuarios.hashers.Argon2SenhaHasher'
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+if find_spec('argon2'):
+    PASSWORD_HASHERS.insert(0, SENHA_HASHER_PREFERIDO)
+
+# Validade (em segundos) do cookie assinado com os dados do cadastro em
+# etapas; cadastros abandonados não gravam nada no banco (ver usuarios.cadastro)
+CADASTRO_COOKIE_IDADE = 60 * 60
+
+# Intervalo (em segundos) para remontar os filtros de Bloom de emails e CPFs
+# usados na validação do cadastro enquanto se digita (ver usuarios.unicidade)
+UNICIDADE_FILTRO_TTL = 60 * 10
+
+# Consultas de email/CPF que um mesmo IP pode fazer na validação do cadastro
+# a cada janela (em segundos); acima disso a view responde 429, para que ela
+# não sirva para descobrir em massa quem tem conta
+VALIDACAO_CADASTRO_LIMITE = 30
+VALIDACAO_CADASTRO_JANELA = 60
+
+# Threads que geram e conferem hashes de senha no login e no cadastro (ver
+# usuarios.senhas); logins além disso esperam na fila do pool
+SENHA_HASH_WORKERS = 4
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -129,9 +174,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'usuarios.Usuario'
 
 # Authentication backends
+# Login por username ou email; estende o ModelBackend (permissões), que por
+# isso não entra na lista: ele só repetiria a busca e o hash da senha
 AUTHENTICATION_BACKENDS = [
     'usuarios.backends.EmailOrUsernameModelBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
 # Login/Logout URLs
@@ -144,3 +190,73 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+
+# Cache compartilhado por todos os processos (workers do servidor, comandos):
+# versões do dashboard, indicadores do gerente e usuários em cache são
+# invalidados em um processo e lidos nos outros, o que o cache em memória
+# local (LocMemCache) não permite. Com REDIS_URL definida usa o Redis; sem
+# ela, arquivos em disco, compartilhados pelos processos da mesma máquina.
+#
+# No FileBasedCache o incr é um get seguido de set, sem trava entre processos:
+# incrementos simultâneos podem se perder. O contador de versão do dashboard
+# tolera isso (qualquer incremento já troca a versão), mas o limite de
+# consultas da validação do cadastro passa a ser aproximado. Em produção com
+# mais de um worker, defina REDIS_URL: no Redis o incr é atômico.
+#
+# Os testes usam o mesmo backend em um diretório temporário por execução
+# (ver TEST_RUNNER), para não apagar nem ler o cache de um servidor local.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': Path(tempfile.gettempdir()) / 'galaxybank-cache',
+            'OPTIONS': {'MAX_ENTRIES': 20_000},
+        },
+    }
+
+TEST_RUNNER = 'galaxybank.test_runner.GalaxyBankTestRunner'
+
+# Idempotência das operações financeiras: por quanto tempo (em segundos) a
+# resposta de uma chave fica guardada para ser devolvida em novas tentativas
+IDEMPOTENCIA_TTL = 60 * 60 * 24
+
+# Grava cada transferência como um único LancamentoContabil em vez do par
+# transferencia_enviada/transferencia_recebida de Transacao. Antes de ativar
+# em uma base existente, rode `migrar_transferencias_livro_contabil`.
+# O ganho é de espaço: o histórico de transferências ocupa cerca de 1/3 em
+# disco. O throughput de escrita não muda de forma mensurável (1,03x em
+# benchmark_livro_contabil), pois o INSERT economizado é pouco perto dos
+# UPDATEs de saldo e do resumo diário de cada transferência.
+LIVRO_CONTABIL_TRANSFERENCIAS = False
+
+# Defasagem máxima (em segundos) dos indicadores do painel do gerente, que
+# ficam em cache e são invalidados quando clientes ou solicitações mudam
+KPI_GERENTE_TTL = 60
+
+# Validade (em segundos) do cache do dashboard do cliente; novas transações
+# já invalidam o cache antes disso
+DASHBOARD_CLIENTE_TTL = 60 * 15
+
+# Por quanto tempo (em segundos) o usuário autenticado e seu perfil ficam em
+# cache; saves e novas transações já invalidam a entrada antes disso
+USUARIO_CACHE_TTL = 30
+
+# Intervalo (em segundos) dos comentários de keepalive enviados nas conexões
+# abertas em /eventos/, para proxies não derrubarem streams ociosos
+EVENTOS_KEEPALIVE = 25
+
+# Validade (em segundos) do relatório de risco da carteira de crédito
+ANALISE_CARTEIRA_TTL = 60 * 5
+
+# Catálogo da loja sincronizado pelo comando sincronizar_produtos (ver
+# loja.catalogo); timeout em segundos da requisição à API
+FAKESTORE_API_URL = 'https://fakestoreapi.com/products'
+FAKESTORE_API_TIMEOUT = 10
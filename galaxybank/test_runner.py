@@ -0,0 +1,36 @@
+"""
+Runner dos testes do Galaxy Bank.
+
+O cache configurado em settings é compartilhado pelos processos da máquina
+(ver CACHES), inclusive por um servidor de desenvolvimento rodando ao lado:
+os testes, que limpam o cache a todo momento, apagariam as entradas dele e
+poderiam ler as que ele gravou. Cada execução usa o mesmo backend em um
+diretório temporário próprio, descartado no final.
+"""
+
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class GalaxyBankTestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._diretorio_cache = tempfile.mkdtemp(prefix='galaxybank-test-cache-')
+        self._cache_isolado = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self._diretorio_cache,
+                'OPTIONS': settings.CACHES['default'].get('OPTIONS', {}),
+            },
+        })
+        self._cache_isolado.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_isolado.disable()
+        shutil.rmtree(self._diretorio_cache, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
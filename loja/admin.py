@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CategoriaProduto, Produto, Compra, ItemCompra, CarrinhoCompras, ItemCarrinho
+from .models import CategoriaProduto, Produto, Compra, ItemCompra, CarrinhoCompras, ItemCarrinho, AlteracaoProduto
 
 @admin.register(CategoriaProduto)
 class CategoriaProdutoAdmin(admin.ModelAdmin):
@@ -23,3 +23,9 @@ class CompraAdmin(admin.ModelAdmin):
 @admin.register(ItemCompra)
 class ItemCompraAdmin(admin.ModelAdmin):
     list_display = ['compra', 'produto', 'quantidade', 'preco_unitario', 'valor_total']
+
+@admin.register(AlteracaoProduto)
+class AlteracaoProdutoAdmin(admin.ModelAdmin):
+    list_display = ['produto', 'campo', 'valor_anterior', 'valor_novo', 'data']
+    list_filter = ['campo', 'data']
+    readonly_fields = ['produto', 'campo', 'valor_anterior', 'valor_novo', 'data']
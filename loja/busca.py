@@ -0,0 +1,51 @@
+"""
+Busca de produtos por texto completo, no índice FTS5 loja_produto_busca.
+
+O índice cobre título, descrição e nome da categoria, sem diferenciar acentos
+e maiúsculas. Cada palavra digitada vale como prefixo ("sams" encontra
+"Samsung") e todas precisam aparecer em algum dos campos. A relevância é o
+bm25 do FTS5 com pesos por campo (ver a migração 0003): quanto menor, mais
+relevante.
+"""
+
+import re
+
+from django.db.models import F, FloatField, Value
+
+from .models import Produto
+
+MAX_PALAVRAS = 8
+MIN_SUGESTAO = 2  # caracteres digitados antes de sugerir produtos
+
+
+def consulta_fts(busca):
+    """
+    Expressão MATCH com cada palavra entre aspas e como prefixo.
+
+    Só letras e dígitos passam, então o texto digitado nunca é interpretado
+    como operador do FTS5 (AND, NEAR, aspas, parênteses...).
+    """
+    palavras = re.findall(r'\w+', busca or '')[:MAX_PALAVRAS]
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+
+def buscar(produtos, busca):
+    """Filtra `produtos` pela busca e anota `relevancia`"""
+    consulta = consulta_fts(busca)
+    if not consulta:
+        return produtos.annotate(relevancia=Value(0.0, output_field=FloatField())).none()
+    return produtos.filter(busca__documento__match=consulta).annotate(relevancia=F('busca__rank'))
+
+
+def por_relevancia(produtos):
+    return produtos.order_by('relevancia', '-avaliacao', 'id')
+
+
+def sugestoes(busca, limite=8):
+    """Produtos ativos mais relevantes para o texto digitado até agora"""
+    if len(busca.strip()) < MIN_SUGESTAO:
+        return []
+    return list(
+        por_relevancia(buscar(Produto.objects.filter(ativo=True), busca))
+        .values('id', 'titulo', 'preco_vista')[:limite]
+    )
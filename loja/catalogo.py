@@ -0,0 +1,216 @@
+"""
+Sincronização do catálogo da loja com a FakeStore API.
+
+A requisição é condicional: o ETag e o Last-Modified da última resposta ficam
+em EstadoCatalogo e voltam como If-None-Match/If-Modified-Since, então um 304
+encerra a sincronização sem ler o corpo nem tocar nos produtos. Um corpo igual
+ao da última vez (mesmo SHA-256) também encerra, para APIs sem validadores.
+
+Quando o catálogo mudou, cada produto é comparado pelo hash do seu item na API
+(Produto.hash_conteudo): só os produtos novos ou com hash diferente são
+carregados e comparados campo a campo. Produtos novos entram em um
+bulk_create e os existentes só são regravados, por bulk_update, nos campos
+que mudaram. Mudanças de título e preço vão para o feed AlteracaoProduto.
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CategoriaProduto, Produto, EstadoCatalogo, AlteracaoProduto
+
+CAMPOS = ('titulo', 'descricao', 'preco_vista', 'preco_prazo', 'categoria_id', 'imagem_url', 'avaliacao')
+CAMPOS_FEED = [campo for campo, _ in AlteracaoProduto.CAMPO_CHOICES]
+CENTAVOS = Decimal('0.01')
+JUROS_PRAZO = Decimal('1.10')  # mesmo acréscimo de Produto.save()
+
+
+class SincronizacaoError(Exception):
+    """Catálogo indisponível ou em formato inesperado"""
+
+
+def _decimal(valor):
+    return Decimal(str(valor)).quantize(CENTAVOS)
+
+
+def _sha256(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def hash_item(dados):
+    """Hash de um item da API, independente da ordem das chaves"""
+    return _sha256(json.dumps(dados, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode())
+
+
+def preco_prazo(preco_vista):
+    return (preco_vista * JUROS_PRAZO).quantize(CENTAVOS)
+
+
+def buscar_catalogo(estado):
+    """Resposta da API, condicionada aos validadores guardados em `estado`"""
+    cabecalhos = {}
+    if estado.etag:
+        cabecalhos['If-None-Match'] = estado.etag
+    if estado.last_modified:
+        cabecalhos['If-Modified-Since'] = estado.last_modified
+    try:
+        response = requests.get(estado.url, headers=cabecalhos, timeout=settings.FAKESTORE_API_TIMEOUT)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+    except requests.RequestException as e:
+        raise SincronizacaoError(f'Falha ao buscar o catálogo: {e}') from e
+
+
+def alteracoes_desde(ultimo_id=0):
+    """Alterações de título e preço posteriores a `ultimo_id`, na ordem em que foram gravadas"""
+    return AlteracaoProduto.objects.filter(id__gt=ultimo_id).order_by('id')
+
+
+def _categorias(nomes):
+    """{nome: id} das categorias, criando as que faltam em um único INSERT"""
+    if not nomes:
+        return {}
+    categorias = dict(CategoriaProduto.objects.filter(nome__in=nomes).values_list('nome', 'id'))
+    novas = [CategoriaProduto(nome=nome, descricao=f'Categoria {nome}') for nome in sorted(nomes - categorias.keys())]
+    if novas:
+        # update_conflicts devolve o id também de uma categoria criada em paralelo
+        CategoriaProduto.objects.bulk_create(
+            novas, update_conflicts=True, unique_fields=['nome'], update_fields=['nome']
+        )
+        categorias.update((categoria.nome, categoria.id) for categoria in novas)
+    return categorias
+
+
+def _valores(dados, categorias):
+    """Campos de Produto a partir de um item da API"""
+    preco_vista = _decimal(dados['price'])
+    return {
+        'titulo': dados['title'],
+        'descricao': dados['description'],
+        'preco_vista': preco_vista,
+        'preco_prazo': preco_prazo(preco_vista),
+        'categoria_id': categorias[dados['category'].title()],
+        'imagem_url': dados['image'],
+        'avaliacao': _decimal(dados['rating']['rate']),
+    }
+
+
+def _aplicar(catalogo, agora):
+    """Grava as diferenças entre o catálogo e os produtos; retorna (inseridos, atualizados)"""
+    try:
+        hashes = {dados['id']: hash_item(dados) for dados in catalogo}
+    except (KeyError, TypeError) as e:
+        raise SincronizacaoError(f'Catálogo em formato inesperado: {e!r}') from e
+
+    gravados = dict(Produto.objects.filter(api_id__in=hashes).values_list('api_id', 'hash_conteudo'))
+    pendentes = [dados for dados in catalogo if gravados.get(dados['id']) != hashes[dados['id']]]
+    if not pendentes:
+        return 0, 0
+
+    try:
+        categorias = _categorias({dados['category'].title() for dados in pendentes})
+    except (KeyError, AttributeError) as e:
+        raise SincronizacaoError(f'Catálogo em formato inesperado: {e!r}') from e
+    existentes = Produto.objects.in_bulk(
+        [dados['id'] for dados in pendentes if dados['id'] in gravados], field_name='api_id'
+    )
+
+    novos, feed = [], []
+    alterados = defaultdict(list)  # campos alterados -> produtos
+    atualizados = 0
+    for dados in pendentes:
+        try:
+            valores = _valores(dados, categorias)
+        except (KeyError, TypeError, ArithmeticError) as e:
+            raise SincronizacaoError(f"Produto {dados['id']} em formato inesperado: {e!r}") from e
+
+        produto = existentes.get(dados['id'])
+        if produto is None:
+            novos.append(Produto(api_id=dados['id'], hash_conteudo=hashes[dados['id']], **valores))
+            continue
+        # O preço a prazo só acompanha o à vista se não foi definido à mão
+        if produto.preco_prazo != preco_prazo(produto.preco_vista):
+            del valores['preco_prazo']
+        mudancas = tuple(campo for campo, valor in valores.items() if getattr(produto, campo) != valor)
+        feed.extend(
+            AlteracaoProduto(
+                produto=produto,
+                campo=campo,
+                valor_anterior=str(getattr(produto, campo)),
+                valor_novo=str(valores[campo]),
+                data=agora,
+            )
+            for campo in mudancas if campo in CAMPOS_FEED
+        )
+        for campo in mudancas:
+            setattr(produto, campo, valores[campo])
+        produto.hash_conteudo = hashes[dados['id']]
+        if mudancas:
+            produto.data_atualizacao = agora
+            atualizados += 1
+            mudancas += ('data_atualizacao',)
+        # Sem mudanças nos campos gravados (ex.: só a contagem de avaliações), grava só o hash
+        alterados[mudancas + ('hash_conteudo',)].append(produto)
+
+    if novos:
+        # update_conflicts cobre um produto criado por outra sincronização no meio tempo
+        Produto.objects.bulk_create(
+            novos, update_conflicts=True, unique_fields=['api_id'], update_fields=[*CAMPOS, 'hash_conteudo']
+        )
+    for campos, produtos in alterados.items():
+        Produto.objects.bulk_update(produtos, list(campos))
+    AlteracaoProduto.objects.bulk_create(feed)
+    return len(novos), atualizados
+
+
+def sincronizar_produtos_api():
+    """
+    Sincroniza os produtos da FakeStore API.
+
+    Retorna as quantidades de produtos inseridos, atualizados e inalterados e
+    se o catálogo estava igual ao da última sincronização (nao_modificado,
+    caso em que nenhum produto é lido); levanta SincronizacaoError se a API
+    falhar ou responder fora do formato.
+    """
+    estado, _ = EstadoCatalogo.objects.get_or_create(url=settings.FAKESTORE_API_URL)
+    response = buscar_catalogo(estado)
+    agora = timezone.now()
+    estado.data_verificacao = agora
+    resultado = {'inseridos': 0, 'atualizados': 0, 'inalterados': 0, 'nao_modificado': True}
+
+    if response.status_code == 304:
+        estado.save(update_fields=['data_verificacao'])
+        return resultado
+
+    hash_catalogo = _sha256(response.content)
+    estado.etag = response.headers.get('ETag', '')
+    estado.last_modified = response.headers.get('Last-Modified', '')
+    if hash_catalogo == estado.hash_catalogo:
+        estado.save(update_fields=['etag', 'last_modified', 'data_verificacao'])
+        return resultado
+
+    try:
+        catalogo = response.json()
+    except ValueError as e:
+        raise SincronizacaoError(f'Catálogo em formato inesperado: {e}') from e
+    with transaction.atomic():
+        inseridos, atualizados = _aplicar(catalogo, agora)
+        # Os validadores só avançam junto com os produtos: se a gravação
+        # falhar, a próxima sincronização pede o catálogo inteiro de novo
+        estado.hash_catalogo = hash_catalogo
+        estado.data_alteracao = agora
+        estado.save()
+
+    return {
+        'inseridos': inseridos,
+        'atualizados': atualizados,
+        'inalterados': len(catalogo) - inseridos - atualizados,
+        'nao_modificado': False,
+    }
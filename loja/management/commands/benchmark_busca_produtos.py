@@ -0,0 +1,103 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from galaxybank.benchmark import banco_temporario
+from loja.busca import buscar, por_relevancia
+from loja.models import CategoriaProduto, Produto
+
+CATEGORIAS = ['Eletrônicos', 'Casa', 'Esporte', 'Moda', 'Livros', 'Brinquedos', 'Beleza', 'Informática']
+TIPOS = [
+    'Celular', 'Notebook', 'Cafeteira', 'Tênis', 'Camiseta', 'Mochila', 'Relógio', 'Fone', 'Cadeira', 'Luminária',
+    'Bicicleta', 'Perfume', 'Teclado', 'Monitor', 'Panela', 'Jaqueta', 'Livro', 'Boneca', 'Bola', 'Garrafa',
+]
+MARCAS = ['Galaxy', 'Orion', 'Nebula', 'Pulsar', 'Quasar', 'Andrômeda', 'Cometa', 'Vega', 'Sirius', 'Lyra']
+ADJETIVOS = [
+    'premium', 'compacto', 'elétrico', 'portátil', 'resistente', 'leve', 'clássico', 'moderno', 'ergonômico',
+    'sustentável', 'infantil', 'profissional', 'digital', 'térmico', 'esportivo',
+]
+PALAVRAS = [
+    'qualidade', 'garantia', 'design', 'conforto', 'durabilidade', 'bateria', 'tecido', 'aço', 'algodão',
+    'madeira', 'vidro', 'couro', 'plástico', 'alumínio', 'bluetooth', 'wireless', 'inox', 'entrega', 'presente',
+    'uso', 'diário', 'viagem', 'escritório', 'cozinha', 'academia', 'escola', 'cor', 'tamanho', 'modelo', 'novo',
+]
+
+
+class Command(BaseCommand):
+    help = 'Compara a busca de produtos por FTS5 (bm25) com titulo__icontains em um catálogo sintético (banco temporário)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produtos', type=int, default=1_000_000)
+        parser.add_argument('--consultas', type=int, default=50, help='Consultas por tipo de busca')
+        parser.add_argument('--lote', type=int, default=20_000, help='Tamanho dos lotes de inserção')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with banco_temporario():
+            self.stdout.write(f"Inserindo {options['produtos']:,} produtos (o índice é mantido pelos triggers)...")
+            inicio = time.perf_counter()
+            self._popular(rng, options['produtos'], options['lote'])
+            duracao = time.perf_counter() - inicio
+            self.stdout.write(f"  {duracao:.1f}s ({options['produtos'] / duracao:,.0f} produtos/s)")
+
+            buscas = {
+                'palavra inteira': [rng.choice(TIPOS + MARCAS) for _ in range(options['consultas'])],
+                'prefixo (digitando)': [rng.choice(TIPOS + MARCAS)[:3] for _ in range(options['consultas'])],
+                'duas palavras': [
+                    f'{rng.choice(TIPOS)} {rng.choice(MARCAS)}' for _ in range(options['consultas'])
+                ],
+            }
+            self.stdout.write(
+                f"\n{'busca':<20} {'método':<10} {'p50 ms':>8} {'p95 ms':>8} {'resultados':>11}"
+            )
+            for nome, termos in buscas.items():
+                medidas = {}
+                for metodo, consulta in [('icontains', self._icontains), ('fts5', self._fts)]:
+                    latencias, resultados = [], 0
+                    for termo in termos:
+                        inicio = time.perf_counter()
+                        total, pagina = consulta(termo)
+                        latencias.append(time.perf_counter() - inicio)
+                        resultados += total
+                    medidas[metodo] = statistics.median(latencias)
+                    p95 = statistics.quantiles(latencias, n=20)[18] if len(latencias) > 1 else latencias[0]
+                    self.stdout.write(
+                        f'{nome:<20} {metodo:<10} {medidas[metodo] * 1000:>8.1f} {p95 * 1000:>8.1f} '
+                        f'{resultados / len(termos):>11,.0f}'
+                    )
+                self.stdout.write(f"{'':<20} FTS5 {medidas['icontains'] / medidas['fts5']:.1f}x mais rápida (p50)")
+
+        self.stdout.write(
+            '\nO icontains só olha o título; a busca FTS5 também encontra termos da descrição e da categoria, '
+            'por isso pode devolver mais resultados.'
+        )
+
+    def _popular(self, rng, quantidade, lote):
+        categorias = CategoriaProduto.objects.bulk_create([CategoriaProduto(nome=nome) for nome in CATEGORIAS])
+        for inicio in range(0, quantidade, lote):
+            produtos = []
+            for i in range(inicio, min(inicio + lote, quantidade)):
+                preco = Decimal(rng.randint(500, 500000)) / 100
+                produtos.append(Produto(
+                    titulo=f'{rng.choice(TIPOS)} {rng.choice(MARCAS)} {rng.choice(ADJETIVOS)} {i}',
+                    descricao=' '.join(rng.choices(PALAVRAS, k=20)),
+                    preco_vista=preco,
+                    preco_prazo=preco * Decimal('1.10'),
+                    categoria=rng.choice(categorias),
+                    avaliacao=Decimal(rng.randint(0, 500)) / 100,
+                ))
+            Produto.objects.bulk_create(produtos)
+
+    def _icontains(self, termo):
+        """Busca anterior: LIKE '%termo%' no título, mais recentes primeiro"""
+        produtos = Produto.objects.filter(ativo=True, titulo__icontains=termo)
+        return produtos.count(), list(produtos.order_by('-data_criacao')[:12])
+
+    def _fts(self, termo):
+        """Busca atual: índice FTS5, mais relevantes primeiro"""
+        produtos = buscar(Produto.objects.filter(ativo=True), termo)
+        return produtos.count(), list(por_relevancia(produtos)[:12])
@@ -1,17 +1,21 @@
-from django.core.management.base import BaseCommand
-from loja.models import sincronizar_produtos_api
+from django.core.management.base import BaseCommand, CommandError
+from loja.catalogo import SincronizacaoError, sincronizar_produtos_api
 
 class Command(BaseCommand):
     help = 'Sincroniza produtos da FakeStore API'
 
     def handle(self, *args, **options):
         self.stdout.write('Iniciando sincronização de produtos...')
-        
-        if sincronizar_produtos_api():
-            self.stdout.write(
-                self.style.SUCCESS('Produtos sincronizados com sucesso!')
-            )
-        else:
-            self.stdout.write(
-                self.style.ERROR('Erro ao sincronizar produtos.')
-            )
\ No newline at end of file
+
+        try:
+            resultado = sincronizar_produtos_api()
+        except SincronizacaoError as e:
+            raise CommandError(f'Erro ao sincronizar produtos: {e}')
+
+        if resultado['nao_modificado']:
+            self.stdout.write(self.style.SUCCESS('Catálogo inalterado desde a última sincronização.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Produtos sincronizados com sucesso! {resultado['inseridos']} inseridos, "
+            f"{resultado['atualizados']} atualizados, {resultado['inalterados']} inalterados"
+        ))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=200)),
+                ('last_modified', models.CharField(blank=True, max_length=100)),
+                ('hash_catalogo', models.CharField(blank=True, max_length=64)),
+                ('data_verificacao', models.DateTimeField(blank=True, null=True)),
+                ('data_alteracao', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Estado do Catálogo',
+                'verbose_name_plural': 'Estados do Catálogo',
+            },
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='hash_conteudo',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='AlteracaoProduto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('titulo', 'Título'), ('preco_vista', 'Preço à Vista'), ('preco_prazo', 'Preço a Prazo')], max_length=15)),
+                ('valor_anterior', models.TextField()),
+                ('valor_novo', models.TextField()),
+                ('data', models.DateTimeField(default=django.utils.timezone.now)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alteracoes', to='loja.produto')),
+            ],
+            options={
+                'verbose_name': 'Alteração de Produto',
+                'verbose_name_plural': 'Alterações de Produtos',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:09
+
+import django.db.models.deletion
+import loja.models
+from django.db import migrations, models
+
+# Índice de texto completo dos produtos (ver loja.models.ProdutoBusca). O
+# tokenizer ignora acentos e maiúsculas e os índices de prefixo de 2 e 3
+# caracteres atendem a busca enquanto se digita.
+CATEGORIA = "COALESCE((SELECT nome FROM loja_categoriaproduto WHERE id = new.categoria_id), '')"
+
+CRIAR_BUSCA = [
+    """
+    CREATE VIRTUAL TABLE loja_produto_busca USING fts5(
+        titulo, descricao, categoria,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    # rank = bm25 com peso 10 para o título, 1 para a descrição e 3 para a categoria
+    "INSERT INTO loja_produto_busca(loja_produto_busca, rank) VALUES ('rank', 'bm25(10.0, 1.0, 3.0)')",
+    f"""
+    CREATE TRIGGER loja_produto_busca_insert AFTER INSERT ON loja_produto BEGIN
+        INSERT INTO loja_produto_busca(rowid, titulo, descricao, categoria)
+        VALUES (new.id, new.titulo, new.descricao, {CATEGORIA});
+    END
+    """,
+    f"""
+    CREATE TRIGGER loja_produto_busca_update AFTER UPDATE OF titulo, descricao, categoria_id ON loja_produto BEGIN
+        UPDATE loja_produto_busca SET titulo = new.titulo, descricao = new.descricao, categoria = {CATEGORIA}
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER loja_produto_busca_delete AFTER DELETE ON loja_produto BEGIN
+        DELETE FROM loja_produto_busca WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER loja_categoria_busca_update AFTER UPDATE OF nome ON loja_categoriaproduto BEGIN
+        UPDATE loja_produto_busca SET categoria = new.nome
+        WHERE rowid IN (SELECT id FROM loja_produto WHERE categoria_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO loja_produto_busca(rowid, titulo, descricao, categoria)
+    SELECT p.id, p.titulo, p.descricao, COALESCE(c.nome, '')
+      FROM loja_produto p
+      LEFT JOIN loja_categoriaproduto c ON c.id = p.categoria_id
+    """,
+]
+
+REMOVER_BUSCA = [
+    'DROP TRIGGER loja_categoria_busca_update',
+    'DROP TRIGGER loja_produto_busca_delete',
+    'DROP TRIGGER loja_produto_busca_update',
+    'DROP TRIGGER loja_produto_busca_insert',
+    'DROP TABLE loja_produto_busca',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loja', '0002_catalogo_incremental'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProdutoBusca',
+            fields=[
+                ('produto', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='busca', serialize=False, to='loja.produto')),
+                ('titulo', models.TextField()),
+                ('descricao', models.TextField()),
+                ('categoria', models.TextField()),
+                ('documento', loja.models.DocumentoBusca(db_column='loja_produto_busca')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'loja_produto_busca',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CRIAR_BUSCA, REMOVER_BUSCA),
+    ]
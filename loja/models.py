@@ -1,7 +1,7 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from usuarios.models import Cliente
-import requests
 from decimal import Decimal
 
 User = get_user_model()
@@ -33,6 +33,7 @@ class Produto(models.Model):
     avaliacao = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
+    hash_conteudo = models.CharField(max_length=64, blank=True)  # SHA-256 do item da API na última sincronização
     
     class Meta:
         verbose_name = 'Produto'
@@ -48,6 +49,49 @@ class Produto(models.Model):
             self.preco_prazo = self.preco_vista * Decimal('1.10')
         super().save(*args, **kwargs)
 
+class EstadoCatalogo(models.Model):
+    """Validadores da última resposta da API de produtos, para requisições condicionais"""
+    url = models.URLField(max_length=500, unique=True)
+    etag = models.CharField(max_length=200, blank=True)
+    last_modified = models.CharField(max_length=100, blank=True)  # cabeçalho como veio da API
+    hash_catalogo = models.CharField(max_length=64, blank=True)  # SHA-256 do corpo da resposta
+    data_verificacao = models.DateTimeField(null=True, blank=True)
+    data_alteracao = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Estado do Catálogo'
+        verbose_name_plural = 'Estados do Catálogo'
+    
+    def __str__(self):
+        return self.url
+
+class AlteracaoProduto(models.Model):
+    """
+    Feed de alterações de título e preço feitas pela sincronização do catálogo.
+
+    Consumidores guardam o último id lido e buscam só as alterações seguintes
+    (ver loja.catalogo.alteracoes_desde) para invalidar o que depende delas.
+    """
+    CAMPO_CHOICES = [
+        ('titulo', 'Título'),
+        ('preco_vista', 'Preço à Vista'),
+        ('preco_prazo', 'Preço a Prazo'),
+    ]
+    
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='alteracoes')
+    campo = models.CharField(max_length=15, choices=CAMPO_CHOICES)
+    valor_anterior = models.TextField()
+    valor_novo = models.TextField()
+    data = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Alteração de Produto'
+        verbose_name_plural = 'Alterações de Produtos'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.produto_id} - {self.get_campo_display()}: {self.valor_anterior} → {self.valor_novo}"
+
 class Compra(models.Model):
     """Modelo para compras realizadas pelos clientes"""
     FORMA_PAGAMENTO_CHOICES = [
@@ -133,45 +177,36 @@ class ItemCarrinho(models.Model):
     def get_subtotal(self):
         return self.quantidade * self.produto.preco_vista
 
-# Função utilitária para sincronizar produtos da API
-def sincronizar_produtos_api():
-    """Sincroniza produtos da FakeStore API"""
-    try:
-        response = requests.get('https://fakestoreapi.com/products')
-        if response.status_code == 200:
-            produtos_api = response.json()
-            
-            for produto_data in produtos_api:
-                # Criar ou buscar categoria
-                categoria_nome = produto_data['category'].title()
-                categoria, _ = CategoriaProduto.objects.get_or_create(
-                    nome=categoria_nome,
-                    defaults={'descricao': f'Categoria {categoria_nome}'}
-                )
-                
-                # Criar ou atualizar produto
-                produto, created = Produto.objects.get_or_create(
-                    api_id=produto_data['id'],
-                    defaults={
-                        'titulo': produto_data['title'],
-                        'descricao': produto_data['description'],
-                        'preco_vista': Decimal(str(produto_data['price'])),
-                        'categoria': categoria,
-                        'imagem_url': produto_data['image'],
-                        'avaliacao': Decimal(str(produto_data['rating']['rate'])),
-                    }
-                )
-                
-                if not created:
-                    # Atualizar produto existente
-                    produto.titulo = produto_data['title']
-                    produto.descricao = produto_data['description']
-                    produto.preco_vista = Decimal(str(produto_data['price']))
-                    produto.imagem_url = produto_data['image']
-                    produto.avaliacao = Decimal(str(produto_data['rating']['rate']))
-                    produto.save()
-            
-            return True
-    except Exception as e:
-        print(f"Erro ao sincronizar produtos: {e}")
-        return False
+class DocumentoBusca(models.TextField):
+    """Coluna oculta com o nome da tabela FTS5, que aceita o operador MATCH"""
+
+@DocumentoBusca.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+    
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+class ProdutoBusca(models.Model):
+    """
+    Índice de texto completo (FTS5) com título, descrição e categoria de cada produto.
+
+    A tabela virtual só existe no SQLite: é criada pela migração 0003 e mantida
+    por triggers em loja_produto e loja_categoriaproduto, que também cobrem os
+    bulk_create/bulk_update da sincronização do catálogo. Ver loja.busca.
+    """
+    produto = models.OneToOneField(
+        Produto, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        related_name='busca', db_constraint=False,
+    )
+    titulo = models.TextField()
+    descricao = models.TextField()
+    categoria = models.TextField()
+    documento = DocumentoBusca(db_column='loja_produto_busca')
+    rank = models.FloatField()  # bm25 com os pesos configurados na migração
+    
+    class Meta:
+        managed = False
+        db_table = 'loja_produto_busca'
@@ -1,3 +1,295 @@
-from django.test import TestCase
+import copy
+import hashlib
+import io
+import json
+import threading
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+import requests
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from usuarios.models import Usuario, Cliente
+from .busca import buscar, consulta_fts, por_relevancia
+from .catalogo import SincronizacaoError, alteracoes_desde, sincronizar_produtos_api
+from .models import CategoriaProduto, Produto, EstadoCatalogo
+
+# Amostra de https://fakestoreapi.com/products, no formato da API
+CATALOGO = json.loads((Path(__file__).parent / 'testdata' / 'fakestore_produtos.json').read_text())
+
+
+class FakeStoreHandler(BaseHTTPRequestHandler):
+    """Responde como a FakeStore API, com ETag e Last-Modified e suporte a requisições condicionais"""
+
+    def do_GET(self):
+        servidor = self.server
+        servidor.requisicoes.append(dict(self.headers))
+        if servidor.erro:
+            self.send_response(servidor.erro)
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == servidor.etag or (
+            'If-None-Match' not in self.headers and self.headers.get('If-Modified-Since') == servidor.last_modified
+        ):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(servidor.corpo)))
+        if servidor.com_validadores:
+            self.send_header('ETag', servidor.etag)
+            self.send_header('Last-Modified', servidor.last_modified)
+        self.end_headers()
+        self.wfile.write(servidor.corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class SincronizacaoProdutosTests(TestCase):
+    """Sincronização do catálogo com um servidor local no lugar da FakeStore API"""
+
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), FakeStoreHandler)
+        self.servidor.requisicoes = []
+        self.servidor.erro = None
+        self.servidor.com_validadores = True
+        self.publicar(CATALOGO)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+
+        url = f'http://127.0.0.1:{self.servidor.server_address[1]}/products'
+        configuracao = override_settings(FAKESTORE_API_URL=url)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def publicar(self, catalogo):
+        """Troca o catálogo servido, como uma nova versão da API"""
+        self.servidor.corpo = json.dumps(catalogo).encode()
+        self.servidor.etag = f'"{hashlib.md5(self.servidor.corpo).hexdigest()}"'
+        self.servidor.last_modified = f'Sun, 18 Oct 2026 {len(self.servidor.requisicoes) % 24:02d}:00:00 GMT'
+
+    def sincronizar(self, catalogo=None):
+        if catalogo is not None:
+            self.publicar(catalogo)
+        return sincronizar_produtos_api()
+
+    def test_primeira_sincronizacao_insere_tudo(self):
+        self.assertEqual(
+            self.sincronizar(), {'inseridos': 5, 'atualizados': 0, 'inalterados': 0, 'nao_modificado': False}
+        )
+
+        self.assertEqual(
+            sorted(CategoriaProduto.objects.values_list('nome', flat=True)),
+            ['Electronics', 'Jewelery', "Men'S Clothing"],
+        )
+        mochila = Produto.objects.get(api_id=1)
+        self.assertEqual(mochila.preco_vista, Decimal('109.95'))
+        self.assertEqual(mochila.preco_prazo, Decimal('120.94'))
+        self.assertEqual(mochila.avaliacao, Decimal('3.90'))
+        self.assertEqual(mochila.categoria.nome, "Men'S Clothing")
+        self.assertEqual(len(mochila.hash_conteudo), 64)
+        self.assertFalse(alteracoes_desde().exists())
+
+    def test_requisicao_com_timeout(self):
+        with mock.patch('loja.catalogo.requests.get', wraps=requests.get) as get:
+            self.sincronizar()
+        self.assertEqual(get.call_args.kwargs['timeout'], settings.FAKESTORE_API_TIMEOUT)
+
+    def test_304_encerra_sem_ler_produtos(self):
+        self.sincronizar()
+        self.assertNotIn('If-None-Match', self.servidor.requisicoes[0])
+
+        with self.assertNumQueries(2):  # estado do catálogo + data da verificação
+            resultado = self.sincronizar()
+
+        self.assertTrue(resultado['nao_modificado'])
+        self.assertEqual(self.servidor.requisicoes[1]['If-None-Match'], self.servidor.etag)
+        self.assertEqual(self.servidor.requisicoes[1]['If-Modified-Since'], self.servidor.last_modified)
+        self.assertIsNotNone(EstadoCatalogo.objects.get().data_verificacao)
+
+    def test_corpo_inalterado_sem_validadores(self):
+        self.servidor.com_validadores = False
+        self.sincronizar()
+
+        with self.assertNumQueries(2):
+            resultado = self.sincronizar()
+
+        self.assertTrue(resultado['nao_modificado'])
+        self.assertNotIn('If-None-Match', self.servidor.requisicoes[1])
+
+    def test_produtos_com_hash_igual_nao_sao_lidos(self):
+        self.sincronizar()
+        catalogo = copy.deepcopy(CATALOGO)
+        catalogo[2]['price'] = 650
+
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = self.sincronizar(catalogo)
+
+        self.assertEqual(resultado, {'inseridos': 0, 'atualizados': 1, 'inalterados': 4, 'nao_modificado': False})
+        # Só o produto alterado é carregado por inteiro
+        carregados = [
+            q['sql'] for q in consultas
+            if q['sql'].startswith('SELECT') and '"loja_produto"."descricao"' in q['sql']
+        ]
+        self.assertEqual(len(carregados), 1)
+        self.assertIn('IN (5)', carregados[0])
+
+    def test_atualiza_so_os_campos_alterados(self):
+        self.sincronizar()
+        Produto.objects.filter(api_id=9).update(preco_prazo=Decimal('99.00'))  # definido à mão
+        catalogo = copy.deepcopy(CATALOGO)
+        catalogo[0]['price'] = 99.9
+        catalogo[3]['price'] = 59.9
+        catalogo[4]['title'] = 'SanDisk SSD PLUS 2TB'
+        catalogo[1]['rating']['count'] = 300  # não é gravado
+        catalogo.append(dict(catalogo[1], id=20, category='office'))
+
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = self.sincronizar(catalogo)
+
+        self.assertEqual(resultado, {'inseridos': 1, 'atualizados': 3, 'inalterados': 2, 'nao_modificado': False})
+        updates = [q['sql'] for q in consultas if q['sql'].startswith('UPDATE "loja_produto"')]
+        self.assertEqual(len(updates), 4)  # um por conjunto de campos alterados
+        self.assertFalse(any('"descricao"' in sql for sql in updates))
+        self.assertEqual(Produto.objects.get(api_id=1).preco_prazo, Decimal('109.89'))
+        self.assertEqual(Produto.objects.get(api_id=9).preco_prazo, Decimal('99.00'))
+        self.assertEqual(Produto.objects.get(api_id=10).titulo, 'SanDisk SSD PLUS 2TB')
+        self.assertEqual(Produto.objects.get(api_id=20).categoria.nome, 'Office')
+
+        # Na sincronização seguinte, o produto 2 já não difere pelo hash
+        catalogo[0]['price'] = 89.9
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.sincronizar(catalogo)['atualizados'], 1)
+        updates = [q['sql'] for q in consultas if q['sql'].startswith('UPDATE "loja_produto"')]
+        self.assertEqual(len(updates), 1)
+
+    def test_feed_de_alteracoes_de_titulo_e_preco(self):
+        self.sincronizar()
+        catalogo = copy.deepcopy(CATALOGO)
+        catalogo[0]['price'] = 99.9
+        catalogo[4]['title'] = 'SanDisk SSD PLUS 2TB'
+        catalogo[4]['description'] = 'Nova descrição'
+        self.sincronizar(catalogo)
+
+        alteracoes = [(a.produto.api_id, a.campo, a.valor_anterior, a.valor_novo) for a in alteracoes_desde()]
+        self.assertEqual(alteracoes, [
+            (1, 'preco_vista', '109.95', '99.90'),
+            (1, 'preco_prazo', '120.94', '109.89'),
+            (10, 'titulo', 'SanDisk SSD PLUS 1TB Internal SSD - SATA III 6 Gb/s', 'SanDisk SSD PLUS 2TB'),
+        ])
+
+        ultimo = alteracoes_desde().last().id
+        catalogo[3]['price'] = 59.9
+        self.sincronizar(catalogo)
+        self.assertEqual(
+            [(a.produto.api_id, a.campo) for a in alteracoes_desde(ultimo)],
+            [(9, 'preco_vista'), (9, 'preco_prazo')],
+        )
+
+    def test_falha_da_api(self):
+        with mock.patch('loja.catalogo.requests.get', side_effect=requests.Timeout('timeout')):
+            with self.assertRaises(SincronizacaoError):
+                sincronizar_produtos_api()
+        self.servidor.erro = 503
+        with self.assertRaises(SincronizacaoError):
+            self.sincronizar()
+        self.servidor.erro = None
+        with self.assertRaises(SincronizacaoError):
+            self.sincronizar([{'id': 1, 'title': 'Sem categoria'}])
+        self.assertFalse(Produto.objects.exists())
+        # Nada gravado: a próxima sincronização pede o catálogo inteiro
+        self.assertEqual(EstadoCatalogo.objects.get().etag, '')
+
+    def test_comando_informa_as_quantidades(self):
+        saida = io.StringIO()
+        call_command('sincronizar_produtos', stdout=saida)
+        self.assertIn('5 inseridos, 0 atualizados, 0 inalterados', saida.getvalue())
+
+        saida = io.StringIO()
+        call_command('sincronizar_produtos', stdout=saida)
+        self.assertIn('Catálogo inalterado', saida.getvalue())
+
+        self.servidor.erro = 500
+        with self.assertRaises(CommandError):
+            call_command('sincronizar_produtos', stdout=io.StringIO())
+
+
+class BuscaProdutosTests(TestCase):
+    """Busca de texto completo (FTS5) em título, descrição e categoria"""
+
+    @classmethod
+    def setUpTestData(cls):
+        eletronicos = CategoriaProduto.objects.create(nome='Eletrônicos')
+        casa = CategoriaProduto.objects.create(nome='Casa')
+        cls.celular = Produto.objects.create(
+            titulo='Celular Samsung Galaxy', descricao='Tela de 6 polegadas', preco_vista=Decimal('1500'),
+            categoria=eletronicos,
+        )
+        cls.capa = Produto.objects.create(
+            titulo='Capa protetora', descricao='Compatível com Samsung Galaxy', preco_vista=Decimal('50'),
+            categoria=eletronicos,
+        )
+        cls.cafeteira = Produto.objects.create(
+            titulo='Cafeteira elétrica', descricao='Café coado em minutos', preco_vista=Decimal('200'), categoria=casa,
+        )
+        usuario = Usuario.objects.create_user(username='lia', password='senha-segura-123', tipo_usuario='cliente')
+        Cliente.objects.create(usuario=usuario, cpf='12312312312')
+        cls.usuario = usuario
+
+    def ids(self, busca):
+        return list(por_relevancia(buscar(Produto.objects.all(), busca)).values_list('id', flat=True))
+
+    def test_prefixo_acentos_e_relevancia(self):
+        # Título pesa mais que descrição
+        self.assertEqual(self.ids('sams'), [self.celular.id, self.capa.id])
+        self.assertEqual(self.ids('CAFE'), [self.cafeteira.id])
+        self.assertCountEqual(self.ids('eletronicos'), [self.celular.id, self.capa.id])
+        self.assertEqual(self.ids('galaxy capa'), [self.capa.id])
+        self.assertEqual(self.ids('geladeira'), [])
+
+    def test_texto_digitado_nao_vira_operador(self):
+        self.assertEqual(consulta_fts('capa" OR (NEAR'), '"capa"* "OR"* "NEAR"*')
+        self.assertEqual(self.ids('capa" OR (NEAR'), [])
+        self.assertEqual(self.ids('?!'), [])
+
+    def test_indice_acompanha_as_alteracoes(self):
+        Produto.objects.filter(pk=self.capa.pk).update(titulo='Película de vidro', descricao='Para celulares')
+        self.assertEqual(self.ids('capa'), [])
+        self.assertEqual(self.ids('pelicula'), [self.capa.id])
+
+        CategoriaProduto.objects.filter(nome='Casa').update(nome='Cozinha')
+        self.assertEqual(self.ids('cozinha'), [self.cafeteira.id])
+
+        self.cafeteira.delete()
+        self.assertEqual(self.ids('cafe'), [])
+
+    def test_lista_de_produtos_ordena_por_relevancia(self):
+        self.client.force_login(self.usuario)
+
+        response = self.client.get(reverse('loja:produtos'), {'busca': 'samsung'})
+        self.assertEqual([p.id for p in response.context['page_obj']], [self.celular.id, self.capa.id])
+
+        response = self.client.get(reverse('loja:produtos'), {'busca': 'samsung', 'ordenacao': 'preco_vista'})
+        self.assertEqual([p.id for p in response.context['page_obj']], [self.capa.id, self.celular.id])
+
+    def test_sugestoes_enquanto_digita(self):
+        self.client.force_login(self.usuario)
+        Produto.objects.filter(pk=self.capa.pk).update(ativo=False)
+
+        dados = self.client.get(reverse('loja:sugestoes_produtos'), {'q': 'gal'}).json()
+        self.assertEqual(dados, {
+            'success': True,
+            'sugestoes': [{'id': self.celular.id, 'titulo': 'Celular Samsung Galaxy', 'preco': '1500.00'}],
+        })
+        self.assertEqual(self.client.get(reverse('loja:sugestoes_produtos'), {'q': 'g'}).json()['sugestoes'], [])
 
-# Create your tests here.
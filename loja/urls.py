@@ -6,6 +6,7 @@ app_name = 'loja'
 urlpatterns = [
     path('', views.loja_home, name='home'),
     path('produtos/', views.lista_produtos, name='produtos'),
+    path('produtos/sugestoes/', views.sugestoes_produtos, name='sugestoes_produtos'),
     path('produto/<int:produto_id>/', views.detalhes_produto, name='produto_detalhes'),
     path('carrinho/', views.carrinho, name='carrinho'),
     path('adicionar-carrinho/<int:produto_id>/', views.adicionar_carrinho, name='adicionar_carrinho'),
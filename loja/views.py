@@ -6,7 +6,11 @@ from django.http import JsonResponse
 from django.db import transaction
 from django.core.paginator import Paginator
 from .models import Produto, CategoriaProduto, CarrinhoCompras, ItemCarrinho, Compra, ItemCompra
+from .busca import buscar, por_relevancia, sugestoes
 from usuarios.models import Cliente
+from usuarios.idempotencia import idempotente
+from usuarios.middleware import cliente_da_requisicao
+from usuarios.services import debitar, SaldoInsuficienteError
 from faturas.models import processar_compra_parcelada
 from decimal import Decimal
 import json
@@ -24,7 +28,7 @@ def loja_home(request):
     
     # Buscar carrinho do cliente
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         carrinho, _ = CarrinhoCompras.objects.get_or_create(cliente=cliente)
         quantidade_carrinho = carrinho.get_quantidade_total()
     except Cliente.DoesNotExist:
@@ -51,17 +55,20 @@ def lista_produtos(request):
     # Filtros
     categoria_id = request.GET.get('categoria')
     busca = request.GET.get('busca')
-    ordenacao = request.GET.get('ordenacao', '-data_criacao')
+    ordenacao = request.GET.get('ordenacao', '')
     
     if categoria_id:
         produtos = produtos.filter(categoria_id=categoria_id)
     
     if busca:
-        produtos = produtos.filter(titulo__icontains=busca)
+        # Índice de texto completo em título, descrição e categoria (ver loja.busca)
+        produtos = buscar(produtos, busca)
     
-    # Ordenação
-    if ordenacao in ['preco_vista', '-preco_vista', 'titulo', '-titulo', 'avaliacao', '-avaliacao']:
+    # Ordenação (sem escolha explícita: relevância na busca, mais recentes fora dela)
+    if ordenacao in ['preco_vista', '-preco_vista', 'titulo', '-titulo', 'avaliacao', '-avaliacao', '-data_criacao']:
         produtos = produtos.order_by(ordenacao)
+    elif busca:
+        produtos = por_relevancia(produtos)
     else:
         produtos = produtos.order_by('-data_criacao')
     
@@ -72,7 +79,7 @@ def lista_produtos(request):
     
     # Buscar carrinho do cliente
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         carrinho, _ = CarrinhoCompras.objects.get_or_create(cliente=cliente)
         quantidade_carrinho = carrinho.get_quantidade_total()
     except Cliente.DoesNotExist:
@@ -89,6 +96,17 @@ def lista_produtos(request):
     
     return render(request, 'loja/produtos.html', context)
 
+@login_required
+def sugestoes_produtos(request):
+    """Produtos para a busca enquanto o cliente digita (AJAX)"""
+    return JsonResponse({
+        'success': True,
+        'sugestoes': [
+            {'id': produto['id'], 'titulo': produto['titulo'], 'preco': str(produto['preco_vista'])}
+            for produto in sugestoes(request.GET.get('q', ''))
+        ],
+    })
+
 @login_required
 def detalhes_produto(request, produto_id):
     """Detalhes de um produto específico"""
@@ -106,7 +124,7 @@ def detalhes_produto(request, produto_id):
     
     # Buscar carrinho do cliente
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         carrinho, _ = CarrinhoCompras.objects.get_or_create(cliente=cliente)
         quantidade_carrinho = carrinho.get_quantidade_total()
     except Cliente.DoesNotExist:
@@ -131,7 +149,7 @@ def adicionar_carrinho(request, produto_id):
         return JsonResponse({'success': False, 'message': 'Apenas clientes podem comprar'})
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         produto = get_object_or_404(Produto, id=produto_id, ativo=True)
         quantidade = int(request.POST.get('quantidade', 1))
         
@@ -170,7 +188,7 @@ def carrinho(request):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         carrinho, _ = CarrinhoCompras.objects.get_or_create(cliente=cliente)
         itens = carrinho.itens.all()
         
@@ -189,6 +207,7 @@ def carrinho(request):
 
 @login_required
 @csrf_protect
+@idempotente
 def finalizar_compra(request):
     """Finalizar compra do carrinho"""
     if request.method != 'POST':
@@ -199,6 +218,7 @@ def finalizar_compra(request):
         return redirect('usuarios:home_redirect')
     
     try:
+        # Lido do banco, e não de request.cliente: saldo e limite precisam estar atualizados
         cliente = Cliente.objects.get(usuario=request.user)
         carrinho = CarrinhoCompras.objects.get(cliente=cliente)
         
@@ -231,48 +251,56 @@ def finalizar_compra(request):
                 return redirect('loja:carrinho')
         
         # Processar compra
-        with transaction.atomic():
-            # Criar compra
-            compra = Compra.objects.create(
-                cliente=cliente,
-                valor_total=total,
-                forma_pagamento=forma_pagamento,
-                parcelas=parcelas
-            )
-            
-            # Criar itens da compra
-            for item in carrinho.itens.all():
-                preco = item.produto.preco_vista if forma_pagamento == 'saldo' else item.produto.preco_prazo
-                ItemCompra.objects.create(
-                    compra=compra,
-                    produto=item.produto,
-                    quantidade=item.quantidade,
-                    preco_unitario=preco,
-                    valor_total=item.quantidade * preco
-                )
-            
-            # Processar pagamento
-            if forma_pagamento == 'saldo':
-                cliente.saldo -= total
-                cliente.save()
-            else:  # crédito
-                cliente.limite_credito -= total
-                cliente.save()
-                
-                # Processar parcelamento se necessário
-                if parcelas > 1:
-                    processar_compra_parcelada(compra, parcelas)
-            
-            # Limpar carrinho
-            carrinho.itens.all().delete()
-            
-            messages.success(request, f'Compra realizada com sucesso! Número do pedido: {compra.id}')
-            return redirect('loja:compras')
+        try:
+            compra = _registrar_compra(cliente, carrinho, forma_pagamento, parcelas, total)
+        except SaldoInsuficienteError:
+            messages.error(request, 'Saldo insuficiente.')
+            return redirect('loja:carrinho')
+
+        messages.success(request, f'Compra realizada com sucesso! Número do pedido: {compra.id}')
+        return redirect('loja:compras')
             
     except Exception as e:
         messages.error(request, 'Erro ao processar compra. Tente novamente.')
         return redirect('loja:carrinho')
 
+def _registrar_compra(cliente, carrinho, forma_pagamento, parcelas, total):
+    """Grava a compra e o pagamento em uma transação; no saldo, o débito entra no extrato"""
+    with transaction.atomic():
+        # Criar compra
+        compra = Compra.objects.create(
+            cliente=cliente,
+            valor_total=total,
+            forma_pagamento=forma_pagamento,
+            parcelas=parcelas
+        )
+        
+        # Criar itens da compra
+        for item in carrinho.itens.all():
+            preco = item.produto.preco_vista if forma_pagamento == 'saldo' else item.produto.preco_prazo
+            ItemCompra.objects.create(
+                compra=compra,
+                produto=item.produto,
+                quantidade=item.quantidade,
+                preco_unitario=preco,
+                valor_total=item.quantidade * preco
+            )
+        
+        # Processar pagamento
+        if forma_pagamento == 'saldo':
+            debitar(cliente, total, 'compra', f'Compra #{compra.id}')
+        else:  # crédito
+            cliente.limite_credito -= total
+            cliente.save(update_fields=['limite_credito'])
+            
+            # Processar parcelamento se necessário
+            if parcelas > 1:
+                processar_compra_parcelada(compra, parcelas)
+        
+        # Limpar carrinho
+        carrinho.itens.all().delete()
+    return compra
+
 @login_required
 def compras(request):
     """Lista compras do cliente"""
@@ -281,7 +309,7 @@ def compras(request):
         return redirect('usuarios:home_redirect')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
         
         # Filtro por status
         status_filtro = request.GET.get('status', '')
@@ -531,6 +531,42 @@ function updateChart(chart, newLabels, newData) {
     chart.update('active');
 }
 
+// Buscar série JSON do servidor (/graficos/...)
+// cache: 'no-cache' guarda a resposta mas revalida com ETag/Last-Modified:
+// sem movimentação nova o servidor responde 304 sem recalcular a série
+async function fetchSeries(url, params = {}) {
+    const query = new URLSearchParams(params).toString();
+    const response = await fetch(query ? `${url}?${query}` : url, {
+        cache: 'no-cache',
+        credentials: 'same-origin',
+        headers: { 'Accept': 'application/json' }
+    });
+    const dados = await response.json();
+    if (!response.ok || !dados.success) {
+        throw new Error(dados.message || `Erro ${response.status} ao carregar ${url}`);
+    }
+    return dados;
+}
+
+// Pontos que cabem no canvas (parâmetro max_pontos das séries):
+// mais de um ponto por pixel não aparece no gráfico, só pesa na resposta.
+// O servidor aceita de 3 a 5000 (series.MAX_PONTOS_LIMITE)
+function maxPointsFor(canvasId) {
+    const canvas = document.getElementById(canvasId);
+    const largura = canvas ? canvas.clientWidth : 0;
+    return Math.min(5000, Math.max(3, Math.floor((largura || 600) / 2)));
+}
+
+// Formatar rótulo AAAA-MM-DD para exibição
+function formatSeriesLabel(label, intervalo = 'dia') {
+    const [ano, mes, dia] = label.split('-');
+    const data = new Date(ano, mes - 1, dia);
+    if (intervalo === 'mes') {
+        return data.toLocaleDateString('pt-BR', { month: 'short', year: '2-digit' });
+    }
+    return data.toLocaleDateString('pt-BR', { day: '2-digit', month: 'short' });
+}
+
 // Exportar para uso global
 window.GalaxyCharts = {
     createLineChart,
@@ -542,6 +578,9 @@ window.GalaxyCharts = {
     generateColors,
     animateValue,
     updateChart,
+    fetchSeries,
+    maxPointsFor,
+    formatSeriesLabel,
     colors: modernColors
 };
 
@@ -0,0 +1,66 @@
+"""
+Redução de séries longas antes de enviá-las aos gráficos.
+
+Linhas (saldo) usam Largest-Triangle-Three-Buckets: os pontos internos são
+divididos em baldes e de cada balde fica o ponto que forma o maior triângulo
+com o ponto escolhido no balde anterior e a média do balde seguinte, o que
+preserva picos e vales. Barras (entradas/saídas) são somadas em grupos de
+baldes vizinhos, para os totais continuarem batendo.
+"""
+
+import numpy as np
+
+
+def lttb(valores, max_pontos):
+    """
+    Índices dos pontos mantidos pelo LTTB, em ordem crescente.
+
+    Os pontos são tratados como igualmente espaçados no eixo x (um por
+    balde de dia, semana ou mês). O primeiro e o último sempre ficam.
+    """
+    y = np.asarray(valores, dtype=float)
+    n = len(y)
+    if max_pontos >= n or max_pontos < 3:
+        return np.arange(n)
+
+    # Limites dos max_pontos - 2 baldes internos, cobrindo os índices 1..n-2
+    limites = np.linspace(1, n - 1, max_pontos - 1).astype(int)
+    tamanhos = np.diff(limites)
+    x = np.arange(n, dtype=float)
+
+    # Média de cada balde via soma acumulada; o último "próximo balde" é o ponto final
+    soma_x = np.concatenate(([0.0], np.cumsum(x)))
+    soma_y = np.concatenate(([0.0], np.cumsum(y)))
+    media_x = (soma_x[limites[1:]] - soma_x[limites[:-1]]) / tamanhos
+    media_y = (soma_y[limites[1:]] - soma_y[limites[:-1]]) / tamanhos
+    proximo_x = np.append(media_x[1:], x[-1])
+    proximo_y = np.append(media_y[1:], y[-1])
+
+    indices = np.empty(max_pontos, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for balde in range(max_pontos - 2):
+        inicio, fim = limites[balde], limites[balde + 1]
+        ax, ay = x[anterior], y[anterior]
+        # Dobro da área do triângulo (anterior, candidato, média do próximo balde)
+        areas = np.abs(
+            (ax - proximo_x[balde]) * (y[inicio:fim] - ay)
+            - (ax - x[inicio:fim]) * (proximo_y[balde] - ay)
+        )
+        anterior = inicio + int(np.argmax(areas))
+        indices[balde + 1] = anterior
+    return indices
+
+
+def somar_em_grupos(valores, max_pontos):
+    """
+    (índices iniciais, somas) de até `max_pontos` grupos de pontos vizinhos.
+
+    Para barras: cada grupo soma os baldes que substitui.
+    """
+    y = np.asarray(valores, dtype=float)
+    n = len(y)
+    if max_pontos >= n or max_pontos < 1:
+        return np.arange(n), y
+    inicios = np.unique(np.linspace(0, n, max_pontos + 1).astype(int)[:-1])
+    return inicios, np.add.reduceat(y, inicios)
@@ -1,13 +1,39 @@
-from django.contrib.auth.backends import BaseBackend
+from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+
+from .cache_usuario import carregar_usuario
+from .senhas import gerar_hash, verificar_senha
 
 User = get_user_model()
 
-class EmailOrUsernameModelBackend(BaseBackend):
+class EmailOrUsernameModelBackend(ModelBackend):
     """
-    Backend de autenticação que permite login com email ou username
+    Backend de autenticação que permite login com email ou username.
+
+    Substitui o ModelBackend em AUTHENTICATION_BACKENDS (a busca cobre o
+    username exato dele) e herda as permissões; só confere a senha de
+    usuários ativos, para não regravar o hash de uma conta desativada.
     """
+    def _candidatos(self, username):
+        # Permite login com email ou username, sem diferenciar maiúsculas.
+        # LOWER(coluna) = LOWER(valor) usa os índices funcionais de Usuario;
+        # o iexact (LIKE/UPPER) não usa índice e varre a tabela inteira. Os
+        # dois lados passam pelo LOWER do banco: o do SQLite só converte A-Z,
+        # e um str.lower() no valor não casaria com emails acentuados.
+        valor = Lower(Value(username))
+        return (
+            User.objects.alias(email_lower=Lower('email'))
+            .annotate(username_lower=Lower('username'), valor_lower=valor)
+            .filter(Q(username_lower=valor) | Q(email_lower=valor))[:2]
+        )
+
+    def _ordenar(self, candidatos):
+        # O username de um usuário pode ser igual ao email de outro: tenta
+        # primeiro quem tem o username informado
+        return sorted(candidatos, key=lambda u: u.username_lower != u.valor_lower)
+
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None:
             username = kwargs.get(User.USERNAME_FIELD)
@@ -15,16 +41,33 @@ class EmailOrUsernameModelBackend(BaseBackend):
         if username is None or password is None:
             return None
         
-        try:
-            # Permite login com email ou username
-            user = User.objects.get(
-                Q(username__iexact=username) | Q(email__iexact=username)
-            )
-        except User.DoesNotExist:
+        ativos = [user for user in self._candidatos(username) if self.user_can_authenticate(user)]
+        for user in self._ordenar(ativos):
+            if user.check_password(password):
+                return user
+        if not ativos:
+            # Gasta o mesmo tempo de um usuário existente, para não revelar
+            # quais usernames/emails estão cadastrados
+            User().set_password(password)
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """
+        Versão assíncrona (login_view): a busca roda no banco e o hash da
+        senha no pool de usuarios.senhas, fora da thread das views e do loop.
+        """
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+
+        if username is None or password is None:
             return None
-        
-        if user.check_password(password) and self.user_can_authenticate(user):
-            return user
+
+        ativos = [user async for user in self._candidatos(username) if self.user_can_authenticate(user)]
+        for user in self._ordenar(ativos):
+            if await verificar_senha(user, password):
+                return user
+        if not ativos:
+            await gerar_hash(password)  # mesmo tempo de um usuário existente
         return None
     
     def user_can_authenticate(self, user):
@@ -34,7 +77,7 @@ class EmailOrUsernameModelBackend(BaseBackend):
         return getattr(user, 'is_active', True)
     
     def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
\ No newline at end of file
+        # Usuário com o perfil (cliente/gerente) em uma consulta, em cache por
+        # alguns segundos: roda em toda requisição autenticada
+        usuario = carregar_usuario(user_id)
+        return usuario if usuario is not None and self.user_can_authenticate(usuario) else None
@@ -0,0 +1,38 @@
+"""
+Filtro de Bloom: conjunto probabilístico que responde "com certeza não está"
+ou "talvez esteja" usando poucos bits por elemento.
+
+Cada valor liga `hashes` bits de um bytearray, escolhidos por hashing duplo
+sobre um único blake2b. Não há remoção; a taxa de falsos positivos sobe se
+o filtro receber mais elementos que a capacidade para a qual foi criado.
+"""
+
+import hashlib
+import math
+
+
+class FiltroBloom:
+    def __init__(self, capacidade, taxa_erro=0.01):
+        capacidade = max(int(capacidade), 1)
+        self.bits = max(int(-capacidade * math.log(taxa_erro) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.bits / capacidade * math.log(2)), 1)
+        self.capacidade = capacidade
+        self.elementos = 0
+        self._dados = bytearray((self.bits + 7) // 8)
+
+    def _posicoes(self, valor):
+        digest = hashlib.blake2b(valor.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def adicionar(self, valor):
+        for posicao in self._posicoes(valor):
+            self._dados[posicao >> 3] |= 1 << (posicao & 7)
+        self.elementos += 1
+
+    def __contains__(self, valor):
+        return all(self._dados[posicao >> 3] & (1 << (posicao & 7)) for posicao in self._posicoes(valor))
+
+    def __len__(self):
+        return self.elementos
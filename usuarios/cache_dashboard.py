@@ -0,0 +1,63 @@
+"""
+Cache do dashboard do cliente.
+
+Cada cliente tem no cache um contador de versão, incrementado após o commit
+de toda gravação de transações dele (ver services.registrar_transacoes). As
+últimas transações, os totais do mês e os fragmentos de template do
+dashboard são guardados sob a versão atual: uma gravação os invalida sem
+precisar apagar chave por chave, e as visitas seguintes não consultam
+transações nem resumos.
+
+O contador só invalida o dashboard em todos os processos porque o cache é
+compartilhado entre eles (ver CACHES em settings).
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+def ttl():
+    return getattr(settings, 'DASHBOARD_CLIENTE_TTL', 60 * 15)
+
+
+def _chave_versao(cliente_id):
+    return f'usuarios:dashboard:versao:{cliente_id}'
+
+
+def versao_dashboard(cliente_id):
+    """Versão atual do dashboard do cliente"""
+    chave = _chave_versao(cliente_id)
+    versao = cache.get(chave)
+    if versao is None:
+        # Começa de um valor novo (e não de 1) para nunca reaproveitar dados
+        # de uma versão antiga caso o contador seja expulso do cache
+        cache.add(chave, time.time_ns(), None)
+        versao = cache.get(chave)
+    return versao
+
+
+def invalidar_dashboard(cliente_ids):
+    for cliente_id in set(cliente_ids):
+        try:
+            cache.incr(_chave_versao(cliente_id))
+        except ValueError:
+            pass  # sem contador em cache: a próxima leitura já cria uma versão nova
+
+
+def invalidar_apos_commit(cliente_ids):
+    """Incrementa as versões quando a transação atual for confirmada"""
+    cliente_ids = set(cliente_ids)
+    transaction.on_commit(lambda: invalidar_dashboard(cliente_ids))
+
+
+def dados_dashboard(cliente, versao, calcular):
+    """
+    Dados do dashboard na versão informada; `calcular` só roda quando não
+    estão em cache. A chave inclui o mês, pois os totais recomeçam a cada mês.
+    """
+    chave = f'usuarios:dashboard:{cliente.pk}:{versao}:{timezone.localdate():%Y%m}'
+    return cache.get_or_set(chave, calcular, ttl())
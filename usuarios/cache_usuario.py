@@ -0,0 +1,67 @@
+"""
+Cache do usuário autenticado e do seu perfil.
+
+O backend de autenticação carrega o usuário com o perfil de cliente ou de
+gerente em uma única consulta (select_related) e o guarda no cache por até
+USUARIO_CACHE_TTL segundos; o PerfilMiddleware expõe o perfil em
+request.cliente / request.gerente. Assim uma página autenticada não consulta
+usuário nem perfil enquanto o cache estiver quente.
+
+Saves e exclusões de Usuario, Cliente e Gerente invalidam a entrada (ver
+usuarios.signals); as gravações de transações, que alteram o saldo com
+UPDATE, invalidam os clientes envolvidos (ver services.registrar_transacoes).
+As invalidações valem para todos os processos porque o cache é compartilhado
+(ver CACHES em settings). O usuário em cache inclui o hash da senha e o
+is_active, então com um cache de cada processo (LocMemCache) uma troca de
+senha ou desativação feita em um processo não chegaria aos outros: nesse caso
+o usuário não é guardado e vem sempre do banco.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+
+def ttl():
+    return getattr(settings, 'USUARIO_CACHE_TTL', 30)
+
+
+def _chave(usuario_id):
+    return f'usuarios:usuario:{usuario_id}'
+
+
+def compartilhado():
+    """Se o cache é visto por todos os processos (o LocMemCache é de cada um)"""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def _buscar(usuario_id):
+    return (
+        get_user_model().objects.select_related('cliente', 'gerente')
+        .filter(pk=usuario_id).first()
+    )
+
+
+def carregar_usuario(usuario_id):
+    """Usuário com cliente e gerente já carregados, ou None se não existir"""
+    if not compartilhado():
+        return _buscar(usuario_id)
+    chave = _chave(usuario_id)
+    usuario = cache.get(chave)
+    if usuario is None:
+        usuario = _buscar(usuario_id)
+        if usuario is not None:
+            cache.set(chave, usuario, ttl())
+    return usuario
+
+
+def invalidar_usuarios(usuario_ids):
+    """
+    Remove os usuários do cache agora e de novo após o commit, para que uma
+    requisição concorrente não guarde a versão anterior à gravação.
+    """
+    chaves = [_chave(usuario_id) for usuario_id in set(usuario_ids)]
+    cache.delete_many(chaves)
+    transaction.on_commit(lambda: cache.delete_many(chaves))
@@ -0,0 +1,50 @@
+"""
+Estado do cadastro em etapas (registro_etapa1..3) em um cookie assinado.
+
+Os dados de cada etapa ficam em um único cookie JSON comprimido e assinado
+com a SECRET_KEY: o visitante não consegue alterar dados já validados (como
+um CPF conferido na etapa 2), e nenhuma etapa grava no django_session. A
+sessão só é criada no login que conclui o cadastro; cadastros abandonados
+não deixam linhas para trás, o cookie simplesmente expira.
+
+O cookie é HttpOnly e os dados são só assinados, não cifrados: contêm apenas
+o que o próprio visitante digitou.
+"""
+
+from django.conf import settings
+from django.core import signing
+
+COOKIE = 'galaxybank_cadastro'
+SALT = 'usuarios.cadastro'
+
+
+def idade_maxima():
+    return getattr(settings, 'CADASTRO_COOKIE_IDADE', 60 * 60)
+
+
+def ler(request):
+    """Dados das etapas já concluídas ({} se não houver cookie válido)"""
+    valor = request.COOKIES.get(COOKIE)
+    if not valor:
+        return {}
+    try:
+        return signing.loads(valor, salt=SALT, max_age=idade_maxima())
+    except signing.BadSignature:  # adulterado ou expirado
+        return {}
+
+
+def gravar(response, dados):
+    response.set_cookie(
+        COOKIE,
+        signing.dumps(dados, salt=SALT, compress=True),
+        max_age=idade_maxima(),
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
+
+
+def apagar(response):
+    response.delete_cookie(COOKIE, samesite='Lax')
+    return response
@@ -0,0 +1,150 @@
+"""
+Eventos em tempo real para os clientes (Server-Sent Events).
+
+Pub/sub em memória do processo: cada conexão aberta em /eventos/ assina o
+canal do seu cliente e recebe uma fila asyncio. As gravações publicam depois
+do commit (ver services.registrar_transacoes e o sinal de Cliente), a partir
+de qualquer thread; a entrega é agendada no loop de cada assinatura com
+call_soon_threadsafe. Uma conexão ociosa custa só a fila e a corrotina que a
+aguarda, sem thread nem consulta ao banco.
+
+Por ser em memória, só alcança conexões do mesmo processo: com vários
+workers, cada um entrega os eventos gravados por ele mesmo.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Cliente
+
+# Eventos guardados por conexão lenta; acima disso os mais antigos são descartados
+TAMANHO_FILA = 100
+
+# Tempo (ms) que o EventSource espera antes de reconectar
+RECONEXAO = 5000
+
+_assinaturas = defaultdict(set)
+_trava = threading.Lock()
+
+
+class Assinatura:
+    """Fila de eventos de uma conexão, presa ao loop que a criou"""
+
+    def __init__(self, cliente_id):
+        self.cliente_id = cliente_id
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+
+    def _entregar(self, evento):
+        # Roda no loop da assinatura
+        if self.fila.full():
+            self.fila.get_nowait()
+        self.fila.put_nowait(evento)
+
+    def entregar(self, evento):
+        """Agenda a entrega; pode ser chamado de qualquer thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._entregar, evento)
+        except RuntimeError:
+            pass  # loop já encerrado; a assinatura será cancelada
+
+
+def assinar(cliente_id):
+    """Cria a assinatura do cliente (deve ser chamado dentro do loop)"""
+    assinatura = Assinatura(cliente_id)
+    with _trava:
+        _assinaturas[cliente_id].add(assinatura)
+    return assinatura
+
+
+def cancelar(assinatura):
+    with _trava:
+        assinaturas = _assinaturas.get(assinatura.cliente_id)
+        if assinaturas is not None:
+            assinaturas.discard(assinatura)
+            if not assinaturas:
+                del _assinaturas[assinatura.cliente_id]
+
+
+def total_assinaturas():
+    with _trava:
+        return sum(len(assinaturas) for assinaturas in _assinaturas.values())
+
+
+def assinantes(cliente_ids):
+    """Dos clientes informados, os que têm alguma conexão aberta"""
+    with _trava:
+        return {cliente_id for cliente_id in cliente_ids if cliente_id in _assinaturas}
+
+
+def publicar(cliente_id, tipo, dados):
+    with _trava:
+        assinaturas = list(_assinaturas.get(cliente_id, ()))
+    for assinatura in assinaturas:
+        assinatura.entregar((tipo, dados))
+
+
+def formatar(tipo, dados):
+    """Evento no formato text/event-stream"""
+    return f'event: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n'
+
+
+def abertura(saldo):
+    """Início de todo stream: intervalo de reconexão e o saldo atual"""
+    return f'retry: {RECONEXAO}\n\n' + formatar('saldo', {'saldo': str(saldo)})
+
+
+async def fluxo(assinatura, saldo):
+    """Texto do stream: abertura e, em seguida, cada evento da assinatura"""
+    keepalive = getattr(settings, 'EVENTOS_KEEPALIVE', 25)
+    yield abertura(saldo)
+    while True:
+        try:
+            tipo, dados = await asyncio.wait_for(assinatura.fila.get(), keepalive)
+        except asyncio.TimeoutError:
+            yield ': keepalive\n\n'
+            continue
+        yield formatar(tipo, dados)
+
+
+def dados_transacao(transacao):
+    return {
+        'id': transacao.pk,
+        'tipo': transacao.tipo,
+        'tipo_display': transacao.get_tipo_display(),
+        'valor': str(transacao.valor),
+        'descricao': transacao.descricao,
+        'data': transacao.data_transacao.isoformat() if transacao.data_transacao else None,
+        'eh_entrada': transacao.eh_entrada,
+    }
+
+
+def publicar_saldos(cliente_ids):
+    """Publica o saldo atual dos clientes que têm conexões abertas"""
+    cliente_ids = assinantes(cliente_ids)
+    if not cliente_ids:
+        return
+    for cliente_id, saldo in Cliente.objects.filter(pk__in=cliente_ids).values_list('pk', 'saldo'):
+        publicar(cliente_id, 'saldo', {'saldo': str(saldo)})
+
+
+def publicar_apos_commit(transacoes):
+    """
+    Publica as transações e o novo saldo de cada cliente quando a transação
+    atual for confirmada. Sem conexões abertas, não custa nenhuma consulta.
+    """
+    transacoes = list(transacoes)
+
+    def enviar():
+        cliente_ids = assinantes({transacao.cliente_id for transacao in transacoes})
+        for transacao in transacoes:
+            if transacao.cliente_id in cliente_ids:
+                publicar(transacao.cliente_id, 'transacao', dados_transacao(transacao))
+        publicar_saldos(cliente_ids)
+
+    transaction.on_commit(enviar)
@@ -0,0 +1,153 @@
+"""
+Exportação de extratos em CSV e OFX.
+
+Os geradores percorrem as transações com `.iterator()` em blocos e produzem
+o arquivo em blocos de linhas, então o consumo de memória é constante qualquer que
+seja o período exportado. São feitos para uso com StreamingHttpResponse; sob
+ASGI, `em_async` os adapta para iteradores assíncronos.
+"""
+
+import csv
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .models import Transacao
+from .saldos import saldo_em
+from .livro_contabil import movimentos
+
+TAMANHO_BLOCO = 2000
+
+CAMPOS = ('id', 'data_transacao', 'tipo', 'valor', 'descricao')
+
+# Planilhas interpretam células que começam com estes caracteres como fórmulas
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Eco:
+    """Buffer falso: o csv.writer devolve a linha em vez de gravá-la"""
+
+    def write(self, valor):
+        return valor
+
+
+def transacoes_periodo(cliente, inicio, fim):
+    """Transações do cliente em [inicio, fim), em ordem cronológica"""
+    return (
+        movimentos().filter(cliente=cliente, data_transacao__gte=inicio, data_transacao__lt=fim)
+        .order_by('data_transacao', 'id')
+        .values_list(*CAMPOS)
+    )
+
+
+def _em_blocos(linhas):
+    """Agrupa as linhas geradas para enviar um pedaço por bloco de transações"""
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) >= TAMANHO_BLOCO:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+def celula_texto(valor):
+    """Texto livre de uma célula do CSV, com um apóstrofo antes de qualquer fórmula"""
+    return f"'{valor}" if valor.startswith(INICIO_FORMULA) else valor
+
+
+def gerar_csv(cliente, inicio, fim):
+    """Gera o extrato em CSV, um bloco de linhas por vez"""
+    escritor = csv.writer(_Eco(), delimiter=';')
+    nomes_tipo = dict(Transacao.TIPO_TRANSACAO_CHOICES)
+    fuso = timezone.get_current_timezone()
+
+    def linhas():
+        yield '\ufeff'  # BOM para o Excel reconhecer UTF-8
+        yield escritor.writerow(['id', 'data', 'tipo', 'valor', 'descricao'])
+        for pk, data, tipo, valor, descricao in transacoes_periodo(cliente, inicio, fim).iterator(chunk_size=TAMANHO_BLOCO):
+            sinal = '' if tipo in Transacao.TIPOS_ENTRADA else '-'
+            yield escritor.writerow([
+                pk,
+                data.astimezone(fuso).strftime('%d/%m/%Y %H:%M:%S'),
+                celula_texto(nomes_tipo.get(tipo, tipo)),
+                f'{sinal}{valor:.2f}',
+                celula_texto(descricao),
+            ])
+
+    return _em_blocos(linhas())
+
+
+def _ofx_texto(valor):
+    """Escapa texto para os campos SGML do OFX"""
+    return valor.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('\n', ' ')[:255]
+
+
+def _ofx_data(momento, fuso=None):
+    return momento.astimezone(fuso or timezone.get_current_timezone()).strftime('%Y%m%d%H%M%S')
+
+
+def gerar_ofx(cliente, inicio, fim):
+    """Gera o extrato em OFX 1.02 (SGML), aceito pelos gerenciadores financeiros"""
+    return _em_blocos(_linhas_ofx(cliente, inicio, fim))
+
+
+def _linhas_ofx(cliente, inicio, fim):
+    agora = timezone.now()
+    fuso = timezone.get_current_timezone()
+    yield (
+        'OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:UTF-8\n'
+        'CHARSET:NONE\nCOMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n'
+        '<OFX>\n<SIGNONMSGSRSV1><SONRS>\n'
+        '<STATUS><CODE>0<SEVERITY>INFO</STATUS>\n'
+        f'<DTSERVER>{_ofx_data(agora)}\n<LANGUAGE>POR\n'
+        '</SONRS></SIGNONMSGSRSV1>\n'
+        '<BANKMSGSRSV1><STMTTRNRS>\n<TRNUID>1\n'
+        '<STATUS><CODE>0<SEVERITY>INFO</STATUS>\n'
+        '<STMTRS>\n<CURDEF>BRL\n'
+        f'<BANKACCTFROM><BANKID>GALAXY<ACCTID>{cliente.cpf}<ACCTTYPE>CHECKING</BANKACCTFROM>\n'
+        f'<BANKTRANLIST>\n<DTSTART>{_ofx_data(inicio)}\n<DTEND>{_ofx_data(fim)}\n'
+    )
+
+    for pk, data, tipo, valor, descricao in transacoes_periodo(cliente, inicio, fim).iterator(chunk_size=TAMANHO_BLOCO):
+        entrada = tipo in Transacao.TIPOS_ENTRADA
+        yield (
+            '<STMTTRN>\n'
+            f"<TRNTYPE>{'CREDIT' if entrada else 'DEBIT'}\n"
+            f'<DTPOSTED>{_ofx_data(data, fuso)}\n'
+            f"<TRNAMT>{'' if entrada else '-'}{valor:.2f}\n"
+            f'<FITID>{pk}\n'
+            f'<MEMO>{_ofx_texto(descricao or tipo)}\n'
+            '</STMTTRN>\n'
+        )
+
+    saldo_final = saldo_em(cliente, min(fim, agora) - timedelta(microseconds=1))
+    yield (
+        '</BANKTRANLIST>\n'
+        f'<LEDGERBAL><BALAMT>{Decimal(saldo_final):.2f}<DTASOF>{_ofx_data(min(fim, agora))}</LEDGERBAL>\n'
+        '</STMTRS>\n</STMTTRNRS></BANKMSGSRSV1>\n</OFX>\n'
+    )
+
+
+async def em_async(blocos):
+    """
+    Consome um gerador de blocos a partir do event loop.
+
+    Cada bloco é produzido na thread das views síncronas (sync_to_async), onde
+    o ORM pode rodar, sem bloquear o loop entre um bloco e outro.
+    """
+    proximo = sync_to_async(next)
+    try:
+        while (bloco := await proximo(blocos, None)) is not None:
+            yield bloco
+    finally:
+        await sync_to_async(blocos.close)()
+
+
+FORMATOS = {
+    'csv': (gerar_csv, 'text/csv; charset=utf-8'),
+    'ofx': (gerar_ofx, 'application/x-ofx'),
+}
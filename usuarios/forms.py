@@ -1,10 +1,25 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from .models import Cliente, Gerente
+from .unicidade import consulta, normalizar
 import re
 
 User = get_user_model()
 
+def digitos_cpf(cpf):
+    """Dígitos do CPF informado; levanta ValidationError se o formato for inválido"""
+    cpf_numbers = re.sub(r'\D', '', cpf)
+    
+    # Validação básica de CPF
+    if len(cpf_numbers) != 11:
+        raise forms.ValidationError('CPF deve conter 11 dígitos.')
+    
+    # Verifica se todos os dígitos são iguais
+    if cpf_numbers == cpf_numbers[0] * 11:
+        raise forms.ValidationError('CPF inválido.')
+    
+    return cpf_numbers
+
 class RegistroUsuarioForm(forms.Form):
     """Primeira etapa: dados básicos do usuário"""
     first_name = forms.CharField(
@@ -45,7 +60,8 @@ class RegistroUsuarioForm(forms.Form):
     
     def clean_email(self):
         email = self.cleaned_data['email']
-        if User.objects.filter(email=email).exists():
+        # Sem diferenciar maiúsculas, como o login por email
+        if consulta('email', normalizar('email', email)).exists():
             raise forms.ValidationError('Este email já está cadastrado.')
         return email
     
@@ -71,20 +87,10 @@ class RegistroClienteForm(forms.Form):
     )
     
     def clean_cpf(self):
-        cpf = self.cleaned_data['cpf']
-        # Remove formatação
-        cpf_numbers = re.sub(r'\D', '', cpf)
-        
-        # Validação básica de CPF
-        if len(cpf_numbers) != 11:
-            raise forms.ValidationError('CPF deve conter 11 dígitos.')
-        
-        # Verifica se todos os dígitos são iguais
-        if cpf_numbers == cpf_numbers[0] * 11:
-            raise forms.ValidationError('CPF inválido.')
+        cpf_numbers = digitos_cpf(self.cleaned_data['cpf'])
         
         # Verifica se CPF já existe
-        if Cliente.objects.filter(cpf=cpf_numbers).exists():
+        if consulta('cpf', cpf_numbers).exists():
             raise forms.ValidationError('Este CPF já está cadastrado.')
         
         return cpf_numbers
@@ -184,10 +190,10 @@ class PerfilUsuarioForm(forms.ModelForm):
     
     def clean_email(self):
         email = self.cleaned_data['email']
-        # Verificar se o email já existe para outro usuário
-        if User.objects.filter(email=email).exclude(pk=self.instance.pk).exists():
+        # Verificar se o email já existe para outro usuário (sem diferenciar maiúsculas)
+        if consulta('email', normalizar('email', email)).exclude(pk=self.instance.pk).exists():
             raise forms.ValidationError('Este email já está cadastrado por outro usuário.')
-        return email
+        return User.objects.normalize_email(email)
 
 class PerfilClienteForm(forms.ModelForm):
     """Formulário para editar dados específicos do cliente"""
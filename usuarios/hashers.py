@@ -0,0 +1,17 @@
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class Argon2SenhaHasher(Argon2PasswordHasher):
+    """
+    Argon2id com os parâmetros mínimos recomendados pela OWASP (19 MiB, duas
+    passadas, uma via). Verifica uma senha em dezenas de milissegundos, contra
+    centenas do PBKDF2 padrão do Django, e usa pouca memória por hash para
+    caber nos workers do pool de senhas (ver usuarios.senhas).
+
+    Os parâmetros fazem parte do hash: alterá-los aqui faz cada senha ser
+    regravada com os novos valores no próximo login.
+    """
+
+    time_cost = 2
+    memory_cost = 19 * 1024
+    parallelism = 1
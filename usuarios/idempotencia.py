@@ -0,0 +1,179 @@
+"""
+Chaves de idempotência para as operações que movimentam dinheiro.
+
+O app envia o cabeçalho `Idempotency-Key` (ou o formulário, o campo oculto
+`chave_idempotencia`) e repete a mesma chave ao reenviar a requisição. A
+primeira execução reserva a chave, roda a view e grava a resposta na mesma
+transação da operação; as repetições apenas leem a resposta guardada e a
+devolvem, sem tocar em saldos.
+
+- repetição enquanto a primeira ainda executa: 409 (tente de novo);
+- mesma chave com dados diferentes: 422;
+- requisições sem chave seguem o fluxo normal.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import ChaveIdempotencia
+
+CABECALHO_CHAVE = 'Idempotency-Key'
+CAMPO_CHAVE = 'chave_idempotencia'
+TAMANHO_MAXIMO_CHAVE = 64
+
+# Uma reserva abandonada (processo derrubado no meio da operação) não chegou
+# a gravar nada, pois operação e resposta são confirmadas juntas; depois
+# deste prazo a chave pode ser reutilizada
+PRAZO_RESERVA = timedelta(minutes=5)
+
+CAMPOS_IGNORADOS = {'csrfmiddlewaretoken', CAMPO_CHAVE}
+CABECALHOS_GUARDADOS = ('Content-Type', 'Location')
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCIA_TTL', 60 * 60 * 24))
+
+
+def impressao_digital(request):
+    """SHA-256 do método, caminho e dados enviados (sem o token CSRF e a própria chave)"""
+    hash_ = hashlib.sha256()
+    hash_.update(f'{request.method} {request.path}\n'.encode())
+    if request.content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        dados = sorted(
+            (campo, valor)
+            for campo, valores in request.POST.lists() if campo not in CAMPOS_IGNORADOS
+            for valor in valores
+        )
+        hash_.update(json.dumps(dados).encode())
+        # Arquivos enviados (ex.: o lote de transferências) também contam
+        for campo, arquivos in sorted(request.FILES.lists()):
+            for arquivo in arquivos:
+                hash_.update(f'\n{campo} {arquivo.name}\n'.encode())
+                for pedaco in arquivo.chunks():
+                    hash_.update(pedaco)
+                arquivo.seek(0)
+    else:
+        hash_.update(request.body)
+    return hash_.hexdigest()
+
+
+def _reservar(usuario, chave, impressao):
+    """
+    Retorna (registro, reservada). `reservada` é True quando esta requisição
+    deve executar a operação; False quando a chave já pertence a outra.
+    """
+    agora = timezone.now()
+    registro = ChaveIdempotencia.objects.filter(usuario=usuario, chave=chave).first()
+
+    if registro is None:
+        try:
+            with transaction.atomic():
+                return ChaveIdempotencia.objects.create(
+                    usuario=usuario,
+                    chave=chave,
+                    impressao_digital=impressao,
+                    expira_em=agora + PRAZO_RESERVA,
+                ), True
+        except IntegrityError:
+            # Outra requisição com a mesma chave reservou primeiro
+            return ChaveIdempotencia.objects.get(usuario=usuario, chave=chave), False
+
+    if registro.expira_em <= agora:
+        # Chave expirada: reaproveita o registro, se ninguém o fizer antes
+        reaproveitada = ChaveIdempotencia.objects.filter(pk=registro.pk, expira_em__lte=agora).update(
+            impressao_digital=impressao,
+            status='processando',
+            status_http=None,
+            corpo_resposta=b'',
+            cabecalhos_resposta={},
+            expira_em=agora + PRAZO_RESERVA,
+        )
+        if reaproveitada:
+            registro.refresh_from_db()
+            return registro, True
+        registro.refresh_from_db()
+
+    return registro, False
+
+
+def _resposta_existente(registro, impressao):
+    """Resposta para uma chave que já pertence a outra requisição"""
+    if registro.impressao_digital != impressao:
+        return JsonResponse({
+            'success': False,
+            'message': 'Esta chave de idempotência já foi usada com dados diferentes.',
+        }, status=422)
+
+    if registro.status == 'processando':
+        response = JsonResponse({
+            'success': False,
+            'message': 'Uma requisição com esta chave ainda está em processamento.',
+        }, status=409)
+        response['Retry-After'] = '1'
+        return response
+
+    response = HttpResponse(bytes(registro.corpo_resposta), status=registro.status_http)
+    for cabecalho, valor in registro.cabecalhos_resposta.items():
+        response[cabecalho] = valor
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _guardar(registro, response):
+    """Grava a resposta da primeira execução e estende a validade da chave"""
+    ChaveIdempotencia.objects.filter(pk=registro.pk).update(
+        status='concluida',
+        status_http=response.status_code,
+        corpo_resposta=response.content,
+        cabecalhos_resposta={c: response[c] for c in CABECALHOS_GUARDADOS if c in response},
+        expira_em=timezone.now() + _ttl(),
+    )
+
+
+def idempotente(view):
+    """
+    Torna uma view POST idempotente para o usuário autenticado.
+
+    A operação e a gravação da resposta acontecem na mesma transação: ou as
+    duas são confirmadas, ou nenhuma. Respostas de erro do servidor (5xx) e
+    exceções liberam a chave para uma nova tentativa.
+    """
+    @wraps(view)
+    def _view(request, *args, **kwargs):
+        if request.method != 'POST' or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        chave = (request.headers.get(CABECALHO_CHAVE) or request.POST.get(CAMPO_CHAVE) or '').strip()
+        if not chave:
+            return view(request, *args, **kwargs)
+        if len(chave) > TAMANHO_MAXIMO_CHAVE:
+            return JsonResponse({
+                'success': False,
+                'message': f'A chave de idempotência deve ter no máximo {TAMANHO_MAXIMO_CHAVE} caracteres.',
+            }, status=400)
+
+        impressao = impressao_digital(request)
+        registro, reservada = _reservar(request.user, chave, impressao)
+        if not reservada:
+            return _resposta_existente(registro, impressao)
+
+        guardada = False
+        try:
+            with transaction.atomic():
+                response = view(request, *args, **kwargs)
+                if not isinstance(response, StreamingHttpResponse) and response.status_code < 500:
+                    _guardar(registro, response)
+                    guardada = True
+        finally:
+            if not guardada:
+                ChaveIdempotencia.objects.filter(pk=registro.pk, status='processando').delete()
+        return response
+
+    return _view
@@ -0,0 +1,64 @@
+"""
+Indicadores do painel do gerente.
+
+Todos os números do painel saem de uma única consulta agregada e ficam em
+cache por até KPI_GERENTE_TTL segundos. Alterações em Cliente e
+SolicitacaoCredito invalidam o cache na hora, em todos os processos, já que o
+cache é compartilhado (ver usuarios.signals e CACHES em settings); o TTL
+limita a defasagem de mudanças que não disparam sinais, como UPDATEs em massa.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Func, Max, Q, Subquery, Sum
+from django.utils import timezone
+
+from credito.models import SolicitacaoCredito
+from .models import Cliente
+from .resumos import tendencia_mensal
+from .saldos import inicio_do_dia
+
+CHAVE_CACHE = 'usuarios:kpis_gerente'
+
+
+def _solicitacoes_pendentes():
+    """Subconsulta escalar com o número de solicitações pendentes"""
+    # COUNT como função simples (sem GROUP BY) devolve uma única linha
+    return Subquery(
+        SolicitacaoCredito.objects.filter(status='pendente')
+        .order_by()
+        .annotate(total=Func(F('pk'), function='COUNT'))
+        .values('total')
+    )
+
+
+def calcular_kpis():
+    """Indicadores do painel em uma única consulta"""
+    inicio_mes = inicio_do_dia(timezone.localdate().replace(day=1))
+    kpis = Cliente.objects.aggregate(
+        total_clientes=Count('pk'),
+        total_credito_aprovado=Sum('limite_credito', filter=Q(limite_credito_aprovado=True), default=Decimal('0.00')),
+        novos_clientes_mes=Count('pk', filter=Q(usuario__date_joined__gte=inicio_mes)),
+        solicitacoes_pendentes=Max(_solicitacoes_pendentes()),
+    )
+    kpis['solicitacoes_pendentes'] = kpis['solicitacoes_pendentes'] or 0
+    return kpis
+
+
+def kpis_gerente():
+    """Indicadores e tendência mensal do painel, lidos do cache quando possível"""
+    kpis = cache.get(CHAVE_CACHE)
+    if kpis is None:
+        kpis = {
+            **calcular_kpis(),
+            'tendencia_mensal': tendencia_mensal(),
+            'atualizado_em': timezone.now(),
+        }
+        cache.set(CHAVE_CACHE, kpis, getattr(settings, 'KPI_GERENTE_TTL', 60))
+    return kpis
+
+
+def invalidar_kpis():
+    cache.delete(CHAVE_CACHE)
@@ -0,0 +1,143 @@
+"""
+Livro contábil de transferências (opcional).
+
+Com LIVRO_CONTABIL_TRANSFERENCIAS = True, cada transferência grava um único
+LancamentoContabil (conta de débito, conta de crédito, valor) em vez de duas
+Transacao com descrições montadas na escrita. As telas continuam vendo o
+histórico de sempre através de `movimentos()`, que passa a ler a view
+MovimentoCliente (transações + os dois lados de cada lançamento).
+"""
+
+import re
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Transacao, LancamentoContabil, MovimentoCliente
+
+# Diferença máxima entre as duas metades de uma transferência antiga
+TOLERANCIA_PAR = timedelta(minutes=1)
+
+_DESCRICAO_ENVIADA = re.compile(r'^Transferência para .* \(\d{11}\)(?: - (?P<descricao>.*))?$', re.DOTALL)
+
+
+def ativo():
+    """True quando as transferências são gravadas no livro contábil"""
+    return getattr(settings, 'LIVRO_CONTABIL_TRANSFERENCIAS', False)
+
+
+def movimentos():
+    """Queryset base do histórico dos clientes (Transacao ou MovimentoCliente)"""
+    return MovimentoCliente.objects.all() if ativo() else Transacao.objects.all()
+
+
+def movimentos_do_cliente(cliente):
+    """Histórico do cliente: as linhas que hoje aparecem no extrato"""
+    return movimentos().filter(cliente=cliente)
+
+
+def ultimos_movimentos(cliente, quantidade=5):
+    """Movimentações mais recentes do cliente (dashboard)"""
+    return movimentos_do_cliente(cliente).order_by('-data_transacao')[:quantidade]
+
+
+def registrar(transferencias):
+    """
+    Grava um lançamento por transferência em um único INSERT.
+
+    `transferencias` é uma lista de (remetente, destinatario, valor, descricao).
+    """
+    return LancamentoContabil.objects.bulk_create([
+        LancamentoContabil(conta_debito=remetente, conta_credito=destinatario, valor=valor, descricao=descricao)
+        for remetente, destinatario, valor, descricao in transferencias
+    ])
+
+
+def lados(lancamentos):
+    """As duas metades de cada lançamento como Transacao não gravadas (resumo diário e eventos)"""
+    for lancamento in lancamentos:
+        yield Transacao(
+            cliente_id=lancamento.conta_debito_id,
+            tipo='transferencia_enviada',
+            valor=lancamento.valor,
+            descricao=lancamento.descricao,
+            data_transacao=lancamento.data,
+        )
+        yield Transacao(
+            cliente_id=lancamento.conta_credito_id,
+            tipo='transferencia_recebida',
+            valor=lancamento.valor,
+            descricao=lancamento.descricao,
+            data_transacao=lancamento.data,
+        )
+
+
+def _descricao_original(texto):
+    """Texto digitado pelo cliente, extraído da descrição montada na escrita"""
+    encontrado = _DESCRICAO_ENVIADA.match(texto or '')
+    if encontrado:
+        return encontrado.group('descricao') or ''
+    return texto or ''
+
+
+def parear_transferencias():
+    """
+    Encontra os pares enviada/recebida gravados como Transacao.
+
+    Retorna (pares, sem_par): pares são tuplas (enviada, id da recebida), em
+    que enviada é (id, cliente_id, destinatario_id, valor, descricao, data).
+    As duas metades de uma transferência foram gravadas juntas, então cada
+    enviada é casada com a próxima recebida de mesmo remetente, destinatário
+    e valor dentro de TOLERANCIA_PAR.
+    """
+    recebidas = defaultdict(deque)
+    for pk, cliente_id, origem_id, valor, data in (
+        Transacao.objects.filter(tipo='transferencia_recebida', origem__isnull=False)
+        .order_by('id')
+        .values_list('id', 'cliente_id', 'origem_id', 'valor', 'data_transacao')
+        .iterator()
+    ):
+        recebidas[(cliente_id, origem_id, valor)].append((pk, data))
+
+    pares = []
+    sem_par = 0
+    for enviada in (
+        Transacao.objects.filter(tipo='transferencia_enviada', destinatario__isnull=False)
+        .order_by('id')
+        .values_list('id', 'cliente_id', 'destinatario_id', 'valor', 'descricao', 'data_transacao')
+        .iterator()
+    ):
+        _, cliente_id, destinatario_id, valor, _, data = enviada
+        fila = recebidas.get((destinatario_id, cliente_id, valor))
+        while fila and fila[0][1] < data - TOLERANCIA_PAR:
+            fila.popleft()  # recebida sem enviada correspondente
+            sem_par += 1
+        if fila and abs(fila[0][1] - data) <= TOLERANCIA_PAR:
+            pares.append((enviada, fila.popleft()[0]))
+        else:
+            sem_par += 1
+
+    sem_par += sum(len(fila) for fila in recebidas.values())
+    return pares, sem_par
+
+
+def migrar_transferencias(pares, tamanho_lote=2000):
+    """Converte pares de Transacao em lançamentos, um lote por transação"""
+    for inicio in range(0, len(pares), tamanho_lote):
+        lote = pares[inicio:inicio + tamanho_lote]
+        with transaction.atomic():
+            LancamentoContabil.objects.bulk_create([
+                LancamentoContabil(
+                    conta_debito_id=cliente_id,
+                    conta_credito_id=destinatario_id,
+                    valor=valor,
+                    descricao=_descricao_original(descricao),
+                    data=data,
+                )
+                for (_, cliente_id, destinatario_id, valor, descricao, data), _ in lote
+            ])
+            ids = [enviada[0] for enviada, _ in lote] + [recebida for _, recebida in lote]
+            Transacao.objects.filter(pk__in=ids).delete()
+    return len(pares)
@@ -0,0 +1,86 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F, Value
+from django.test import RequestFactory
+from django.utils import timezone
+
+from galaxybank.benchmark import banco_temporario, rss_pico_mb
+from usuarios.models import Usuario, Cliente, Transacao
+from usuarios.views import exportar_extrato
+
+
+class Command(BaseCommand):
+    help = 'Mede throughput e pico de memória da exportação de extrato (banco temporário)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, default=1_000_000)
+        parser.add_argument('--formato', choices=['csv', 'ofx'], default='csv')
+        parser.add_argument('--lote', type=int, default=20_000, help='Tamanho dos lotes de inserção')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with banco_temporario():
+            usuario = Usuario.objects.create(username='bench', password='!', tipo_usuario='cliente')
+            cliente = Cliente.objects.create(usuario=usuario, cpf='00000000001')
+
+            self.stdout.write(f"Inserindo {options['linhas']} transações...")
+            inicio_insercao = time.perf_counter()
+            inicio_periodo = self._popular(cliente, options['linhas'], options['lote'], options['seed'])
+            self.stdout.write(f'  {time.perf_counter() - inicio_insercao:.1f}s')
+
+            rss_antes = rss_pico_mb()
+            request = RequestFactory().get('/extrato/exportar/', {
+                'formato': options['formato'],
+                'inicio': inicio_periodo.strftime('%Y-%m-%d'),
+            })
+            request.user = usuario
+            request.cliente = cliente  # o que o middleware de perfil faria
+
+            inicio = time.perf_counter()
+            response = exportar_extrato(request)
+            total_bytes = 0
+            for bloco in response.streaming_content:
+                total_bytes += len(bloco)
+            duracao = time.perf_counter() - inicio
+            rss_depois = rss_pico_mb()
+
+        self.stdout.write(f"Formato: {options['formato']}  Linhas: {options['linhas']}")
+        self.stdout.write(f'Tempo: {duracao:.2f}s  ({options["linhas"] / duracao:,.0f} linhas/s, {total_bytes / duracao / 1e6:.1f} MB/s)')
+        self.stdout.write(f'Tamanho gerado: {total_bytes / 1e6:.1f} MB')
+        self.stdout.write(f'Pico de RSS: {rss_antes:.1f} MB antes da exportação, {rss_depois:.1f} MB depois')
+
+    def _popular(self, cliente, quantidade, lote, seed):
+        """Insere `quantidade` transações espalhadas pelos últimos anos"""
+        rng = random.Random(seed)
+        tipos = [tipo for tipo, _ in Transacao.TIPO_TRANSACAO_CHOICES]
+        agora = timezone.now()
+        intervalo = timedelta(minutes=5)
+        inicio_periodo = agora - intervalo * quantidade
+
+        primeiro_id = None
+        for inicio in range(0, quantidade, lote):
+            criadas = Transacao.objects.bulk_create([
+                Transacao(
+                    cliente=cliente,
+                    tipo=rng.choice(tipos),
+                    valor=Decimal(rng.randint(100, 500000)) / 100,
+                    descricao=f'Transação sintética {i}',
+                )
+                for i in range(inicio, min(inicio + lote, quantidade))
+            ])
+            if primeiro_id is None:
+                primeiro_id = criadas[0].pk
+
+        # data_transacao é auto_now_add: as datas históricas (uma a cada
+        # `intervalo`, na ordem de inserção) são gravadas depois, em um UPDATE
+        Transacao.objects.filter(cliente=cliente).update(
+            data_transacao=Value(inicio_periodo, output_field=DateTimeField()) + ExpressionWrapper(
+                (F('id') - primeiro_id) * Value(intervalo, output_field=DurationField()),
+                output_field=DurationField(),
+            )
+        )
+        return timezone.localdate(inicio_periodo)
@@ -0,0 +1,83 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import timezone
+
+from galaxybank.benchmark import banco_temporario
+from usuarios.amostragem import lttb
+from usuarios.models import Usuario, Cliente, TransacaoResumoDiario
+from usuarios.views import grafico_saldo, grafico_entradas_saidas
+
+
+class Command(BaseCommand):
+    help = 'Mede tamanho e tempo das séries dos gráficos com e sem max_pontos (banco temporário)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anos', type=int, default=10)
+        parser.add_argument('--max-pontos', type=int, nargs='+', default=[250, 500, 1000])
+        parser.add_argument('--repeticoes', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        fim = timezone.localdate()
+        inicio = fim - timedelta(days=365 * options['anos'] - 1)
+
+        with banco_temporario():
+            usuario = Usuario.objects.create(username='bench', password='!', tipo_usuario='cliente')
+            cliente = Cliente.objects.create(usuario=usuario, cpf='00000000001', saldo=Decimal('50000.00'))
+            dias = self._popular(cliente.pk, inicio, fim, options['seed'])
+            self.stdout.write(f"Série diária de {options['anos']} anos: {dias} pontos")
+
+            for nome, view in (('saldo', grafico_saldo), ('entradas-saidas', grafico_entradas_saidas)):
+                for max_pontos in [None, *options['max_pontos']]:
+                    parametros = {'inicio': inicio.isoformat(), 'fim': fim.isoformat()}
+                    if max_pontos:
+                        parametros['max_pontos'] = max_pontos
+                    tamanho, duracao = self._medir(view, cliente, parametros, options['repeticoes'])
+                    self.stdout.write(
+                        f"{nome:<16} max_pontos={str(max_pontos or '-'):>5}  "
+                        f"{tamanho / 1024:8.1f} KB  {duracao * 1000:7.1f} ms"
+                    )
+
+        rng = random.Random(options['seed'])
+        valores = [rng.gauss(0, 1) for _ in range(dias)]
+        for max_pontos in options['max_pontos']:
+            inicio_lttb = time.perf_counter()
+            for _ in range(options['repeticoes']):
+                lttb(valores, max_pontos)
+            duracao = (time.perf_counter() - inicio_lttb) / options['repeticoes']
+            self.stdout.write(f'lttb isolado     max_pontos={max_pontos:>5}  {duracao * 1000:7.2f} ms')
+
+    def _popular(self, cliente_id, inicio, fim, seed):
+        """Um depósito e uma compra por dia no resumo diário"""
+        rng = random.Random(seed)
+        resumos = []
+        dia = inicio
+        while dia <= fim:
+            for tipo in ('deposito', 'compra'):
+                resumos.append(TransacaoResumoDiario(
+                    cliente_id=cliente_id, dia=dia, tipo=tipo,
+                    quantidade=1, total=Decimal(rng.randint(100, 50000)) / 100,
+                ))
+            dia += timedelta(days=1)
+        TransacaoResumoDiario.objects.bulk_create(resumos, batch_size=2000)
+        return len(resumos) // 2
+
+    def _medir(self, view, cliente, parametros, repeticoes):
+        """(bytes da resposta, melhor tempo em segundos)"""
+        melhor = float('inf')
+        for _ in range(repeticoes):
+            request = RequestFactory().get('/graficos/', parametros)
+            request.user = cliente.usuario
+            request.cliente = cliente  # o que o middleware de perfil faria
+            inicio = time.perf_counter()
+            response = view(request)
+            melhor = min(melhor, time.perf_counter() - inicio)
+            # Uma resposta de erro mediria a página de erro, não a série
+            if response.status_code != 200:
+                raise CommandError(f'{view.__name__} respondeu {response.status_code}: {response.content[:200]!r}')
+        return len(response.content), melhor
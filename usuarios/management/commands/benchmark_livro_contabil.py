@@ -0,0 +1,83 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, OperationalError
+from django.test import override_settings
+
+from galaxybank.benchmark import banco_temporario
+from usuarios.models import Usuario, Cliente, Transacao, LancamentoContabil, TransacaoResumoDiario
+from usuarios.services import transferir
+
+MODOS = {
+    'transacoes': False,  # par enviada/recebida em Transacao
+    'livro': True,        # um LancamentoContabil por transferência
+}
+
+
+class Command(BaseCommand):
+    help = 'Compara throughput de escrita e tamanho em disco: pares de Transacao x livro contábil (banco temporário)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transferencias', type=int, default=5000)
+        parser.add_argument('--clientes', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('O tamanho das tabelas é medido com a tabela virtual dbstat do SQLite.')
+
+        resultados = {}
+        for modo, ativo in MODOS.items():
+            with banco_temporario(), override_settings(LIVRO_CONTABIL_TRANSFERENCIAS=ativo):
+                clientes = self._criar_clientes(options['clientes'])
+                rng = random.Random(options['seed'])
+
+                inicio = time.perf_counter()
+                for _ in range(options['transferencias']):
+                    remetente, destinatario = rng.sample(clientes, 2)
+                    transferir(remetente, destinatario, Decimal(rng.randint(1, 500)) / 100, 'Benchmark')
+                duracao = time.perf_counter() - inicio
+
+                resultados[modo] = {
+                    'duracao': duracao,
+                    'linhas': Transacao.objects.count() + LancamentoContabil.objects.count(),
+                    'bytes': self._tamanho_tabelas([Transacao, LancamentoContabil]),
+                    'bytes_resumo': self._tamanho_tabelas([TransacaoResumoDiario]),
+                }
+
+        quantidade = options['transferencias']
+        for modo, r in resultados.items():
+            self.stdout.write(
+                f"{modo:<11} {r['duracao']:7.2f}s  {quantidade / r['duracao']:8,.0f} transferências/s  "
+                f"{r['linhas']:>9,} linhas  {r['bytes'] / 1e6:7.2f} MB (tabela + índices)  "
+                f"resumo diário {r['bytes_resumo'] / 1e6:.2f} MB"
+            )
+        base, livro = resultados['transacoes'], resultados['livro']
+        self.stdout.write(
+            f"Livro contábil: {base['duracao'] / livro['duracao']:.2f}x o throughput, "
+            f"{livro['bytes'] / base['bytes']:.0%} do tamanho em disco"
+        )
+
+    def _criar_clientes(self, quantidade):
+        clientes = []
+        for i in range(quantidade):
+            usuario = Usuario.objects.create(username=f'bench{i}', password='!', first_name=f'Cliente {i}')
+            clientes.append(Cliente.objects.create(usuario=usuario, cpf=f'{i:011d}', saldo=Decimal('1000000.00')))
+        return clientes
+
+    def _tamanho_tabelas(self, modelos):
+        """Bytes ocupados pelas tabelas e seus índices, via dbstat"""
+        tabelas = [modelo._meta.db_table for modelo in modelos]
+        marcadores = ', '.join(['%s'] * len(tabelas))
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f'SELECT COALESCE(SUM(d.pgsize), 0) FROM dbstat d JOIN sqlite_schema s ON s.name = d.name '
+                    f'WHERE s.tbl_name IN ({marcadores})',
+                    tabelas,
+                )
+            except OperationalError:
+                raise CommandError('Este SQLite foi compilado sem a tabela virtual dbstat.')
+            return cursor.fetchone()[0]
@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from galaxybank.benchmark import banco_temporario
+from usuarios.models import Usuario
+
+CONSULTAS = {
+    'iexact (antigo)': lambda valor: Usuario.objects.filter(Q(username__iexact=valor) | Q(email__iexact=valor)),
+    'lower + índice': lambda valor: Usuario.objects.alias(
+        username_lower=Lower('username'), email_lower=Lower('email')
+    ).filter(Q(username_lower=valor.lower()) | Q(email_lower=valor.lower())),
+}
+
+
+class Command(BaseCommand):
+    help = 'Mede a busca do usuário no login (iexact x índice em LOWER) e o throughput de login (banco temporário)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=100_000)
+        parser.add_argument('--buscas', type=int, default=2000)
+        parser.add_argument('--logins', type=int, default=20, help='Logins completos (incluem o hash da senha)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with banco_temporario():
+            self.stdout.write(f"Criando {options['usuarios']} usuários...")
+            senha = make_password('senha-benchmark')
+            for inicio in range(0, options['usuarios'], 5000):
+                Usuario.objects.bulk_create([
+                    Usuario(username=f'Usuario{i}', email=f'Usuario{i}@Galaxy.com', password=senha)
+                    for i in range(inicio, min(inicio + 5000, options['usuarios']))
+                ])
+
+            # Metade por username, metade por email, com a caixa trocada
+            valores = [
+                (f'usuario{i}' if rng.random() < 0.5 else f'USUARIO{i}@galaxy.com')
+                for i in (rng.randrange(options['usuarios']) for _ in range(options['buscas']))
+            ]
+            for nome, consulta in CONSULTAS.items():
+                plano = consulta(valores[0]).explain()
+                inicio = time.perf_counter()
+                for valor in valores:
+                    list(consulta(valor)[:2])
+                duracao = time.perf_counter() - inicio
+                usa_indice = 'SCAN' not in plano
+                self.stdout.write(
+                    f'{nome:<16} {len(valores) / duracao:10,.0f} buscas/s  '
+                    f'{duracao / len(valores) * 1e6:8.0f} µs/busca  '
+                    f"{'índice' if usa_indice else 'varredura completa'}"
+                )
+
+            inicio = time.perf_counter()
+            for valor in valores[:options['logins']]:
+                if authenticate(username=valor, password='senha-benchmark') is None:
+                    raise RuntimeError(f'Login falhou para {valor}')
+            duracao = time.perf_counter() - inicio
+            self.stdout.write(
+                f"Login completo:  {options['logins'] / duracao:10,.1f} logins/s "
+                f"(dominado pelo hash de senha)"
+            )
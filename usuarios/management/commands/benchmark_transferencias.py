@@ -0,0 +1,99 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from galaxybank.benchmark import banco_temporario
+from usuarios.models import Usuario, Cliente, Transacao
+from usuarios.services import transferir, SaldoInsuficienteError
+
+
+class Command(BaseCommand):
+    help = 'Teste de estresse multi-thread das transferências (banco temporário)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=20)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--transferencias', type=int, default=500, help='Transferências por thread')
+        parser.add_argument('--saldo-inicial', type=Decimal, default=Decimal('1000.00'))
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with banco_temporario():
+            clientes = self._criar_clientes(options['clientes'], options['saldo_inicial'])
+            total_inicial = Cliente.objects.aggregate(total=Sum('saldo'))['total']
+
+            contadores = {'ok': 0, 'saldo_insuficiente': 0, 'erros': []}
+            trava = threading.Lock()
+
+            def trabalhador(indice):
+                rng = random.Random(options['seed'] + indice)
+                ok = insuficiente = 0
+                try:
+                    for _ in range(options['transferencias']):
+                        remetente, destinatario = rng.sample(clientes, 2)
+                        valor = Decimal(rng.randint(1, 30000)) / 100
+                        try:
+                            transferir(remetente, destinatario, valor)
+                            ok += 1
+                        except SaldoInsuficienteError:
+                            insuficiente += 1
+                except Exception as e:
+                    with trava:
+                        contadores['erros'].append(repr(e))
+                finally:
+                    connection.close()
+                    with trava:
+                        contadores['ok'] += ok
+                        contadores['saldo_insuficiente'] += insuficiente
+
+            threads = [
+                threading.Thread(target=trabalhador, args=(i,))
+                for i in range(options['threads'])
+            ]
+            inicio = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            duracao = time.perf_counter() - inicio
+
+            total_final = Cliente.objects.aggregate(total=Sum('saldo'))['total']
+            negativos = Cliente.objects.filter(saldo__lt=0).count()
+            enviadas = Transacao.objects.filter(tipo='transferencia_enviada').count()
+
+        self.stdout.write(f"Threads: {options['threads']}  Clientes: {options['clientes']}")
+        self.stdout.write(f"Transferências concluídas: {contadores['ok']}")
+        self.stdout.write(f"Recusadas por saldo insuficiente: {contadores['saldo_insuficiente']}")
+        self.stdout.write(f"Tempo: {duracao:.2f}s  ({contadores['ok'] / duracao:.1f} transferências/s)")
+        self.stdout.write(f'Dinheiro em circulação: {total_inicial} -> {total_final}')
+
+        if contadores['erros']:
+            raise CommandError(f"Erros inesperados nas threads: {contadores['erros'][:5]}")
+        if total_final != total_inicial:
+            raise CommandError('O total de dinheiro mudou durante o teste!')
+        if negativos:
+            raise CommandError(f'{negativos} clientes ficaram com saldo negativo!')
+        if enviadas != contadores['ok']:
+            raise CommandError(f"Transações registradas ({enviadas}) diferem das transferências ({contadores['ok']})")
+
+        self.stdout.write(self.style.SUCCESS('✓ Total de dinheiro preservado'))
+
+    def _criar_clientes(self, quantidade, saldo):
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(
+                username=f'bench{i}',
+                first_name=f'Bench{i}',
+                password='!',
+                tipo_usuario='cliente',
+            )
+            for i in range(quantidade)
+        ])
+        return Cliente.objects.bulk_create([
+            Cliente(usuario=usuario, cpf=f'{i:011d}', saldo=saldo)
+            for i, usuario in enumerate(usuarios)
+        ])
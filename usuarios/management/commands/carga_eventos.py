@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client as ClienteTeste
+
+from galaxybank.asgi import application, django_application
+from galaxybank.benchmark import banco_temporario, rss_pico_mb
+from usuarios import eventos
+from usuarios.models import Usuario, Cliente
+from usuarios.services import depositar
+
+
+class Conexao:
+    """Um EventSource simulado: chama a aplicação ASGI direto, sem sockets"""
+
+    def __init__(self, aplicacao, cookie, caminho):
+        self.aplicacao = aplicacao
+        self.cookie = cookie
+        self.caminho = caminho
+        self.status = None
+        self.eventos = 0
+        self.conectada = asyncio.Event()
+        self.recebeu = asyncio.Event()
+        self.desconectar = asyncio.Event()
+        self._corpo_enviado = False
+
+    def escopo(self):
+        return {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': self.caminho,
+            'raw_path': self.caminho.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': [
+                (b'host', b'localhost'),
+                (b'accept', b'text/event-stream'),
+                (b'cookie', f'{settings.SESSION_COOKIE_NAME}={self.cookie}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+
+    async def receive(self):
+        if not self._corpo_enviado:
+            self._corpo_enviado = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.desconectar.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, mensagem):
+        if mensagem['type'] == 'http.response.start':
+            self.status = mensagem['status']
+        elif mensagem['type'] == 'http.response.body' and b'event: ' in mensagem.get('body', b''):
+            if self.conectada.is_set():
+                self.eventos += 1
+                self.recebeu.set()
+            else:
+                self.conectada.set()  # primeiro saldo
+
+    async def executar(self):
+        await self.aplicacao(self.escopo(), self.receive, self.send)
+
+
+class Command(BaseCommand):
+    help = 'Teste de carga do /eventos/: mantém milhares de streams SSE em um único processo (banco temporário)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conexoes', type=int, default=5000)
+        parser.add_argument('--clientes', type=int, default=100)
+        parser.add_argument('--lote', type=int, default=250, help='Conexões abertas por vez')
+        parser.add_argument('--ocioso', type=float, default=5.0, help='Segundos com todas as conexões ociosas')
+        parser.add_argument(
+            '--somente-django', action='store_true',
+            help='Atende /eventos/ pela view do Django em vez da rota ASGI direta (para comparação)',
+        )
+
+    def handle(self, *args, **options):
+        if options['clientes'] > options['conexoes']:
+            raise CommandError('É preciso ao menos uma conexão por cliente.')
+
+        with banco_temporario():
+            clientes, cookies = self._criar_clientes(options['clientes'])
+            asyncio.run(self._carga(clientes, cookies, options))
+
+    def _criar_clientes(self, quantidade):
+        clientes, cookies = [], []
+        for i in range(quantidade):
+            usuario = Usuario.objects.create_user(
+                username=f'carga{i}', password=None, tipo_usuario='cliente', first_name=f'Cliente {i}'
+            )
+            clientes.append(Cliente.objects.create(usuario=usuario, cpf=f'{i:011d}'))
+            navegador = ClienteTeste()
+            navegador.force_login(usuario)
+            cookies.append(navegador.cookies[settings.SESSION_COOKIE_NAME].value)
+        return clientes, cookies
+
+    async def _carga(self, clientes, cookies, options):
+        aplicacao = django_application if options['somente_django'] else application
+        total = options['conexoes']
+        rss_inicial = rss_pico_mb()
+
+        conexoes = [Conexao(aplicacao, cookies[i % len(cookies)], '/eventos/') for i in range(total)]
+        tarefas = []
+        inicio = time.perf_counter()
+        for lote in range(0, total, options['lote']):
+            for conexao in conexoes[lote:lote + options['lote']]:
+                tarefas.append(asyncio.create_task(conexao.executar()))
+            await asyncio.gather(*(c.conectada.wait() for c in conexoes[lote:lote + options['lote']]))
+        abertura = time.perf_counter() - inicio
+
+        recusadas = sum(1 for c in conexoes if c.status != 200)
+        self.stdout.write(
+            f'{total} streams abertos em {abertura:.1f}s ({total / abertura:,.0f}/s), '
+            f'{eventos.total_assinaturas()} assinaturas, {recusadas} recusadas'
+        )
+        self.stdout.write(f'Threads do processo: {threading.active_count()}')
+
+        await asyncio.sleep(options['ocioso'])
+        rss_ocioso = rss_pico_mb()
+        self.stdout.write(
+            f"Pico de RSS: {rss_inicial:.1f} MB antes, {rss_ocioso:.1f} MB com {total} streams ociosos "
+            f"(~{(rss_ocioso - rss_inicial) * 1024 / total:.1f} KB por stream)"
+        )
+
+        # Um depósito por cliente: transação + saldo entregues a todas as suas conexões
+        inicio = time.perf_counter()
+        for cliente in clientes:
+            await sync_to_async(depositar)(cliente, Decimal('1.00'), 'Carga')
+        gravacao = time.perf_counter() - inicio
+        await asyncio.wait_for(asyncio.gather(*(c.recebeu.wait() for c in conexoes)), timeout=60)
+        entrega = time.perf_counter() - inicio
+        self.stdout.write(
+            f'{len(clientes)} depósitos gravados em {gravacao:.2f}s; '
+            f'eventos entregues nas {total} conexões em {entrega:.2f}s '
+            f'({sum(c.eventos for c in conexoes)} eventos)'
+        )
+
+        for conexao in conexoes:
+            conexao.desconectar.set()
+        await asyncio.gather(*tarefas)
+        self.stdout.write(f'Após desconectar: {eventos.total_assinaturas()} assinaturas')
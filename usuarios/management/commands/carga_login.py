@@ -0,0 +1,106 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate, authenticate
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from galaxybank.benchmark import banco_temporario
+from usuarios.models import Usuario
+
+SENHA = 'senha-benchmark'
+
+
+def _p99(latencias):
+    if len(latencias) < 2:
+        return latencias[0] if latencias else 0.0
+    return statistics.quantiles(latencias, n=100, method='inclusive')[98]
+
+
+def _view_simples():
+    """Uma view síncrona qualquer: sob ASGI, divide a thread com os logins síncronos"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga do login: logins/s e p99 por concorrência, com o hash na thread das views '
+        '(login síncrono) ou no pool de senhas (login assíncrono), em banco temporário'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=200)
+        parser.add_argument('--logins', type=int, default=32, help='Logins por nível de concorrência')
+        parser.add_argument('--concorrencias', default='1,2,4,8')
+        parser.add_argument('--p99-alvo', type=float, default=1000.0, help='Latência p99 máxima aceita (ms)')
+
+    def handle(self, *args, **options):
+        try:
+            concorrencias = [int(c) for c in options['concorrencias'].split(',')]
+        except ValueError:
+            raise CommandError('--concorrencias deve ser uma lista de inteiros separados por vírgula.')
+
+        self.stdout.write(
+            f"Hasher preferido: {get_hasher().algorithm}; pool de senhas com "
+            f"{getattr(settings, 'SENHA_HASH_WORKERS', 4)} threads"
+        )
+        with banco_temporario():
+            senha = make_password(SENHA)
+            Usuario.objects.bulk_create([
+                Usuario(username=f'carga{i}', email=f'carga{i}@galaxy.com', password=senha)
+                for i in range(options['usuarios'])
+            ])
+            modos = {
+                'na thread das views': sync_to_async(authenticate),
+                'no pool de senhas': aauthenticate,
+            }
+            for nome, autenticar in modos.items():
+                self.stdout.write(f'\nLogin com o hash {nome}')
+                self.stdout.write(f"{'conc.':>5} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'view simples p99 ms':>20}")
+                melhor = None
+                for concorrencia in concorrencias:
+                    resultado = asyncio.run(self._nivel(autenticar, concorrencia, options))
+                    vazao, p50, p99, p99_view = resultado
+                    self.stdout.write(
+                        f'{concorrencia:>5} {vazao:>9.1f} {p50 * 1000:>8.0f} {p99 * 1000:>8.0f} {p99_view * 1000:>20.1f}'
+                    )
+                    if p99 * 1000 <= options['p99_alvo'] and (melhor is None or vazao > melhor[1]):
+                        melhor = (concorrencia, vazao)
+                if melhor:
+                    self.stdout.write(
+                        f"Melhor com p99 <= {options['p99_alvo']:.0f} ms: "
+                        f"{melhor[1]:.1f} logins/s (concorrência {melhor[0]})"
+                    )
+                else:
+                    self.stdout.write(f"Nenhum nível ficou com p99 <= {options['p99_alvo']:.0f} ms")
+
+    async def _nivel(self, autenticar, concorrencia, options):
+        """Logins em laço fechado com `concorrencia` clientes; mede também uma view simples em paralelo"""
+        fila = asyncio.Queue()
+        for i in range(options['logins']):
+            fila.put_nowait(f'carga{i % options["usuarios"]}')
+        latencias, latencias_view = [], []
+
+        async def cliente():
+            while not fila.empty():
+                username = fila.get_nowait()
+                inicio = time.perf_counter()
+                if await autenticar(username=username, password=SENHA) is None:
+                    raise RuntimeError(f'Login falhou para {username}')
+                latencias.append(time.perf_counter() - inicio)
+
+        async def view_simples():
+            while True:
+                inicio = time.perf_counter()
+                await sync_to_async(_view_simples)()
+                latencias_view.append(time.perf_counter() - inicio)
+                await asyncio.sleep(0.01)
+
+        medidor = asyncio.create_task(view_simples())
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente() for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+        medidor.cancel()
+        return len(latencias) / duracao, statistics.median(latencias), _p99(latencias), _p99(latencias_view)
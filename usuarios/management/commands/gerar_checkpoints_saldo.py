@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from usuarios.saldos import gerar_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Grava checkpoints de saldo de todos os clientes (rodar diariamente ou mensalmente via cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--granularidade',
+            choices=['dia', 'mes'],
+            default='dia',
+            help='dia: fechamento de ontem; mes: fechamento do último dia do mês anterior',
+        )
+        parser.add_argument('--data', help='Data de fechamento explícita (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        if options['data']:
+            try:
+                dia = datetime.strptime(options['data'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Data inválida. Use o formato AAAA-MM-DD.')
+        elif options['granularidade'] == 'mes':
+            dia = timezone.localdate().replace(day=1) - timedelta(days=1)
+        else:
+            dia = timezone.localdate() - timedelta(days=1)
+
+        if dia >= timezone.localdate():
+            raise CommandError('Só é possível gerar checkpoints de dias já encerrados.')
+
+        gravados = gerar_checkpoints(dia)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {gravados} checkpoints de saldo gravados para {dia.strftime('%d/%m/%Y')}"
+        ))
@@ -0,0 +1,461 @@
+import heapq
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, time as hora, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from credito.analise_carteira import invalidar_relatorio
+from credito.models import SolicitacaoCredito
+from faturas.models import Fatura, ItemFatura, PagamentoFatura
+from galaxybank.benchmark import preservar_datas
+from loja.models import CategoriaProduto, Produto, Compra, ItemCompra
+from usuarios import livro_contabil
+from usuarios.kpis import invalidar_kpis
+from usuarios.models import Usuario, Cliente, Gerente, Transacao, TransacaoResumoDiario, LancamentoContabil
+from usuarios.services import _descricao_transferencia
+
+PREFIXO = 'sintetico'
+CENTAVOS = Decimal('0.01')
+
+NOMES = [
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João',
+    'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Thiago', 'Vanessa', 'Yuri',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Almeida', 'Ferreira', 'Rodrigues',
+    'Gomes', 'Martins', 'Araújo', 'Barbosa', 'Ribeiro',
+]
+PROFISSOES = [
+    'Analista de sistemas', 'Professor', 'Enfermeira', 'Engenheiro', 'Vendedor', 'Autônomo', 'Advogada',
+    'Motorista', 'Designer', 'Comerciante',
+]
+PARCELAS = [1, 1, 2, 3, 4, 6, 10, 12]
+
+# Campos preenchidos automaticamente pelo Django que recebem datas históricas
+CAMPOS_DATA = [
+    (Cliente, 'data_cadastro'),
+    (Transacao, 'data_transacao'),
+    (Compra, 'data_compra'),
+    (Fatura, 'data_criacao'),
+    (Fatura, 'data_atualizacao'),
+    (ItemFatura, 'data_inclusao'),
+    (PagamentoFatura, 'data_pagamento'),
+    (SolicitacaoCredito, 'data_solicitacao'),
+]
+
+
+def _dinheiro(valor):
+    return Decimal(valor).quantize(CENTAVOS)
+
+
+def _somar_meses(mes, quantidade):
+    indice = mes.year * 12 + mes.month - 1 + quantidade
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+class _Lote:
+    """
+    Clientes de um lote com todo o histórico, ainda não gravados.
+
+    Os eventos de todos os clientes do lote são simulados em ordem
+    cronológica: compras no saldo, transferências e pagamentos de fatura só
+    acontecem se o saldo do momento cobre o valor, então o saldo final de cada
+    cliente é exatamente a soma das suas movimentações.
+    """
+
+    def __init__(self, rng, indices, contexto):
+        self.rng = rng
+        self.contexto = contexto
+        self.fim = contexto['fim']
+        self.usuarios, self.clientes, self.solicitacoes = [], [], []
+        self.transacoes, self.lancamentos = [], []
+        self.compras, self.itens_compra = [], []
+        self.faturas, self.itens_fatura, self.pagamentos = [], [], []
+        self._faturas = {}  # (posição do cliente, mês) -> fatura
+        self._eventos = []
+        self._ordem = 0
+
+        estados = [self._novo_cliente(indice) for indice in indices]
+        for posicao, estado in enumerate(estados):
+            self._planejar(posicao, estado, estados)
+        self.estados = estados
+
+        while self._eventos:
+            momento, _, tipo, posicao, dados = heapq.heappop(self._eventos)
+            getattr(self, f'_{tipo}')(momento, estados[posicao], posicao, dados)
+        self._fechar_faturas()
+
+        for estado in estados:
+            estado['cliente'].saldo = estado['saldo']
+
+    def _agendar(self, momento, tipo, posicao, dados=None):
+        self._ordem += 1
+        heapq.heappush(self._eventos, (momento, self._ordem, tipo, posicao, dados))
+
+    def _momento(self, dia):
+        rng = self.rng
+        return datetime.combine(
+            dia, hora(rng.randint(7, 22), rng.randint(0, 59), rng.randint(0, 59)), tzinfo=self.contexto['fuso']
+        )
+
+    def _momento_entre(self, inicio, fim):
+        return inicio + timedelta(seconds=self.rng.uniform(0, (fim - inicio).total_seconds()))
+
+    def _quantidade(self, media):
+        # Aproximação normal da distribuição de Poisson
+        return max(int(self.rng.gauss(media, math.sqrt(media)) + 0.5), 0) if media > 0 else 0
+
+    def _novo_cliente(self, indice):
+        rng, contexto = self.rng, self.contexto
+        cadastro = self._momento(contexto['inicio'] + timedelta(days=rng.randint(0, contexto['dias'] // 4)))
+        telefone = indice % 10 ** 8
+        usuario = Usuario(
+            username=f'{PREFIXO}{indice}',
+            email=f'{PREFIXO}{indice}@galaxybank.test',
+            password=contexto['senha'],
+            first_name=rng.choice(NOMES),
+            last_name=rng.choice(SOBRENOMES),
+            tipo_usuario='cliente',
+            telefone=f'(11) 9{telefone // 10000:04d}-{telefone % 10000:04d}',
+            date_joined=cadastro,
+        )
+        cliente = Cliente(
+            usuario=usuario,
+            cpf=f'9{indice:010d}',
+            score_pontos=rng.randint(0, 1000),
+            saldo=Decimal('0.00'),
+            limite_credito=Decimal('0.00'),
+            data_cadastro=cadastro,
+        )
+        self.usuarios.append(usuario)
+        self.clientes.append(cliente)
+        return {
+            'cliente': cliente,
+            'cadastro': cadastro,
+            'renda': _dinheiro(rng.lognormvariate(8.0, 0.6)),
+            'saldo': Decimal('0.00'),
+            'credito_desde': None,
+        }
+
+    def _planejar(self, posicao, estado, estados):
+        rng, contexto = self.rng, self.contexto
+        cadastro, renda = estado['cadastro'], estado['renda']
+        meses = (self.fim - cadastro).days / 30
+
+        deposito_inicial = _dinheiro(renda * Decimal(rng.uniform(0.1, 1)))
+        self._agendar(cadastro, 'deposito', posicao, (deposito_inicial, 'Depósito inicial'))
+        mes = _somar_meses(cadastro.date().replace(day=1), 1)
+        while True:
+            salario = self._momento(mes.replace(day=5))
+            if salario >= self.fim:
+                break
+            self._agendar(salario, 'deposito', posicao, (renda, 'Salário'))
+            mes = _somar_meses(mes, 1)
+
+        if rng.random() < contexto['taxa_credito']:
+            self._solicitar_credito(estado)
+
+        for _ in range(self._quantidade(contexto['compras_por_mes'] * meses)):
+            momento = self._momento_entre(cadastro, self.fim)
+            escolhidos = rng.sample(contexto['produtos'], min(rng.choice([1, 1, 1, 2, 3]), len(contexto['produtos'])))
+            itens = [
+                (produto, rng.choice([1, 1, 1, 2]), preco_vista, preco_prazo)
+                for produto, preco_vista, preco_prazo in escolhidos
+            ]
+            credito = estado['credito_desde'] is not None and momento > estado['credito_desde'] and rng.random() < 0.5
+            self._agendar(momento, 'compra', posicao, (itens, rng.choice(PARCELAS) if credito else None))
+
+        if len(estados) > 1:
+            for _ in range(self._quantidade(contexto['transferencias_por_mes'] * meses)):
+                destino = rng.randrange(len(estados) - 1)
+                destino += destino >= posicao
+                inicio = max(cadastro, estados[destino]['cadastro'])
+                valor = _dinheiro(renda * Decimal(rng.uniform(0.01, 0.2)))
+                self._agendar(self._momento_entre(inicio, self.fim), 'transferencia', posicao, (destino, valor))
+
+    def _solicitar_credito(self, estado):
+        rng, contexto = self.rng, self.contexto
+        cliente, renda = estado['cliente'], estado['renda']
+        momentos = sorted(self._momento_entre(estado['cadastro'], self.fim) for _ in range(rng.randint(1, 3)))
+        for numero, momento in enumerate(momentos, start=1):
+            solicitacao = SolicitacaoCredito(
+                cliente=cliente,
+                valor_solicitado=_dinheiro(renda * Decimal(rng.uniform(0.5, 5))),
+                justificativa='Solicitação sintética para teste de carga',
+                renda_mensal=renda,
+                profissao=rng.choice(PROFISSOES),
+                data_solicitacao=momento,
+            )
+            self.solicitacoes.append(solicitacao)
+            avaliacao = momento + timedelta(days=rng.randint(1, 5))
+            if numero == len(momentos) and (avaliacao >= self.fim or rng.random() < 0.2):
+                continue  # ainda pendente
+            solicitacao.gerente_responsavel = rng.choice(contexto['gerentes']) if contexto['gerentes'] else None
+            solicitacao.data_avaliacao = avaliacao
+            if rng.random() < 0.6:
+                solicitacao.status = 'aprovada'
+                solicitacao.valor_aprovado = _dinheiro(solicitacao.valor_solicitado * Decimal(rng.uniform(0.5, 1)))
+                solicitacao.observacoes_gerente = 'Aprovada'
+                cliente.limite_credito = solicitacao.valor_aprovado
+                cliente.limite_credito_aprovado = True
+                if estado['credito_desde'] is None:
+                    estado['credito_desde'] = avaliacao
+            else:
+                solicitacao.status = 'reprovada'
+                solicitacao.observacoes_gerente = 'Renda incompatível com o valor solicitado'
+
+    def _transacao(self, estado, tipo, valor, momento, descricao, **extras):
+        self.transacoes.append(Transacao(
+            cliente=estado['cliente'], tipo=tipo, valor=valor, descricao=descricao, data_transacao=momento, **extras
+        ))
+
+    def _deposito(self, momento, estado, posicao, dados):
+        valor, descricao = dados
+        estado['saldo'] += valor
+        self._transacao(estado, 'deposito', valor, momento, descricao)
+
+    def _compra(self, momento, estado, posicao, dados):
+        itens, parcelas = dados
+        credito = parcelas is not None
+        precos = [(preco_prazo if credito else preco_vista) for _, _, preco_vista, preco_prazo in itens]
+        total = sum((preco * quantidade for preco, (_, quantidade, _, _) in zip(precos, itens)), Decimal('0.00'))
+        if not credito and estado['saldo'] < total:
+            return
+
+        compra = Compra(
+            cliente=estado['cliente'],
+            data_compra=momento,
+            valor_total=total,
+            forma_pagamento='credito' if credito else 'saldo',
+            parcelas=parcelas or 1,
+            status=self.rng.choice(['aprovada', 'entregue', 'entregue']),
+        )
+        self.compras.append(compra)
+        for preco, (produto, quantidade, _, _) in zip(precos, itens):
+            self.itens_compra.append(ItemCompra(
+                compra=compra, produto=produto, quantidade=quantidade, preco_unitario=preco, valor_total=preco * quantidade
+            ))
+
+        if not credito:
+            estado['saldo'] -= total
+            self._transacao(estado, 'compra', total, momento, 'Compra na Galaxy Store')
+            return
+
+        valor_parcela = _dinheiro(total / parcelas)
+        mes = momento.date().replace(day=1)
+        for numero in range(1, parcelas + 1):
+            # A última parcela absorve o arredondamento
+            valor = valor_parcela if numero < parcelas else total - valor_parcela * (parcelas - 1)
+            fatura = self._fatura(posicao, estado, _somar_meses(mes, numero - 1), momento)
+            fatura.valor_total += valor
+            fatura.data_atualizacao = momento
+            self.itens_fatura.append(ItemFatura(
+                fatura=fatura,
+                compra=compra,
+                parcela_numero=numero,
+                parcela_total=parcelas,
+                valor_parcela=valor,
+                descricao=f'Compra na Galaxy Store - Parcela {numero}/{parcelas}',
+                data_inclusao=momento,
+            ))
+
+    def _fatura(self, posicao, estado, mes, momento):
+        fatura = self._faturas.get((posicao, mes))
+        if fatura is None:
+            fatura = Fatura(
+                cliente=estado['cliente'],
+                mes_referencia=mes,
+                data_vencimento=_somar_meses(mes, 1).replace(day=10),
+                valor_total=Decimal('0.00'),
+                data_criacao=momento,
+                data_atualizacao=momento,
+            )
+            self._faturas[(posicao, mes)] = fatura
+            self.faturas.append(fatura)
+            if fatura.data_vencimento < self.fim.date():
+                self._agendar(self._momento(fatura.data_vencimento), 'vencimento', posicao, fatura)
+        return fatura
+
+    def _vencimento(self, momento, estado, posicao, fatura):
+        if estado['saldo'] < fatura.valor_total or self.rng.random() < 0.05:
+            fatura.status = 'vencida'
+            fatura.data_atualizacao = momento
+            return
+        estado['saldo'] -= fatura.valor_total
+        fatura.status = 'paga'
+        fatura.valor_pago = fatura.valor_total
+        fatura.data_pagamento = fatura.data_atualizacao = momento
+        self.pagamentos.append(PagamentoFatura(
+            fatura=fatura,
+            valor_pago=fatura.valor_total,
+            forma_pagamento='saldo',
+            data_pagamento=momento,
+            observacoes='Pagamento via saldo',
+        ))
+        self._transacao(
+            estado, 'pagamento_fatura', fatura.valor_total, momento,
+            f'Pagamento da fatura {fatura.mes_referencia:%m/%Y}',
+        )
+
+    def _transferencia(self, momento, estado, posicao, dados):
+        destino, valor = dados
+        if estado['saldo'] < valor:
+            return
+        remetente, destinatario = estado['cliente'], self.estados[destino]['cliente']
+        estado['saldo'] -= valor
+        self.estados[destino]['saldo'] += valor
+        if self.contexto['livro']:
+            self.lancamentos.append(LancamentoContabil(
+                conta_debito=remetente, conta_credito=destinatario, valor=valor, descricao='', data=momento
+            ))
+            return
+        self._transacao(
+            estado, 'transferencia_enviada', valor, momento,
+            _descricao_transferencia('Transferência para', destinatario, ''), destinatario=destinatario,
+        )
+        self._transacao(
+            self.estados[destino], 'transferencia_recebida', valor, momento,
+            _descricao_transferencia('Transferência de', remetente, ''), origem=remetente,
+        )
+
+    def _fechar_faturas(self):
+        mes_atual = self.fim.date().replace(day=1)
+        for fatura in self.faturas:
+            if fatura.status == 'aberta' and fatura.mes_referencia < mes_atual:
+                fatura.status = 'fechada'
+
+    def resumos(self):
+        """Resumo diário das transações do lote (já gravadas, com os ids dos clientes)"""
+        grupos = defaultdict(lambda: [0, Decimal('0.00')])
+        for transacao in [*self.transacoes, *livro_contabil.lados(self.lancamentos)]:
+            grupo = grupos[(transacao.cliente_id, timezone.localdate(transacao.data_transacao), transacao.tipo)]
+            grupo[0] += 1
+            grupo[1] += transacao.valor
+        return [
+            TransacaoResumoDiario(cliente_id=cliente_id, dia=dia, tipo=tipo, quantidade=quantidade, total=total)
+            for (cliente_id, dia, tipo), (quantidade, total) in grupos.items()
+        ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera clientes sintéticos com histórico de transações, compras, faturas e solicitações de crédito '
+        'para testes de carga, gravando em lotes com bulk_create no banco configurado'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=1000)
+        parser.add_argument('--dias', type=int, default=365, help='Extensão do histórico, terminando ontem')
+        parser.add_argument('--compras-por-mes', type=float, default=2.0)
+        parser.add_argument('--transferencias-por-mes', type=float, default=3.0)
+        parser.add_argument('--taxa-credito', type=float, default=0.3, help='Fração de clientes que pede crédito')
+        parser.add_argument('--produtos', type=int, default=200, help='Produtos criados se a loja estiver vazia')
+        parser.add_argument('--lote', type=int, default=1000, help='Clientes por lote (uma transação por lote)')
+        parser.add_argument('--tamanho-insert', type=int, default=2000, help='Linhas por INSERT do bulk_create')
+        parser.add_argument('--senha', default='Sintetico@2025')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['clientes'] < 1 or options['lote'] < 1 or options['dias'] < 1:
+            raise CommandError('--clientes, --lote e --dias devem ser positivos.')
+
+        rng = random.Random(options['seed'])
+        fim = timezone.make_aware(datetime.combine(timezone.localdate(), hora.min))
+        contexto = {
+            'fim': fim,
+            'inicio': (fim - timedelta(days=options['dias'])).date(),
+            'dias': options['dias'],
+            'fuso': timezone.get_current_timezone(),
+            # Um único hash para todos: o PBKDF2 de cada usuário custaria mais que a carga inteira
+            'senha': make_password(options['senha']),
+            # Gerador próprio: o histórico não depende de o catálogo já existir ou não
+            'produtos': self._produtos(options['produtos'], random.Random(f"{options['seed']}-produtos")),
+            'gerentes': list(Gerente.objects.filter(ativo=True).order_by('pk')),
+            'livro': livro_contabil.ativo(),
+            'compras_por_mes': options['compras_por_mes'],
+            'transferencias_por_mes': options['transferencias_por_mes'],
+            'taxa_credito': options['taxa_credito'],
+        }
+
+        primeiro = Usuario.objects.filter(username__startswith=PREFIXO).count()
+        totais = Counter()
+        inicio = time.perf_counter()
+        with preservar_datas(*CAMPOS_DATA):
+            for deslocamento in range(0, options['clientes'], options['lote']):
+                quantidade = min(options['lote'], options['clientes'] - deslocamento)
+                indices = range(primeiro + deslocamento, primeiro + deslocamento + quantidade)
+                inicio_lote = time.perf_counter()
+                lote = _Lote(rng, indices, contexto)
+                with transaction.atomic():
+                    linhas = self._gravar(lote, options['tamanho_insert'])
+                duracao = time.perf_counter() - inicio_lote
+                totais.update(linhas)
+                self.stdout.write(
+                    f'  clientes {indices.start}-{indices.stop - 1}: {sum(linhas.values()):,} linhas em '
+                    f'{duracao:.1f}s ({sum(linhas.values()) / duracao:,.0f} linhas/s)'
+                )
+        duracao = time.perf_counter() - inicio
+
+        invalidar_kpis()
+        invalidar_relatorio()
+
+        for modelo, quantidade in totais.items():
+            self.stdout.write(f'  {modelo:<24} {quantidade:>12,}')
+        total = sum(totais.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {options['clientes']:,} clientes sintéticos, {total:,} linhas em {duracao:.1f}s "
+            f'({total / duracao:,.0f} linhas/s)'
+        ))
+
+    def _produtos(self, quantidade, rng):
+        """(produto, preço à vista, preço a prazo) da loja, criando um catálogo sintético se ela estiver vazia"""
+        produtos = list(Produto.objects.filter(ativo=True).order_by('pk'))
+        if not produtos:
+            categoria, _ = CategoriaProduto.objects.get_or_create(nome='Sintéticos')
+            novos = []
+            for numero in range(1, quantidade + 1):
+                preco = _dinheiro(rng.lognormvariate(4.5, 0.9))
+                novos.append(Produto(
+                    titulo=f'Produto sintético {numero}',
+                    descricao='Produto gerado para testes de carga',
+                    preco_vista=preco,
+                    preco_prazo=_dinheiro(preco * Decimal('1.1')),
+                    categoria=categoria,
+                ))
+            produtos = Produto.objects.bulk_create(novos)
+        if not produtos:
+            raise CommandError('A loja não tem produtos ativos.')
+        return [
+            (produto, produto.preco_vista, produto.preco_prazo or produto.preco_vista)
+            for produto in produtos
+        ]
+
+    def _gravar(self, lote, tamanho_insert):
+        """Grava o lote na ordem das chaves estrangeiras; retorna as linhas por modelo"""
+        linhas = Counter()
+
+        def inserir(modelo, objetos):
+            modelo.objects.bulk_create(objetos, batch_size=tamanho_insert)
+            linhas[modelo.__name__] += len(objetos)
+
+        inserir(Usuario, lote.usuarios)
+        for cliente in lote.clientes:
+            cliente.usuario_id = cliente.usuario.pk
+        inserir(Cliente, lote.clientes)
+        inserir(Transacao, lote.transacoes)
+        inserir(LancamentoContabil, lote.lancamentos)
+        inserir(Compra, lote.compras)
+        inserir(ItemCompra, lote.itens_compra)
+        inserir(Fatura, lote.faturas)
+        inserir(ItemFatura, lote.itens_fatura)
+        inserir(PagamentoFatura, lote.pagamentos)
+        inserir(SolicitacaoCredito, lote.solicitacoes)
+        inserir(TransacaoResumoDiario, lote.resumos())
+        return {modelo: quantidade for modelo, quantidade in linhas.items() if quantidade}
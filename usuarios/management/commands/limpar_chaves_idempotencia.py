@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from usuarios.models import ChaveIdempotencia
+
+
+class Command(BaseCommand):
+    help = 'Remove as chaves de idempotência expiradas (rodar periodicamente via cron)'
+
+    def handle(self, *args, **options):
+        removidas, _ = ChaveIdempotencia.objects.filter(expira_em__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'✓ {removidas} chaves de idempotência expiradas removidas'))
@@ -0,0 +1,45 @@
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+
+# Chaves que o cadastro em etapas gravava na sessão antes de usar o cookie
+# assinado de usuarios.cadastro
+CHAVES_CADASTRO = ('registro_etapa1', 'registro_etapa2', 'registro_etapa3')
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove as sessões deixadas por cadastros abandonados (sem usuário logado) e tira os dados '
+        'de cadastro das demais; sessões expiradas em geral ficam com o clearsessions'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Só conta, sem alterar o banco')
+        parser.add_argument('--lote', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Só lê durante a varredura: no SQLite, gravar na tabela percorrida
+        # pelo iterator pode repetir ou pular linhas
+        orfas, limpar = [], []
+        for sessao in Session.objects.iterator(chunk_size=options['lote']):
+            dados = sessao.get_decoded()
+            if not any(chave in dados for chave in CHAVES_CADASTRO):
+                continue
+            if SESSION_KEY in dados:
+                limpar.append((sessao.pk, dados, sessao.expire_date))
+            else:
+                orfas.append(sessao.pk)
+
+        if not options['simular']:
+            for inicio in range(0, len(orfas), options['lote']):
+                Session.objects.filter(pk__in=orfas[inicio:inicio + options['lote']]).delete()
+            for chave_sessao, dados, expira_em in limpar:
+                for chave in CHAVES_CADASTRO:
+                    dados.pop(chave, None)
+                Session.objects.save(chave_sessao, dados, expira_em)
+
+        verbo = 'seriam' if options['simular'] else 'foram'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(orfas)} sessões de cadastros abandonados {verbo} removidas; '
+            f'{len(limpar)} sessões de usuários logados {verbo} limpas'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from usuarios import livro_contabil
+
+
+class Command(BaseCommand):
+    help = 'Converte os pares de transferências enviada/recebida de Transacao em lançamentos contábeis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Apenas conta os pares, sem gravar')
+        parser.add_argument('--lote', type=int, default=2000, help='Pares convertidos por transação')
+
+    def handle(self, *args, **options):
+        if not livro_contabil.ativo() and not options['simular']:
+            raise CommandError(
+                'Ative LIVRO_CONTABIL_TRANSFERENCIAS antes de migrar; do contrário as '
+                'transferências convertidas deixam de aparecer no extrato.'
+            )
+
+        pares, sem_par = livro_contabil.parear_transferencias()
+        self.stdout.write(f'{len(pares)} transferências pareadas, {sem_par} transações sem par (mantidas)')
+        if options['simular']:
+            return
+
+        migradas = livro_contabil.migrar_transferencias(pares, options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {migradas} transferências convertidas ({2 * migradas} transações substituídas por {migradas} lançamentos)'
+        ))
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from usuarios.models import Cliente
+from usuarios.resumos import reconstruir, divergencias
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o resumo diário de transações (carga inicial e reconciliação)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Recalcula apenas a partir desta data (AAAA-MM-DD)')
+        parser.add_argument('--cpf', help='Recalcula apenas o cliente com este CPF')
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Apenas compara o resumo com as transações, sem gravar; falha se houver divergências',
+        )
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Data inválida. Use o formato AAAA-MM-DD.')
+
+        clientes = None
+        if options['cpf']:
+            clientes = list(Cliente.objects.filter(cpf=options['cpf']).values_list('pk', flat=True))
+            if not clientes:
+                raise CommandError(f"Cliente com CPF {options['cpf']} não encontrado.")
+
+        if options['verificar']:
+            diferencas = divergencias(desde, clientes)
+            for cliente_id, dia, tipo, esperado, gravado in diferencas:
+                self.stdout.write(f'  cliente {cliente_id} {dia:%d/%m/%Y} {tipo}: esperado {esperado}, gravado {gravado}')
+            if diferencas:
+                raise CommandError(f'{len(diferencas)} divergências entre o resumo diário e as transações.')
+            self.stdout.write(self.style.SUCCESS('✓ Resumo diário confere com as transações'))
+            return
+
+        gravadas = reconstruir(desde, clientes)
+        self.stdout.write(self.style.SUCCESS(f'✓ {gravadas} linhas de resumo diário gravadas'))
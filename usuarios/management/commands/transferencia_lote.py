@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from usuarios.models import Cliente
+from usuarios.services import transferir_lote, ler_lote, TransferenciaError
+
+
+class Command(BaseCommand):
+    help = 'Executa transferências em lote (folha de pagamento) a partir de um arquivo CSV ou JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cpf_remetente', help='CPF do cliente que paga o lote')
+        parser.add_argument('arquivo', help='Arquivo .csv (cpf,valor,descricao) ou .json')
+        parser.add_argument('--formato', choices=['csv', 'json'], help='Padrão: extensão do arquivo')
+
+    def handle(self, *args, **options):
+        caminho = Path(options['arquivo'])
+        formato = options['formato'] or caminho.suffix.lstrip('.').lower()
+
+        try:
+            remetente = Cliente.objects.select_related('usuario').get(cpf=options['cpf_remetente'])
+        except Cliente.DoesNotExist:
+            raise CommandError(f"Cliente com CPF {options['cpf_remetente']} não encontrado.")
+
+        try:
+            linhas = ler_lote(caminho.read_bytes(), formato)
+            resultado = transferir_lote(remetente, linhas)
+        except (OSError, TransferenciaError) as e:
+            raise CommandError(str(e))
+
+        for falha in resultado['falhas']:
+            self.stdout.write(self.style.ERROR(f"✗ Linha {falha['linha']} ({falha['cpf']}): {falha['erro']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {len(resultado['processadas'])} transferências realizadas "
+            f"(R$ {resultado['total_transferido']}), {len(resultado['falhas'])} falhas"
+        ))
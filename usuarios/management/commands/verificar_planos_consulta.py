@@ -0,0 +1,104 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from usuarios.exportacao import transacoes_periodo
+from usuarios.livro_contabil import ultimos_movimentos
+from usuarios.models import Cliente, CheckpointSaldo, Transacao
+from usuarios.paginacao import consulta_pagina, codificar_cursor
+from usuarios.resumos import resumos_periodo
+from usuarios.saldos import inicio_do_dia, movimentos_ate, movimentos_depois
+from usuarios.views import data_inicial_extrato, transacoes_extrato
+
+# Com o livro contábil, o histórico vem da view MovimentoCliente: cada parte
+# dela é lida por índice, e a ordenação final junta as partes em memória
+# (só as linhas do cliente no período)
+VIEW_MOVIMENTOS = 'usuarios_movimentocliente'
+
+# SCAN de uma tabela (ou de um alias dentro da view); a leitura das linhas
+# que a view já entregou filtradas não conta
+_VARREDURA = re.compile(rf'\bSCAN (?!{VIEW_MOVIMENTOS}\b)\w+')
+
+
+def consultas_criticas(cliente_id=0):
+    """
+    Consultas das páginas mais acessadas, montadas pelas mesmas funções que
+    as views usam (Transacao ou MovimentoCliente, conforme o livro contábil)
+    """
+    cliente = Cliente(pk=cliente_id)
+    agora = timezone.now()
+    hoje = timezone.localdate()
+    extrato = transacoes_extrato(cliente, '30', 'todas')
+
+    return {
+        'dashboard: últimas transações': ultimos_movimentos(cliente),
+        'dashboard: totais do mês': resumos_periodo(cliente, hoje.replace(day=1)),
+        'extrato: período': consulta_pagina(extrato),
+        'extrato: período por tipo': consulta_pagina(transacoes_extrato(cliente, '30', 'deposito')),
+        'extrato: página seguinte (cursor)': consulta_pagina(
+            extrato, codificar_cursor(Transacao(pk=1, data_transacao=agora))
+        ),
+        'extrato: totais do período por tipo': resumos_periodo(
+            cliente, data_inicial_extrato('30'), tipo='deposito'
+        ),
+        'exportação: período': transacoes_periodo(cliente, inicio_do_dia(hoje - timedelta(days=30)), agora),
+        'gráficos: última movimentação': ultimos_movimentos(cliente, 1),
+        'gráficos: movimento por balde': resumos_periodo(cliente, hoje - timedelta(days=30), hoje),
+        'saldo histórico: desde o checkpoint': movimentos_ate(
+            cliente, agora - timedelta(days=3), CheckpointSaldo(data=hoje - timedelta(days=10))
+        ),
+        'saldo histórico: sem checkpoint': movimentos_ate(cliente, agora - timedelta(days=30)),
+        'extrato: saldo após a linha': movimentos_depois(cliente, Transacao(pk=1, data_transacao=agora)),
+    }
+
+
+def problema(plano):
+    """Motivo para reprovar o plano (None se ele usa índices)"""
+    if _VARREDURA.search(plano):
+        return 'varredura completa da tabela'
+    if 'USE TEMP B-TREE' in plano and VIEW_MOVIMENTOS not in plano:
+        return 'ordenação fora do índice'
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Roda EXPLAIN QUERY PLAN nas consultas críticas do histórico dos clientes, com e sem o '
+        'livro contábil, e falha se alguma fizer varredura completa ou precisar ordenar em memória'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Este verificador interpreta apenas planos do SQLite.')
+
+        falhas = []
+        for livro_contabil in (False, True):
+            with override_settings(LIVRO_CONTABIL_TRANSFERENCIAS=livro_contabil):
+                consultas = consultas_criticas()
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"\nLIVRO_CONTABIL_TRANSFERENCIAS = {livro_contabil}"
+            ))
+            for nome, consulta in consultas.items():
+                plano = consulta.explain()
+                self.stdout.write(f'\n{nome}')
+                for linha in plano.splitlines():
+                    self.stdout.write(f'    {linha}')
+
+                motivo = problema(plano)
+                if motivo:
+                    falhas.append(f'{nome} (livro contábil: {livro_contabil})')
+                    self.stdout.write(self.style.ERROR(f'    ✗ {motivo}'))
+                elif VIEW_MOVIMENTOS in plano:
+                    self.stdout.write(self.style.SUCCESS(
+                        '    ✓ usa índice em cada parte da view (a ordenação junta só as linhas do cliente)'
+                    ))
+                else:
+                    self.stdout.write(self.style.SUCCESS('    ✓ usa índice'))
+
+        if falhas:
+            raise CommandError(f"Consultas sem índice: {', '.join(falhas)}")
+
+        self.stdout.write(self.style.SUCCESS('\n✓ Todas as consultas críticas usam índices'))
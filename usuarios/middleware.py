@@ -0,0 +1,44 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.deprecation import MiddlewareMixin
+
+from .models import Cliente, Gerente
+
+
+def _perfil(usuario, campo):
+    if not usuario.is_authenticated:
+        return None
+    try:
+        return getattr(usuario, campo)
+    except ObjectDoesNotExist:
+        return None
+
+
+class PerfilMiddleware(MiddlewareMixin):
+    """
+    Expõe o perfil do usuário autenticado em request.cliente e request.gerente
+    (None quando o usuário não tem aquele perfil).
+
+    Deve vir depois do AuthenticationMiddleware. O usuário vem do backend com
+    os perfis já carregados (ver usuarios.cache_usuario), então isso não gera
+    consultas extras.
+    """
+
+    def process_request(self, request):
+        request.cliente = _perfil(request.user, 'cliente')
+        request.gerente = _perfil(request.user, 'gerente')
+
+
+def cliente_da_requisicao(request):
+    """Perfil de cliente da requisição; levanta Cliente.DoesNotExist se não houver"""
+    cliente = getattr(request, 'cliente', None)
+    if cliente is None:
+        raise Cliente.DoesNotExist('Usuário sem perfil de cliente.')
+    return cliente
+
+
+def gerente_da_requisicao(request):
+    """Perfil de gerente da requisição; levanta Gerente.DoesNotExist se não houver"""
+    gerente = getattr(request, 'gerente', None)
+    if gerente is None:
+        raise Gerente.DoesNotExist('Usuário sem perfil de gerente.')
+    return gerente
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_transacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckpointSaldo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('saldo', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints_saldo', to='usuarios.cliente')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de Saldo',
+                'verbose_name_plural': 'Checkpoints de Saldo',
+                'ordering': ['-data'],
+                'unique_together': {('cliente', 'data')},
+            },
+        ),
+    ]
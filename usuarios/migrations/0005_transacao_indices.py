@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_checkpointsaldo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transacao',
+            index=models.Index(fields=['cliente', '-data_transacao'], name='transacao_cliente_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transacao',
+            index=models.Index(fields=['cliente', 'tipo', '-data_transacao'], name='transacao_cli_tipo_data_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0005_transacao_indices'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transacao',
+            name='transacao_cliente_data_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transacao',
+            index=models.Index(fields=['cliente', '-data_transacao', '-id'], name='transacao_cliente_data_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0006_transacao_indice_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=64)),
+                ('impressao_digital', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('processando', 'Processando'), ('concluida', 'Concluída')], default='processando', max_length=12)),
+                ('status_http', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('corpo_resposta', models.BinaryField(blank=True, default=b'')),
+                ('cabecalhos_resposta', models.JSONField(blank=True, default=dict)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('expira_em', models.DateTimeField(db_index=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chaves_idempotencia', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Chave de Idempotência',
+                'verbose_name_plural': 'Chaves de Idempotência',
+                'unique_together': {('usuario', 'chave')},
+            },
+        ),
+    ]
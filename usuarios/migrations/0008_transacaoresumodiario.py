@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0007_chaveidempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransacaoResumoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('tipo', models.CharField(choices=[('deposito', 'Depósito'), ('transferencia_enviada', 'Transferência Enviada'), ('transferencia_recebida', 'Transferência Recebida'), ('compra', 'Compra'), ('pagamento_fatura', 'Pagamento de Fatura')], max_length=25)),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_diarios', to='usuarios.cliente')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Transações',
+                'verbose_name_plural': 'Resumos Diários de Transações',
+                'indexes': [models.Index(fields=['dia', 'tipo'], name='resumo_dia_tipo_idx')],
+                'unique_together': {('cliente', 'dia', 'tipo')},
+            },
+        ),
+    ]
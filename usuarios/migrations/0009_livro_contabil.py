@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# Histórico do cliente no formato de Transacao: as transações mais os
+# lançamentos contábeis vistos pelo lado do débito e do crédito
+CRIAR_VIEW_MOVIMENTOS = """
+CREATE VIEW usuarios_movimentocliente AS
+SELECT t.id * 2 AS id, t.cliente_id, t.tipo, t.valor, t.descricao, t.data_transacao,
+       t.destinatario_id, t.origem_id
+  FROM usuarios_transacao t
+UNION ALL
+SELECT l.id * 2 + 1, l.conta_debito_id, 'transferencia_enviada', l.valor,
+       'Transferência para ' || u.first_name || ' (' || c.cpf || ')'
+           || CASE WHEN l.descricao = '' THEN '' ELSE ' - ' || l.descricao END,
+       l.data, l.conta_credito_id, NULL
+  FROM usuarios_lancamentocontabil l
+  JOIN usuarios_cliente c ON c.usuario_id = l.conta_credito_id
+  JOIN usuarios_usuario u ON u.id = c.usuario_id
+UNION ALL
+SELECT l.id * 2 + 1, l.conta_credito_id, 'transferencia_recebida', l.valor,
+       'Transferência de ' || u.first_name || ' (' || c.cpf || ')'
+           || CASE WHEN l.descricao = '' THEN '' ELSE ' - ' || l.descricao END,
+       l.data, NULL, l.conta_debito_id
+  FROM usuarios_lancamentocontabil l
+  JOIN usuarios_cliente c ON c.usuario_id = l.conta_debito_id
+  JOIN usuarios_usuario u ON u.id = c.usuario_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_transacaoresumodiario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentoCliente',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('deposito', 'Depósito'), ('transferencia_enviada', 'Transferência Enviada'), ('transferencia_recebida', 'Transferência Recebida'), ('compra', 'Compra'), ('pagamento_fatura', 'Pagamento de Fatura')], max_length=25)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('descricao', models.TextField(blank=True)),
+                ('data_transacao', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Movimento do Cliente',
+                'verbose_name_plural': 'Movimentos dos Clientes',
+                'db_table': 'usuarios_movimentocliente',
+                'ordering': ['-data_transacao'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='LancamentoContabil',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('descricao', models.TextField(blank=True)),
+                ('data', models.DateTimeField(default=django.utils.timezone.now)),
+                ('conta_credito', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lancamentos_credito', to='usuarios.cliente')),
+                ('conta_debito', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lancamentos_debito', to='usuarios.cliente')),
+            ],
+            options={
+                'verbose_name': 'Lançamento Contábil',
+                'verbose_name_plural': 'Lançamentos Contábeis',
+                'ordering': ['-data'],
+                'indexes': [models.Index(fields=['conta_debito', '-data', '-id'], name='lancamento_debito_data_idx'), models.Index(fields=['conta_credito', '-data', '-id'], name='lancamento_credito_data_idx')],
+            },
+        ),
+        migrations.RunSQL(CRIAR_VIEW_MOVIMENTOS, 'DROP VIEW usuarios_movimentocliente'),
+    ]
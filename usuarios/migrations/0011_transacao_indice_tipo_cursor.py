@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0010_usuario_login_lower'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transacao',
+            name='transacao_cli_tipo_data_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transacao',
+            index=models.Index(fields=['cliente', 'tipo', '-data_transacao', '-id'], name='transacao_cli_tipo_data_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Mesma view da migração 0009, mas com um id diferente para cada lado do
+# lançamento (antes os dois eram l.id * 2 + 1): transações em t.id * 4,
+# débito em l.id * 4 + 1 e crédito em l.id * 4 + 3
+VIEW_MOVIMENTOS = """
+CREATE VIEW usuarios_movimentocliente AS
+SELECT t.id * {transacao} AS id, t.cliente_id, t.tipo, t.valor, t.descricao, t.data_transacao,
+       t.destinatario_id, t.origem_id
+  FROM usuarios_transacao t
+UNION ALL
+SELECT {debito}, l.conta_debito_id, 'transferencia_enviada', l.valor,
+       'Transferência para ' || u.first_name || ' (' || c.cpf || ')'
+           || CASE WHEN l.descricao = '' THEN '' ELSE ' - ' || l.descricao END,
+       l.data, l.conta_credito_id, NULL
+  FROM usuarios_lancamentocontabil l
+  JOIN usuarios_cliente c ON c.usuario_id = l.conta_credito_id
+  JOIN usuarios_usuario u ON u.id = c.usuario_id
+UNION ALL
+SELECT {credito}, l.conta_credito_id, 'transferencia_recebida', l.valor,
+       'Transferência de ' || u.first_name || ' (' || c.cpf || ')'
+           || CASE WHEN l.descricao = '' THEN '' ELSE ' - ' || l.descricao END,
+       l.data, NULL, l.conta_debito_id
+  FROM usuarios_lancamentocontabil l
+  JOIN usuarios_cliente c ON c.usuario_id = l.conta_debito_id
+  JOIN usuarios_usuario u ON u.id = c.usuario_id
+"""
+
+IDS_UNICOS = VIEW_MOVIMENTOS.format(transacao=4, debito='l.id * 4 + 1', credito='l.id * 4 + 3')
+IDS_0009 = VIEW_MOVIMENTOS.format(transacao=2, debito='l.id * 2 + 1', credito='l.id * 2 + 1')
+REMOVER_VIEW = 'DROP VIEW usuarios_movimentocliente'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0011_transacao_indice_tipo_cursor'),
+    ]
+
+    operations = [
+        migrations.RunSQL([REMOVER_VIEW, IDS_UNICOS], [REMOVER_VIEW, IDS_0009]),
+    ]
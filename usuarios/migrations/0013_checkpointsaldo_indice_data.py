@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0012_movimentocliente_ids_unicos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='checkpointsaldo',
+            index=models.Index(fields=['data'], name='checkpoint_data_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
+from django.db.models.functions import Lower
+from django.utils import timezone
 
 class Usuario(AbstractUser):
     """Modelo base para todos os tipos de usuário"""
@@ -21,6 +23,13 @@ class Usuario(AbstractUser):
         validators=[RegexValidator(r'^\+?1?\d{9,15}$')]
     )
     
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Login sem diferenciar maiúsculas (ver backends.EmailOrUsernameModelBackend)
+            models.Index(Lower('username'), name='usuario_username_lower_idx'),
+            models.Index(Lower('email'), name='usuario_email_lower_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.username} ({self.get_tipo_usuario_display()})"
 
@@ -68,6 +77,8 @@ class Transacao(models.Model):
         ('compra', 'Compra'),
         ('pagamento_fatura', 'Pagamento de Fatura'),
     ]
+    TIPOS_ENTRADA = ['deposito', 'transferencia_recebida']
+    TIPOS_SAIDA = ['transferencia_enviada', 'compra', 'pagamento_fatura']
     
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='transacoes_origem')
     tipo = models.CharField(max_length=25, choices=TIPO_TRANSACAO_CHOICES)
@@ -83,6 +94,13 @@ class Transacao(models.Model):
         verbose_name = 'Transação'
         verbose_name_plural = 'Transações'
         ordering = ['-data_transacao']
+        indexes = [
+            # Extrato, dashboard e estatísticas: cliente + período, mais recentes primeiro.
+            # O id desempata a paginação por cursor sem ordenação extra.
+            models.Index(fields=['cliente', '-data_transacao', '-id'], name='transacao_cliente_data_idx'),
+            # Extrato filtrado por tipo (também paginado por cursor)
+            models.Index(fields=['cliente', 'tipo', '-data_transacao', '-id'], name='transacao_cli_tipo_data_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} - R$ {self.valor} - {self.cliente.usuario.first_name}"
@@ -90,9 +108,144 @@ class Transacao(models.Model):
     @property
     def eh_entrada(self):
         """Retorna True se a transação representa entrada de dinheiro"""
-        return self.tipo in ['deposito', 'transferencia_recebida']
+        return self.tipo in self.TIPOS_ENTRADA
     
     @property
     def eh_saida(self):
         """Retorna True se a transação representa saída de dinheiro"""
-        return self.tipo in ['transferencia_enviada', 'compra', 'pagamento_fatura']
+        return self.tipo in self.TIPOS_SAIDA
+
+class CheckpointSaldo(models.Model):
+    """Saldo do cliente no fim de um dia, usado para consultas históricas"""
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='checkpoints_saldo')
+    data = models.DateField()
+    saldo = models.DecimalField(max_digits=10, decimal_places=2)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Checkpoint de Saldo'
+        verbose_name_plural = 'Checkpoints de Saldo'
+        unique_together = ['cliente', 'data']
+        ordering = ['-data']
+        indexes = [
+            # Relatório de saldos do gerente: rodada mais recente até o dia e seus checkpoints
+            models.Index(fields=['data'], name='checkpoint_data_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.cliente.usuario.first_name} - {self.data.strftime('%d/%m/%Y')} - R$ {self.saldo}"
+
+class ChaveIdempotencia(models.Model):
+    """Resposta registrada para uma chave de idempotência enviada pelo app ou formulário"""
+    STATUS_CHOICES = [
+        ('processando', 'Processando'),
+        ('concluida', 'Concluída'),
+    ]
+    
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='chaves_idempotencia')
+    chave = models.CharField(max_length=64)
+    impressao_digital = models.CharField(max_length=64)  # SHA-256 de método, caminho e dados enviados
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='processando')
+    status_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    corpo_resposta = models.BinaryField(blank=True, default=b'')
+    cabecalhos_resposta = models.JSONField(default=dict, blank=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    expira_em = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name = 'Chave de Idempotência'
+        verbose_name_plural = 'Chaves de Idempotência'
+        unique_together = ['usuario', 'chave']
+    
+    def __str__(self):
+        return f"{self.usuario.username} - {self.chave} ({self.get_status_display()})"
+
+class TransacaoResumoDiario(models.Model):
+    """Quantidade e soma das transações de um cliente por dia e tipo"""
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='resumos_diarios')
+    dia = models.DateField()
+    tipo = models.CharField(max_length=25, choices=Transacao.TIPO_TRANSACAO_CHOICES)
+    quantidade = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = 'Resumo Diário de Transações'
+        verbose_name_plural = 'Resumos Diários de Transações'
+        unique_together = ['cliente', 'dia', 'tipo']
+        indexes = [
+            # Tendências de todos os clientes por período
+            models.Index(fields=['dia', 'tipo'], name='resumo_dia_tipo_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.cliente_id} - {self.dia.strftime('%d/%m/%Y')} - {self.get_tipo_display()}: {self.quantidade} (R$ {self.total})"
+
+class LancamentoContabil(models.Model):
+    """
+    Transferência registrada uma única vez, com conta de débito e de crédito.
+
+    Substitui o par transferencia_enviada/transferencia_recebida de Transacao
+    quando LIVRO_CONTABIL_TRANSFERENCIAS está ativo. A descrição guarda apenas
+    o texto informado pelo cliente; o texto do extrato é montado na leitura
+    (ver MovimentoCliente).
+
+    As contas usam PROTECT, e não o CASCADE de Transacao.cliente: uma
+    Transacao pertence a um só cliente, mas o lançamento é também o histórico
+    da contraparte, e apagá-lo junto com um dos clientes deixaria o saldo do
+    outro sem as movimentações que o explicam.
+    """
+    conta_debito = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name='lancamentos_debito')
+    conta_credito = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name='lancamentos_credito')
+    valor = models.DecimalField(max_digits=10, decimal_places=2)
+    descricao = models.TextField(blank=True)
+    data = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Lançamento Contábil'
+        verbose_name_plural = 'Lançamentos Contábeis'
+        ordering = ['-data']
+        indexes = [
+            models.Index(fields=['conta_debito', '-data', '-id'], name='lancamento_debito_data_idx'),
+            models.Index(fields=['conta_credito', '-data', '-id'], name='lancamento_credito_data_idx'),
+        ]
+    
+    def __str__(self):
+        return f"R$ {self.valor} - {self.conta_debito_id} → {self.conta_credito_id}"
+
+class MovimentoCliente(models.Model):
+    """
+    Histórico do cliente no formato de Transacao: as transações mais os
+    lançamentos contábeis, cada um visto pelo lado de quem enviou
+    (transferencia_enviada) e de quem recebeu (transferencia_recebida).
+
+    Somente leitura, sobre a view SQL da migração 0012. Os ids são 4 * id da
+    transação, 4 * id do lançamento + 1 (débito) ou + 3 (crédito).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.DO_NOTHING, related_name='+', db_constraint=False)
+    tipo = models.CharField(max_length=25, choices=Transacao.TIPO_TRANSACAO_CHOICES)
+    valor = models.DecimalField(max_digits=10, decimal_places=2)
+    descricao = models.TextField(blank=True)
+    data_transacao = models.DateTimeField()
+    destinatario = models.ForeignKey(Cliente, on_delete=models.DO_NOTHING, null=True, related_name='+', db_constraint=False)
+    origem = models.ForeignKey(Cliente, on_delete=models.DO_NOTHING, null=True, related_name='+', db_constraint=False)
+    
+    class Meta:
+        managed = False
+        db_table = 'usuarios_movimentocliente'
+        verbose_name = 'Movimento do Cliente'
+        verbose_name_plural = 'Movimentos dos Clientes'
+        ordering = ['-data_transacao']
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} - R$ {self.valor}"
+    
+    @property
+    def eh_entrada(self):
+        """Retorna True se o movimento representa entrada de dinheiro"""
+        return self.tipo in Transacao.TIPOS_ENTRADA
+    
+    @property
+    def eh_saida(self):
+        """Retorna True se o movimento representa saída de dinheiro"""
+        return self.tipo in Transacao.TIPOS_SAIDA
@@ -0,0 +1,60 @@
+"""
+Paginação por cursor (keyset) para listas de transações.
+
+Em vez de COUNT(*) + OFFSET, cada página continua a partir da última linha
+da página anterior usando (data_transacao, id). O custo da página N é o
+mesmo da primeira, pois a consulta desce direto pelo índice
+(cliente, -data_transacao).
+"""
+
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+
+TAMANHO_PAGINA = 50
+
+
+def codificar_cursor(transacao):
+    """Gera o cursor que aponta para depois da transação informada"""
+    valor = f'{transacao.data_transacao.isoformat()}|{transacao.pk}'
+    return urlsafe_base64_encode(valor.encode())
+
+
+def decodificar_cursor(cursor):
+    """Retorna (data_transacao, id) de um cursor; ValueError se inválido"""
+    try:
+        data_iso, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        return datetime.fromisoformat(data_iso), int(pk)
+    except (TypeError, UnicodeDecodeError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def consulta_pagina(transacoes, cursor=None, tamanho=TAMANHO_PAGINA):
+    """
+    Consulta da página que começa depois do cursor, com uma linha a mais que
+    `tamanho` para saber se existe próxima página sem COUNT
+    """
+    transacoes = transacoes.order_by('-data_transacao', '-id')
+    if cursor:
+        data, pk = decodificar_cursor(cursor)
+        # O limite redundante `data_transacao <= data` permite ao banco
+        # posicionar direto no índice em vez de filtrar desde o início
+        transacoes = transacoes.filter(
+            Q(data_transacao__lt=data) | Q(data_transacao=data, id__lt=pk),
+            data_transacao__lte=data,
+        )
+    return transacoes[:tamanho + 1]
+
+
+def pagina_por_cursor(transacoes, cursor=None, tamanho=TAMANHO_PAGINA):
+    """
+    Retorna (itens, proximo_cursor) com até `tamanho` transações.
+
+    `proximo_cursor` é None quando não há mais páginas.
+    """
+    itens = list(consulta_pagina(transacoes, cursor, tamanho))
+    if len(itens) > tamanho:
+        itens = itens[:tamanho]
+        return itens, codificar_cursor(itens[-1])
+    return itens, None
@@ -0,0 +1,166 @@
+"""
+Resumo diário de transações (TransacaoResumoDiario).
+
+Cada (cliente, dia, tipo) guarda quantidade e soma das transações. O resumo é
+atualizado na mesma transação que grava as Transacao (ver
+services.registrar_transacoes), então os totais de um mês custam uma linha por
+dia e tipo em vez de uma por transação. `reconstruir` refaz o resumo a partir
+das transações, para carga inicial e reconciliação.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import Transacao, TransacaoResumoDiario
+from .saldos import inicio_do_dia
+from .livro_contabil import movimentos
+
+# Saídas somadas como gastos em todos os totais (dashboard, extrato e painel
+# do gerente); o pagamento de fatura fica de fora
+TIPOS_GASTO = ['transferencia_enviada', 'compra']
+
+
+def acumular(transacoes):
+    """
+    Soma transações recém-gravadas ao resumo diário.
+
+    Deve rodar dentro da transação que as gravou. Faz um UPDATE incremental
+    por (cliente, dia, tipo) e só cria a linha quando ela ainda não existe.
+    """
+    grupos = defaultdict(lambda: [0, Decimal('0.00')])
+    for transacao in transacoes:
+        grupo = grupos[(transacao.cliente_id, timezone.localdate(transacao.data_transacao), transacao.tipo)]
+        grupo[0] += 1
+        grupo[1] += Decimal(transacao.valor)
+
+    for (cliente_id, dia, tipo), (quantidade, total) in grupos.items():
+        resumo = TransacaoResumoDiario.objects.filter(cliente_id=cliente_id, dia=dia, tipo=tipo)
+        incremento = {'quantidade': F('quantidade') + quantidade, 'total': F('total') + total}
+        if resumo.update(**incremento):
+            continue
+        try:
+            with transaction.atomic():
+                TransacaoResumoDiario.objects.create(
+                    cliente_id=cliente_id, dia=dia, tipo=tipo, quantidade=quantidade, total=total
+                )
+        except IntegrityError:
+            # Outra transação criou a linha entre o UPDATE e o INSERT
+            resumo.update(**incremento)
+
+
+def totais_resumo(resumos):
+    """
+    Totais de um queryset do resumo diário: total_entrada, total_saida
+    (TIPOS_GASTO) e quantidade, em uma única consulta.
+    """
+    zero = Decimal('0.00')
+    return resumos.aggregate(
+        total_entrada=Sum('total', filter=Q(tipo__in=Transacao.TIPOS_ENTRADA), default=zero),
+        total_saida=Sum('total', filter=Q(tipo__in=TIPOS_GASTO), default=zero),
+        quantidade=Sum('quantidade', default=0),
+    )
+
+
+def resumos_periodo(cliente, inicio, fim=None, tipo=None):
+    """Resumo diário do cliente entre os dias `inicio` e `fim` (inclusive)"""
+    resumos = cliente.resumos_diarios.filter(dia__gte=inicio)
+    if fim is not None:
+        resumos = resumos.filter(dia__lte=fim)
+    if tipo is not None:
+        resumos = resumos.filter(tipo=tipo)
+    return resumos
+
+
+def totais_periodo(cliente, inicio, fim=None, tipo=None):
+    """Totais do cliente entre os dias `inicio` e `fim` (inclusive)"""
+    return totais_resumo(resumos_periodo(cliente, inicio, fim, tipo))
+
+
+def tendencia_mensal(meses=6):
+    """Entradas, saídas e quantidade de transações de todos os clientes por mês"""
+    inicio = (timezone.localdate().replace(day=1) - timedelta(days=31 * (meses - 1))).replace(day=1)
+    zero = Decimal('0.00')
+    return list(
+        TransacaoResumoDiario.objects.filter(dia__gte=inicio)
+        .annotate(mes=TruncMonth('dia'))
+        .values('mes')
+        .annotate(
+            total_entrada=Sum('total', filter=Q(tipo__in=Transacao.TIPOS_ENTRADA), default=zero),
+            total_saida=Sum('total', filter=Q(tipo__in=TIPOS_GASTO), default=zero),
+            quantidade=Sum('quantidade', default=0),
+        )
+        .order_by('mes')
+    )
+
+
+def _agregar_transacoes(desde=None, clientes=None):
+    """Resumo calculado direto das transações: {(cliente_id, dia, tipo): (quantidade, total)}"""
+    transacoes = movimentos().order_by()
+    if desde is not None:
+        transacoes = transacoes.filter(data_transacao__gte=inicio_do_dia(desde))
+    if clientes is not None:
+        transacoes = transacoes.filter(cliente__in=clientes)
+
+    agregados = (
+        transacoes.annotate(dia=TruncDate('data_transacao', tzinfo=timezone.get_current_timezone()))
+        .values('cliente_id', 'dia', 'tipo')
+        .annotate(quantidade=Count('pk'), total=Sum('valor'))
+    )
+    return {
+        (linha['cliente_id'], linha['dia'], linha['tipo']): (linha['quantidade'], linha['total'])
+        for linha in agregados.iterator()
+    }
+
+
+def _resumos_existentes(desde=None, clientes=None):
+    resumos = TransacaoResumoDiario.objects.all()
+    if desde is not None:
+        resumos = resumos.filter(dia__gte=desde)
+    if clientes is not None:
+        resumos = resumos.filter(cliente__in=clientes)
+    return resumos
+
+
+def reconstruir(desde=None, clientes=None, tamanho_lote=2000):
+    """
+    Refaz o resumo a partir das transações (a partir do dia `desde`, se
+    informado, e apenas dos `clientes`, se informados). Retorna o número de
+    linhas gravadas.
+    """
+    with transaction.atomic():
+        esperado = _agregar_transacoes(desde, clientes)
+        _resumos_existentes(desde, clientes).delete()
+        TransacaoResumoDiario.objects.bulk_create(
+            (
+                TransacaoResumoDiario(cliente_id=cliente_id, dia=dia, tipo=tipo, quantidade=quantidade, total=total)
+                for (cliente_id, dia, tipo), (quantidade, total) in esperado.items()
+            ),
+            batch_size=tamanho_lote,
+        )
+    return len(esperado)
+
+
+def divergencias(desde=None, clientes=None):
+    """
+    Compara o resumo gravado com as transações sem alterar nada.
+
+    Retorna uma lista de (cliente_id, dia, tipo, esperado, gravado), em que
+    esperado e gravado são pares (quantidade, total) ou None.
+    """
+    esperado = _agregar_transacoes(desde, clientes)
+    gravado = {
+        (cliente_id, dia, tipo): (quantidade, total)
+        for cliente_id, dia, tipo, quantidade, total in _resumos_existentes(desde, clientes)
+        .values_list('cliente_id', 'dia', 'tipo', 'quantidade', 'total').iterator()
+    }
+    return [
+        (*chave, esperado.get(chave), gravado.get(chave))
+        for chave in sorted(esperado.keys() | gravado.keys())
+        if esperado.get(chave) != gravado.get(chave)
+    ]
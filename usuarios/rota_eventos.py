@@ -0,0 +1,95 @@
+"""
+Rota ASGI direta para /eventos/.
+
+O handler ASGI do Django roda middlewares e consultas de cada requisição em
+uma thread própria, mantida enquanto a resposta durar: para um stream SSE
+isso é uma thread parada por conexão. Esta rota atende /eventos/ antes do
+Django — autentica pela sessão em uma thread do pool compartilhado, assina o
+canal do cliente e passa a só esperar eventos no loop. As demais requisições
+seguem para a aplicação Django.
+"""
+
+import asyncio
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import connections
+from django.http import parse_cookie
+
+from . import eventos
+from .models import Cliente
+
+CABECALHOS_STREAM = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+def _usuario_da_sessao(chave_sessao):
+    """(usuario_id, status de erro) a partir do cookie de sessão"""
+    try:
+        sessao = import_module(settings.SESSION_ENGINE).SessionStore(chave_sessao)
+        usuario = get_user(SimpleNamespace(session=sessao))
+        if not usuario.is_authenticated:
+            return None, 401
+        if usuario.tipo_usuario != 'cliente':
+            return None, 403
+        return usuario.pk, None
+    finally:
+        connections.close_all()
+
+
+def _saldo(cliente_id):
+    try:
+        return Cliente.objects.filter(pk=cliente_id).values_list('saldo', flat=True).first()
+    finally:
+        connections.close_all()
+
+
+class RotaEventos:
+    """Aplicação ASGI que atende `caminho` e repassa o resto para `aplicacao`"""
+
+    def __init__(self, aplicacao, caminho='/eventos/'):
+        self.aplicacao = aplicacao
+        self.caminho = caminho
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != self.caminho or scope['method'] != 'GET':
+            return await self.aplicacao(scope, receive, send)
+
+        # GET sem corpo: consome o http.request antes de esperar a desconexão
+        mensagem = await receive()
+        while mensagem['type'] == 'http.request' and mensagem.get('more_body'):
+            mensagem = await receive()
+        if mensagem['type'] == 'http.disconnect':
+            return
+
+        cookies = parse_cookie(dict(scope['headers']).get(b'cookie', b'').decode('latin-1'))
+        cliente_id, erro = await sync_to_async(_usuario_da_sessao, thread_sensitive=False)(
+            cookies.get(settings.SESSION_COOKIE_NAME)
+        )
+        if erro:
+            await send({'type': 'http.response.start', 'status': erro, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        assinatura = eventos.assinar(cliente_id)
+        try:
+            saldo = await sync_to_async(_saldo, thread_sensitive=False)(cliente_id)
+            transmissao = asyncio.ensure_future(self._transmitir(assinatura, saldo, send))
+            desconexao = asyncio.ensure_future(receive())
+            await asyncio.wait({transmissao, desconexao}, return_when=asyncio.FIRST_COMPLETED)
+            for tarefa in (transmissao, desconexao):
+                tarefa.cancel()
+            await asyncio.gather(transmissao, desconexao, return_exceptions=True)
+        finally:
+            eventos.cancelar(assinatura)
+
+    async def _transmitir(self, assinatura, saldo, send):
+        await send({'type': 'http.response.start', 'status': 200, 'headers': CABECALHOS_STREAM})
+        async for parte in eventos.fluxo(assinatura, saldo):
+            await send({'type': 'http.response.body', 'body': parte.encode(), 'more_body': True})
@@ -0,0 +1,231 @@
+"""
+Consultas de saldo histórico.
+
+O saldo em uma data qualquer é calculado a partir do checkpoint mais recente
+anterior a ela (CheckpointSaldo) somado às transações do intervalo, em vez de
+reprocessar todo o histórico do cliente. Daí saem o gráfico de saldo, o
+saldo após cada linha do extrato (saldos_apos) e o relatório de saldos do
+gerente (saldos_no_dia).
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, When, F, Max, Q, Sum, DecimalField
+from django.utils import timezone
+
+from .models import Cliente, Transacao, CheckpointSaldo
+from .livro_contabil import movimentos
+
+
+def valor_com_sinal():
+    """Expressão que devolve o valor positivo para entradas e negativo para saídas"""
+    return Case(
+        When(tipo__in=Transacao.TIPOS_ENTRADA, then=F('valor')),
+        default=-F('valor'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def inicio_do_dia(dia):
+    """Primeiro instante do dia no fuso horário configurado"""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _movimento(transacoes):
+    """Soma com sinal das transações informadas"""
+    return transacoes.aggregate(total=Sum(valor_com_sinal()))['total'] or Decimal('0.00')
+
+
+def _movimento_por_cliente(transacoes):
+    """{cliente_id: soma com sinal} das transações informadas, em uma consulta agrupada"""
+    return dict(
+        transacoes.order_by()
+        .values('cliente')
+        .annotate(total=Sum(valor_com_sinal()))
+        .values_list('cliente', 'total')
+    )
+
+
+def _checkpoint_anterior(cliente, dia):
+    return (
+        CheckpointSaldo.objects.filter(cliente=cliente, data__lt=dia)
+        .order_by('-data')
+        .first()
+    )
+
+
+def movimentos_ate(cliente, momento, checkpoint=None):
+    """
+    Movimentações que separam o saldo em `momento` do ponto de partida: as
+    posteriores ao dia do checkpoint até `momento` ou, sem checkpoint, as
+    posteriores a `momento` (a partir do saldo atual)
+    """
+    if checkpoint:
+        return movimentos().filter(
+            cliente=cliente,
+            data_transacao__gte=inicio_do_dia(checkpoint.data + timedelta(days=1)),
+            data_transacao__lte=momento,
+        )
+    return movimentos().filter(cliente=cliente, data_transacao__gt=momento)
+
+
+def saldo_em(cliente, momento):
+    """Retorna o saldo que o cliente tinha no instante `momento`"""
+    checkpoint = _checkpoint_anterior(cliente, timezone.localdate(momento))
+
+    if checkpoint:
+        # Saldo no fim do dia do checkpoint + movimento até o momento pedido
+        return checkpoint.saldo + _movimento(movimentos_ate(cliente, momento, checkpoint))
+
+    # Sem checkpoint: parte do saldo atual e desfaz o que aconteceu depois
+    saldo_atual = Cliente.objects.filter(pk=cliente.pk).values_list('saldo', flat=True).get()
+    return saldo_atual - _movimento(movimentos_ate(cliente, momento))
+
+
+def movimentos_depois(cliente, movimento):
+    """Movimentações do cliente posteriores a `movimento` na ordem do extrato (data_transacao, id)"""
+    momento = movimento.data_transacao
+    return movimentos().filter(
+        Q(data_transacao__gt=momento) | Q(data_transacao=momento, id__gt=movimento.pk),
+        cliente=cliente,
+        data_transacao__gte=momento,
+    )
+
+
+def saldo_apos(cliente, movimento):
+    """
+    Saldo do cliente logo depois de `movimento`, na ordem do extrato
+    (data_transacao, id): movimentações do mesmo instante com id maior
+    ficam para depois
+    """
+    momento = movimento.data_transacao
+    checkpoint = _checkpoint_anterior(cliente, timezone.localdate(momento))
+
+    if checkpoint:
+        anteriores = movimentos_ate(cliente, momento, checkpoint).exclude(data_transacao=momento, id__gt=movimento.pk)
+        return checkpoint.saldo + _movimento(anteriores)
+
+    saldo_atual = Cliente.objects.filter(pk=cliente.pk).values_list('saldo', flat=True).get()
+    return saldo_atual - _movimento(movimentos_depois(cliente, movimento))
+
+
+def saldos_apos(cliente, itens):
+    """
+    Saldo logo depois de cada item de uma página do extrato sem filtro de
+    tipo (itens consecutivos, mais recentes primeiro): um saldo_apos para o
+    primeiro e os demais por subtração
+    """
+    if not itens:
+        return []
+    saldo = saldo_apos(cliente, itens[0])
+    saldos = []
+    for item in itens:
+        saldos.append(saldo)
+        saldo -= item.valor if item.eh_entrada else -item.valor
+    return saldos
+
+
+def saldos_no_dia(dia):
+    """
+    {cliente_id: saldo no fim de `dia`} dos clientes cadastrados até lá.
+
+    Parte da rodada de checkpoints mais recente até `dia` e soma só o
+    movimento entre ela e o fim do dia. Clientes sem checkpoint nessa rodada
+    (cadastrados depois dela, ou sem nenhuma rodada) partem do saldo atual,
+    como em gerar_checkpoints.
+    """
+    fim_do_dia = inicio_do_dia(dia + timedelta(days=1))
+    rodada = CheckpointSaldo.objects.filter(data__lte=dia).aggregate(data=Max('data'))['data']
+
+    saldos = {}
+    if rodada is not None:
+        saldos = dict(CheckpointSaldo.objects.filter(data=rodada).values_list('cliente_id', 'saldo'))
+        movimento = _movimento_por_cliente(movimentos().filter(
+            data_transacao__gte=inicio_do_dia(rodada + timedelta(days=1)),
+            data_transacao__lt=fim_do_dia,
+        ))
+        for cliente_id, total in movimento.items():
+            if cliente_id in saldos:
+                saldos[cliente_id] += total
+
+    sem_checkpoint = {
+        cliente_id: saldo
+        for cliente_id, saldo in Cliente.objects.filter(data_cadastro__lt=fim_do_dia).values_list('pk', 'saldo')
+        if cliente_id not in saldos
+    }
+    if sem_checkpoint:
+        posterior = _movimento_por_cliente(
+            movimentos().filter(cliente__in=list(sem_checkpoint), data_transacao__gte=fim_do_dia)
+        )
+        for cliente_id, saldo in sem_checkpoint.items():
+            saldos[cliente_id] = saldo - posterior.get(cliente_id, Decimal('0.00'))
+    return saldos
+
+
+def gerar_checkpoints(dia, tamanho_lote=2000):
+    """
+    Grava o saldo de todos os clientes no fim de `dia`.
+
+    O saldo de fechamento é o saldo atual menos o movimento posterior ao dia,
+    calculado com uma única agregação agrupada por cliente. Clientes
+    cadastrados depois do dia ficam de fora. Reexecutar para a mesma data
+    apenas atualiza os checkpoints existentes.
+    """
+    fim_do_dia = inicio_do_dia(dia + timedelta(days=1))
+
+    with transaction.atomic():
+        movimento_posterior = _movimento_por_cliente(movimentos().filter(data_transacao__gte=fim_do_dia))
+
+        lote = []
+        gravados = 0
+        for cliente_id, saldo in (
+            Cliente.objects.filter(data_cadastro__lt=fim_do_dia)
+            .values_list('pk', 'saldo')
+            .iterator(chunk_size=tamanho_lote)
+        ):
+            lote.append(CheckpointSaldo(
+                cliente_id=cliente_id,
+                data=dia,
+                saldo=saldo - movimento_posterior.get(cliente_id, Decimal('0.00')),
+            ))
+            if len(lote) >= tamanho_lote:
+                gravados += _gravar_checkpoints(lote)
+                lote = []
+        if lote:
+            gravados += _gravar_checkpoints(lote)
+
+    return gravados
+
+
+def _gravar_checkpoints(checkpoints):
+    CheckpointSaldo.objects.bulk_create(
+        checkpoints,
+        update_conflicts=True,
+        unique_fields=['cliente', 'data'],
+        update_fields=['saldo'],
+    )
+    return len(checkpoints)
+
+
+def relatorio_saldos(dia, quantidade=20):
+    """Totais e maiores saldos da carteira no fim de `dia` (relatório do gerente)"""
+    saldos = saldos_no_dia(dia)
+    total = sum(saldos.values(), Decimal('0.00'))
+    maiores = sorted(saldos.items(), key=lambda item: item[1], reverse=True)[:quantidade]
+    dados = {
+        pk: (f'{nome} {sobrenome}'.strip(), cpf)
+        for pk, nome, sobrenome, cpf in Cliente.objects.filter(pk__in=[pk for pk, _ in maiores])
+        .values_list('pk', 'usuario__first_name', 'usuario__last_name', 'cpf')
+    }
+    return {
+        'total': total,
+        'clientes': len(saldos),
+        'media': total / len(saldos) if saldos else Decimal('0.00'),
+        'negativos': sum(1 for saldo in saldos.values() if saldo < 0),
+        'maiores_saldos': [
+            {'nome': dados[pk][0], 'cpf': dados[pk][1], 'saldo': saldo}
+            for pk, saldo in maiores
+        ],
+    }
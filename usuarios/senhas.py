@@ -0,0 +1,61 @@
+"""
+Hash de senhas em um pool de threads limitado.
+
+Gerar ou conferir um hash PBKDF2 leva centenas de milissegundos de CPU. Sob
+ASGI, as views síncronas rodam todas na mesma thread, então um login
+bloquearia as demais requisições; nas views assíncronas, o hash bloquearia o
+loop. As views de login e de cadastro fazem o hash aqui, em até
+SENHA_HASH_WORKERS threads: rajadas de login esperam na fila do pool sem
+ocupar a thread das views nem o loop. O hashlib e o argon2-cffi liberam o
+GIL, então as threads do pool rodam em paralelo.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_pool = None
+_trava = threading.Lock()
+
+
+def workers():
+    return getattr(settings, 'SENHA_HASH_WORKERS', 4)
+
+
+def pool():
+    global _pool
+    with _trava:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix='hash-senha')
+    return _pool
+
+
+async def _executar(funcao, *args):
+    return await asyncio.get_running_loop().run_in_executor(pool(), partial(funcao, *args))
+
+
+async def gerar_hash(senha):
+    """Hash da senha com o algoritmo preferido (o primeiro de PASSWORD_HASHERS)"""
+    return await _executar(make_password, senha)
+
+
+def _conferir(senha, hash_senha):
+    atualizar = []
+    valida = check_password(senha, hash_senha, setter=atualizar.append)
+    return valida, bool(atualizar)
+
+
+async def verificar_senha(usuario, senha):
+    """
+    Confere a senha do usuário no pool. Se o hash foi gerado por outro
+    algoritmo ou com outros parâmetros, regrava-o com o algoritmo preferido.
+    """
+    valida, atualizar = await _executar(_conferir, senha, usuario.password)
+    if valida and atualizar:
+        usuario.password = await gerar_hash(senha)
+        await usuario.asave(update_fields=['password'])
+    return valida
@@ -0,0 +1,187 @@
+"""
+Séries temporais para os gráficos (static/js/galaxy-charts.js).
+
+Entradas/saídas e histórico de saldo são agregados no banco a partir do
+resumo diário, agrupados em baldes de dia, semana ou mês; o histórico de saldo
+parte de saldo_em no início do período. Gastos por categoria somam os itens
+das compras do período. Baldes sem movimento aparecem com zero, para o
+gráfico manter a escala de tempo. Com `max_pontos`, séries longas são
+reduzidas no servidor (ver amostragem).
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DateField, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+
+from loja.models import Compra, ItemCompra
+from .amostragem import lttb, somar_em_grupos
+from .models import Transacao, TransacaoResumoDiario
+from .resumos import resumos_periodo
+from .saldos import inicio_do_dia, saldo_em
+
+INTERVALOS = {'dia': 'day', 'semana': 'week', 'mes': 'month'}
+PERIODO_PADRAO = 30
+PERIODO_MAXIMO = 366 * 10
+MAX_PONTOS_LIMITE = 5000
+
+
+def periodo_grafico(parametros):
+    """
+    Lê `inicio`, `fim` (AAAA-MM-DD) e `intervalo` (dia, semana ou mes).
+
+    Retorna (inicio, fim, intervalo); ValueError se algum for inválido.
+    """
+    hoje = timezone.localdate()
+    try:
+        fim = datetime.strptime(parametros['fim'], '%Y-%m-%d').date() if parametros.get('fim') else hoje
+        if parametros.get('inicio'):
+            inicio = datetime.strptime(parametros['inicio'], '%Y-%m-%d').date()
+        else:
+            inicio = fim - timedelta(days=PERIODO_PADRAO - 1)
+    except ValueError:
+        raise ValueError('Data inválida. Use o formato AAAA-MM-DD.')
+    intervalo = parametros.get('intervalo') or 'dia'
+
+    if intervalo not in INTERVALOS:
+        raise ValueError('Intervalo inválido. Use dia, semana ou mes.')
+    if inicio > fim:
+        raise ValueError('A data inicial deve ser anterior à final.')
+    if (fim - inicio).days >= PERIODO_MAXIMO:
+        raise ValueError(f'O período máximo é de {PERIODO_MAXIMO} dias.')
+    return inicio, fim, intervalo
+
+
+def max_pontos_grafico(parametros):
+    """Lê `max_pontos`; None quando ausente, ValueError se inválido"""
+    valor = parametros.get('max_pontos')
+    if not valor:
+        return None
+    try:
+        max_pontos = int(valor)
+    except ValueError:
+        raise ValueError('max_pontos deve ser um número inteiro.')
+    if not 3 <= max_pontos <= MAX_PONTOS_LIMITE:
+        raise ValueError(f'max_pontos deve estar entre 3 e {MAX_PONTOS_LIMITE}.')
+    return max_pontos
+
+
+def _inicio_balde(dia, intervalo):
+    if intervalo == 'semana':
+        return dia - timedelta(days=dia.weekday())
+    if intervalo == 'mes':
+        return dia.replace(day=1)
+    return dia
+
+
+def baldes(inicio, fim, intervalo):
+    """Primeiro dia de cada balde que cobre [inicio, fim]"""
+    dia = _inicio_balde(inicio, intervalo)
+    while dia <= fim:
+        yield dia
+        if intervalo == 'mes':
+            dia = (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            dia += timedelta(days=7 if intervalo == 'semana' else 1)
+
+
+def _movimento_por_balde(cliente, inicio, fim, intervalo):
+    """{inicio do balde: (entradas, saidas)} somados no banco a partir do resumo diário"""
+    zero = Decimal('0.00')
+    linhas = (
+        resumos_periodo(cliente, inicio, fim)
+        .annotate(balde=Trunc('dia', INTERVALOS[intervalo], output_field=DateField()))
+        .values('balde')
+        .annotate(
+            entradas=Sum('total', filter=Q(tipo__in=Transacao.TIPOS_ENTRADA), default=zero),
+            saidas=Sum('total', filter=~Q(tipo__in=Transacao.TIPOS_ENTRADA), default=zero),
+        )
+        .values_list('balde', 'entradas', 'saidas')
+    )
+    return {balde: (entradas, saidas) for balde, entradas, saidas in linhas}
+
+
+def entradas_saidas(cliente, inicio, fim, intervalo, max_pontos=None):
+    """
+    Entradas e saídas por balde, no formato de createBarChart.
+
+    Acima de `max_pontos` baldes, os vizinhos são somados e o rótulo é o
+    início do grupo.
+    """
+    movimento = _movimento_por_balde(cliente, inicio, fim, intervalo)
+    labels, entradas, saidas = [], [], []
+    for balde in baldes(inicio, fim, intervalo):
+        entrada, saida = movimento.get(balde, (0, 0))
+        labels.append(balde.isoformat())
+        entradas.append(float(entrada))
+        saidas.append(float(saida))
+    if max_pontos and len(labels) > max_pontos:
+        inicios, entradas = somar_em_grupos(entradas, max_pontos)
+        _, saidas = somar_em_grupos(saidas, max_pontos)
+        labels = [labels[i] for i in inicios]
+        entradas, saidas = entradas.round(2).tolist(), saidas.round(2).tolist()
+    return {'labels': labels, 'entradas': entradas, 'saidas': saidas}
+
+
+def historico_saldo(cliente, inicio, fim, intervalo, max_pontos=None):
+    """
+    Saldo no fim de cada balde, no formato de createLineChart/createAreaChart.
+
+    Acima de `max_pontos` baldes, mantém os pontos escolhidos pelo LTTB.
+    """
+    saldo = saldo_em(cliente, inicio_do_dia(inicio) - timedelta(microseconds=1))
+    movimento = _movimento_por_balde(cliente, inicio, fim, intervalo)
+    labels, dados = [], []
+    for balde in baldes(inicio, fim, intervalo):
+        entrada, saida = movimento.get(balde, (0, 0))
+        saldo += entrada - saida
+        labels.append(balde.isoformat())
+        dados.append(float(saldo))
+    if max_pontos and len(labels) > max_pontos:
+        indices = lttb(dados, max_pontos)
+        labels = [labels[i] for i in indices]
+        dados = [dados[i] for i in indices]
+    return {'labels': labels, 'data': dados}
+
+
+def compras_periodo(cliente, inicio, fim):
+    return Compra.objects.filter(
+        cliente=cliente,
+        data_compra__gte=inicio_do_dia(inicio),
+        data_compra__lt=inicio_do_dia(fim + timedelta(days=1)),
+    ).exclude(status='cancelada')
+
+
+def gastos_por_categoria(cliente, inicio, fim, intervalo=None, max_pontos=None):
+    """Soma dos itens comprados por categoria, no formato de createDoughnutChart (sem baldes)"""
+    linhas = (
+        ItemCompra.objects.filter(compra__in=compras_periodo(cliente, inicio, fim))
+        .values(categoria=Coalesce('produto__categoria__nome', Value('Sem categoria')))
+        .annotate(total=Sum('valor_total'))
+        .order_by('-total')
+        .values_list('categoria', 'total')
+    )
+    labels, dados = [], []
+    for categoria, total in linhas:
+        labels.append(categoria)
+        dados.append(float(total))
+    return {'labels': labels, 'data': dados}
+
+
+def versao_movimentos(cliente, inicio):
+    """
+    (quantidade, soma) das movimentações do cliente a partir do dia `inicio`,
+    lidas do resumo diário, para ETag: toda transação gravada altera as duas.
+    """
+    return TransacaoResumoDiario.objects.filter(cliente=cliente, dia__gte=inicio).aggregate(
+        quantidade=Sum('quantidade', default=0), total=Sum('total', default=Decimal('0.00'))
+    )
+
+
+def versao_compras(cliente):
+    """(quantidade, maior id, data da última compra) do cliente, para ETag e Last-Modified"""
+    return Compra.objects.filter(cliente=cliente).aggregate(
+        quantidade=Count('pk'), ultimo_id=Max('pk'), ultima_data=Max('data_compra')
+    )
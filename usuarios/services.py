@@ -0,0 +1,290 @@
+import csv
+import io
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import F, Case, When, Value, DecimalField
+from .models import Cliente, Transacao
+from . import resumos, livro_contabil, eventos
+from .cache_dashboard import invalidar_apos_commit
+from .cache_usuario import invalidar_usuarios
+
+
+class TransferenciaError(Exception):
+    """Erro de negócio ao realizar uma transferência"""
+
+
+class SaldoInsuficienteError(TransferenciaError):
+    """O remetente não possui saldo suficiente"""
+
+
+def _descricao_transferencia(prefixo, contraparte, descricao):
+    """Monta a descrição exibida no extrato para uma transferência"""
+    texto = f'{prefixo} {contraparte.usuario.first_name} ({contraparte.cpf})'
+    return f'{texto} - {descricao}' if descricao else texto
+
+
+def registrar_transacoes(transacoes):
+    """
+    Grava as transações e atualiza o resumo diário na mesma transação.
+
+    Toda gravação de Transacao deve passar por aqui para que o resumo diário
+    (TransacaoResumoDiario) continue batendo com as transações, o cache do
+    dashboard e do usuário (saldo) dos clientes envolvidos seja invalidado e
+    as conexões abertas em /eventos/ sejam avisadas.
+    """
+    with transaction.atomic():
+        transacoes = Transacao.objects.bulk_create(transacoes)
+        resumos.acumular(transacoes)
+        invalidar_apos_commit(t.cliente_id for t in transacoes)
+        invalidar_usuarios(t.cliente_id for t in transacoes)
+        eventos.publicar_apos_commit(transacoes)
+    return transacoes
+
+
+def registrar_transferencias(transferencias):
+    """
+    Registra transferências já debitadas e creditadas.
+
+    `transferencias` é uma lista de (remetente, destinatario, valor, descricao).
+    Grava um LancamentoContabil por transferência quando o livro contábil está
+    ativo; caso contrário, o par enviada/recebida de Transacao. Não retorna
+    nada: nos dois casos o registro é lido de volta por `movimentos()`.
+    """
+    if livro_contabil.ativo():
+        with transaction.atomic():
+            lancamentos = livro_contabil.registrar(transferencias)
+            lados = list(livro_contabil.lados(lancamentos))
+            resumos.acumular(lados)
+            invalidar_apos_commit(lado.cliente_id for lado in lados)
+            invalidar_usuarios(lado.cliente_id for lado in lados)
+            eventos.publicar_apos_commit(lados)
+        return
+
+    transacoes = []
+    for remetente, destinatario, valor, descricao in transferencias:
+        transacoes.append(Transacao(
+            cliente=remetente,
+            tipo='transferencia_enviada',
+            valor=valor,
+            descricao=_descricao_transferencia('Transferência para', destinatario, descricao),
+            destinatario=destinatario,
+        ))
+        transacoes.append(Transacao(
+            cliente=destinatario,
+            tipo='transferencia_recebida',
+            valor=valor,
+            descricao=_descricao_transferencia('Transferência de', remetente, descricao),
+            origem=remetente,
+        ))
+    registrar_transacoes(transacoes)
+
+
+def depositar(cliente, valor, descricao=''):
+    """Credita `valor` na conta do cliente e registra o depósito no extrato"""
+    if valor <= 0:
+        raise ValueError('Valor deve ser positivo.')
+
+    with transaction.atomic():
+        Cliente.objects.filter(pk=cliente.pk).update(saldo=F('saldo') + valor)
+        transacao, = registrar_transacoes([Transacao(
+            cliente=cliente,
+            tipo='deposito',
+            valor=valor,
+            descricao=f'Depósito - {descricao}' if descricao else 'Depósito',
+        )])
+    cliente.refresh_from_db(fields=['saldo'])
+    return transacao
+
+
+def debitar(cliente, valor, tipo, descricao=''):
+    """
+    Debita `valor` do saldo do cliente e registra a saída no extrato.
+
+    Usado pelos pagamentos com saldo (compras na loja e faturas). O débito é
+    um UPDATE condicional, como em `transferir`; sem saldo suficiente levanta
+    SaldoInsuficienteError e nada é gravado.
+    """
+    if valor <= 0:
+        raise ValueError('Valor deve ser positivo.')
+
+    with transaction.atomic():
+        debitado = Cliente.objects.filter(pk=cliente.pk, saldo__gte=valor).update(saldo=F('saldo') - valor)
+        if not debitado:
+            raise SaldoInsuficienteError('Saldo insuficiente.')
+        transacao, = registrar_transacoes([Transacao(
+            cliente=cliente,
+            tipo=tipo,
+            valor=valor,
+            descricao=descricao,
+        )])
+    cliente.refresh_from_db(fields=['saldo'])
+    return transacao
+
+
+def travar_clientes(*clientes):
+    """
+    Trava as linhas dos clientes sempre na mesma ordem (usuario_id).
+
+    Como toda operação adquire os locks na mesma ordem, duas transferências
+    cruzadas (A->B e B->A) nunca ficam esperando uma pela outra. No SQLite o
+    select_for_update é ignorado e a serialização vem do BEGIN IMMEDIATE.
+    """
+    ids = sorted({cliente.pk for cliente in clientes})
+    list(
+        Cliente.objects.select_for_update()
+        .filter(pk__in=ids)
+        .order_by('usuario_id')
+        .values_list('pk', flat=True)
+    )
+
+
+def transferir(remetente, destinatario, valor, descricao=''):
+    """
+    Transfere `valor` do remetente para o destinatário.
+
+    O débito é um UPDATE condicional sobre o saldo atual do banco, então não
+    há leitura-verificação-escrita em Python e nenhuma atualização é perdida
+    sob concorrência. O registro da transferência (duas transações do extrato
+    ou um lançamento contábil) é gravado em um único INSERT, junto com o
+    resumo diário, e aparece no histórico de `movimentos()`.
+    """
+    if valor <= 0:
+        raise TransferenciaError('Valor deve ser positivo.')
+    if remetente.pk == destinatario.pk:
+        raise TransferenciaError('Não é possível transferir para sua própria conta.')
+
+    with transaction.atomic():
+        travar_clientes(remetente, destinatario)
+
+        debitado = Cliente.objects.filter(
+            pk=remetente.pk, saldo__gte=valor
+        ).update(saldo=F('saldo') - valor)
+        if not debitado:
+            raise SaldoInsuficienteError('Saldo insuficiente para realizar a transferência.')
+
+        Cliente.objects.filter(pk=destinatario.pk).update(saldo=F('saldo') + valor)
+
+        registrar_transferencias([(remetente, destinatario, valor, descricao)])
+
+
+# ===== TRANSFERÊNCIAS EM LOTE =====
+
+def ler_lote(conteudo, formato):
+    """
+    Converte um arquivo CSV ou JSON em uma lista de linhas de transferência.
+
+    CSV: cabeçalho `cpf,valor,descricao` (descricao opcional).
+    JSON: lista de objetos com as chaves `cpf`, `valor` e `descricao`.
+    """
+    if isinstance(conteudo, bytes):
+        conteudo = conteudo.decode('utf-8-sig')
+
+    if formato == 'json':
+        try:
+            dados = json.loads(conteudo)
+        except json.JSONDecodeError as e:
+            raise TransferenciaError(f'JSON inválido: {e}')
+        if not isinstance(dados, list) or not all(isinstance(item, dict) for item in dados):
+            raise TransferenciaError('O JSON deve ser uma lista de objetos.')
+        return dados
+
+    if formato == 'csv':
+        leitor = csv.DictReader(io.StringIO(conteudo))
+        if not leitor.fieldnames or not {'cpf', 'valor'} <= set(leitor.fieldnames):
+            raise TransferenciaError('O CSV deve ter cabeçalho com as colunas cpf e valor.')
+        return list(leitor)
+
+    raise TransferenciaError(f'Formato não suportado: {formato}')
+
+
+def _validar_linha(linha):
+    """Normaliza CPF e valor de uma linha do lote"""
+    cpf = re.sub(r'\D', '', str(linha.get('cpf') or ''))
+    if len(cpf) != 11:
+        raise TransferenciaError('CPF deve conter 11 dígitos.')
+    try:
+        valor = Decimal(str(linha.get('valor') or '').replace(',', '.').strip())
+    except InvalidOperation:
+        raise TransferenciaError('Valor inválido.')
+    if not valor.is_finite() or valor <= 0:
+        raise TransferenciaError('Valor deve ser positivo.')
+    if valor != valor.quantize(Decimal('0.01')):
+        raise TransferenciaError('Valor deve ter no máximo duas casas decimais.')
+    return cpf, valor.quantize(Decimal('0.01')), str(linha.get('descricao') or '').strip()
+
+
+def transferir_lote(remetente, linhas):
+    """
+    Executa várias transferências do mesmo remetente em uma única transação.
+
+    Os destinatários são resolvidos com uma consulta `cpf__in`, os saldos são
+    atualizados com um UPDATE por lado e os registros gravados com um único
+    bulk_create. Linhas inválidas (ou que excedam o saldo, na ordem do
+    arquivo) são reportadas sem abortar o restante do lote.
+    """
+    falhas = []
+    validas = []
+    for numero, linha in enumerate(linhas, start=1):
+        try:
+            validas.append((numero, *_validar_linha(linha)))
+        except TransferenciaError as e:
+            falhas.append({'linha': numero, 'cpf': linha.get('cpf'), 'erro': str(e)})
+
+    destinatarios = {
+        cliente.cpf: cliente
+        for cliente in Cliente.objects.select_related('usuario').filter(
+            cpf__in={cpf for _, cpf, _, _ in validas}
+        )
+    }
+
+    processadas = []
+    with transaction.atomic():
+        travar_clientes(remetente, *destinatarios.values())
+        saldo_disponivel = Cliente.objects.filter(pk=remetente.pk).values_list('saldo', flat=True).get()
+
+        total = Decimal('0.00')
+        creditos = {}
+        transferencias = []
+        for numero, cpf, valor, descricao in validas:
+            destinatario = destinatarios.get(cpf)
+            if destinatario is None:
+                erro = 'Destinatário não encontrado.'
+            elif destinatario.pk == remetente.pk:
+                erro = 'Não é possível transferir para sua própria conta.'
+            elif total + valor > saldo_disponivel:
+                erro = 'Saldo insuficiente.'
+            else:
+                erro = None
+
+            if erro:
+                falhas.append({'linha': numero, 'cpf': cpf, 'erro': erro})
+                continue
+
+            total += valor
+            creditos[destinatario.pk] = creditos.get(destinatario.pk, Decimal('0.00')) + valor
+            transferencias.append((remetente, destinatario, valor, descricao))
+            processadas.append({'linha': numero, 'cpf': cpf, 'valor': str(valor)})
+
+        if creditos:
+            debitado = Cliente.objects.filter(
+                pk=remetente.pk, saldo__gte=total
+            ).update(saldo=F('saldo') - total)
+            if not debitado:
+                raise SaldoInsuficienteError('Saldo insuficiente para realizar o lote.')
+
+            Cliente.objects.filter(pk__in=creditos).update(
+                saldo=F('saldo') + Case(
+                    *[When(pk=pk, then=Value(valor)) for pk, valor in creditos.items()],
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                )
+            )
+            registrar_transferencias(transferencias)
+
+    falhas.sort(key=lambda falha: falha['linha'])
+    return {
+        'processadas': processadas,
+        'falhas': falhas,
+        'total_transferido': str(total),
+    }
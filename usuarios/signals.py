@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import eventos, unicidade
+from .cache_usuario import invalidar_usuarios
+from .kpis import invalidar_kpis
+from .models import Usuario, Cliente, Gerente
+
+# Campos de Cliente que entram nos indicadores do painel do gerente
+CAMPOS_KPI_CLIENTE = {'limite_credito', 'limite_credito_aprovado'}
+
+
+@receiver(post_save, sender=Cliente)
+def cliente_salvo(sender, instance, created, update_fields=None, **kwargs):
+    """Invalida os indicadores, exceto em saves que só tocam outros campos (ex.: saldo)"""
+    if created or update_fields is None or CAMPOS_KPI_CLIENTE & set(update_fields):
+        invalidar_kpis()
+
+
+@receiver(post_save, sender=Cliente)
+def saldo_alterado(sender, instance, update_fields=None, **kwargs):
+    """Avisa as conexões abertas do cliente quando o saldo é gravado com save (ex.: pelo admin)"""
+    if (update_fields is None or 'saldo' in update_fields) and eventos.assinantes([instance.pk]):
+        transaction.on_commit(lambda: eventos.publicar_saldos([instance.pk]))
+
+
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender='credito.SolicitacaoCredito')
+@receiver(post_delete, sender='credito.SolicitacaoCredito')
+def kpis_alterados(sender, **kwargs):
+    invalidar_kpis()
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Gerente)
+@receiver(post_delete, sender=Gerente)
+def usuario_alterado(sender, instance, **kwargs):
+    """Tira do cache o usuário (e o perfil carregado junto com ele)"""
+    invalidar_usuarios([instance.pk])
+
+
+@receiver(post_save, sender=Usuario)
+def email_gravado(sender, instance, **kwargs):
+    unicidade.registrar('email', instance.email)
+
+
+@receiver(post_save, sender=Cliente)
+def cpf_gravado(sender, instance, **kwargs):
+    unicidade.registrar('cpf', instance.cpf)
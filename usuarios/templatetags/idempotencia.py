@@ -0,0 +1,20 @@
+import uuid
+
+from django import template
+from django.utils.html import format_html
+
+from usuarios.idempotencia import CAMPO_CHAVE
+
+register = template.Library()
+
+
+@register.simple_tag
+def chave_idempotencia():
+    """Nova chave de idempotência, para requisições feitas via JavaScript"""
+    return str(uuid.uuid4())
+
+
+@register.simple_tag
+def campo_idempotencia():
+    """Campo oculto com uma nova chave; reenvios do mesmo formulário repetem a chave"""
+    return format_html('<input type="hidden" name="{}" value="{}">', CAMPO_CHAVE, uuid.uuid4())
@@ -1,3 +1,1488 @@
-from django.test import TestCase
+import asyncio
+import io
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.db.models import ProtectedError, Q
+from django.db.models.functions import Lower
+from django.db.models.signals import post_init
+from django.contrib.auth import aauthenticate, authenticate
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from credito.models import SolicitacaoCredito
+from faturas.models import Fatura
+from loja.models import CarrinhoCompras, ItemCarrinho, Produto
+from .models import (
+    Usuario, Cliente, Gerente, Transacao, ChaveIdempotencia, TransacaoResumoDiario, LancamentoContabil,
+    CheckpointSaldo, MovimentoCliente,
+)
+from . import cadastro, eventos, unicidade
+from .amostragem import lttb, somar_em_grupos
+from .backends import EmailOrUsernameModelBackend
+from .bloom import FiltroBloom
+from .livro_contabil import movimentos, movimentos_do_cliente
+from .management.commands.verificar_planos_consulta import consultas_criticas, problema
+from .paginacao import pagina_por_cursor
+from .resumos import divergencias, reconstruir, tendencia_mensal, totais_periodo
+from .rota_eventos import RotaEventos
+from .saldos import saldo_em, saldos_no_dia, gerar_checkpoints
+from .services import (
+    depositar, registrar_transacoes, transferir, transferir_lote, ler_lote,
+    SaldoInsuficienteError, TransferenciaError,
+)
+
+
+class ContadorInstancias:
+    """Conta quantas instâncias de um modelo foram carregadas do banco"""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.total = 0
+
+    def _contar(self, sender, **kwargs):
+        self.total += 1
+
+    def __enter__(self):
+        post_init.connect(self._contar, sender=self.modelo)
+        return self
+
+    def __exit__(self, *exc):
+        post_init.disconnect(self._contar, sender=self.modelo)
+
+
+class TotaisTransacoesTests(TestCase):
+    """Os totais do extrato e do dashboard são agregados no banco"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='maria', password='senha-segura-123', first_name='Maria'
+        )
+        cls.cliente = Cliente.objects.create(usuario=cls.usuario, cpf='12345678901')
+        tipos = ['deposito', 'transferencia_recebida', 'transferencia_enviada', 'compra', 'pagamento_fatura']
+        registrar_transacoes([
+            Transacao(cliente=cls.cliente, tipo=tipos[i % len(tipos)], valor=Decimal('10.00'))
+            for i in range(40)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_extrato_agrega_no_banco(self):
+        # sessão, usuário com o cliente, totais do resumo diário, a lista exibida e o
+        # saldo após a primeira linha (checkpoint, saldo atual e movimento posterior)
+        with ContadorInstancias(Transacao) as carregadas, self.assertNumQueries(7):
+            response = self.client.get(reverse('usuarios:extrato'), {'periodo': '90'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_entrada'], Decimal('160.00'))
+        self.assertEqual(response.context['total_saida'], Decimal('160.00'))
+        self.assertEqual(response.context['quantidade_transacoes'], 40)
+        self.assertEqual(carregadas.total, 40)
+
+    def test_extrato_filtrado_por_tipo(self):
+        response = self.client.get(reverse('usuarios:extrato'), {'periodo': '30', 'tipo': 'compra'})
+
+        self.assertEqual(response.context['total_entrada'], Decimal('0.00'))
+        self.assertEqual(response.context['total_saida'], Decimal('80.00'))
+        self.assertEqual(response.context['quantidade_transacoes'], 8)
+
+    def test_dashboard_carrega_apenas_ultimas_transacoes(self):
+        # sessão, usuário com o cliente, totais do mês e as cinco últimas transações
+        with ContadorInstancias(Transacao) as carregadas, self.assertNumQueries(4):
+            response = self.client.get(reverse('usuarios:dashboard_cliente'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_recebido_mes'], Decimal('160.00'))
+        self.assertEqual(response.context['total_gastos_mes'], Decimal('160.00'))
+        self.assertEqual(carregadas.total, 5)
+
+    def test_dashboard_em_cache_ate_nova_transacao(self):
+        self.client.get(reverse('usuarios:dashboard_cliente'))
+
+        # só a sessão: usuário e cliente vêm do cache até a próxima gravação
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('usuarios:dashboard_cliente'))
+        self.assertEqual(response.context['total_recebido_mes'], Decimal('160.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_transacoes([Transacao(cliente=self.cliente, tipo='deposito', valor=Decimal('5.00'))])
+
+        response = self.client.get(reverse('usuarios:dashboard_cliente'))
+        self.assertEqual(response.context['total_recebido_mes'], Decimal('165.00'))
+        self.assertEqual(response.context['ultimas_transacoes'][0].valor, Decimal('5.00'))
+        self.assertContains(response, '+R$ 5,00')
+
+
+class ResumoDiarioTests(TestCase):
+    """O resumo diário acompanha cada gravação de transações"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.remetente = Cliente.objects.create(
+            usuario=Usuario.objects.create_user(username='carla', password='senha-segura-123'),
+            cpf='22233344455',
+        )
+        cls.destinatario = Cliente.objects.create(
+            usuario=Usuario.objects.create_user(username='davi', password='senha-segura-123'),
+            cpf='33344455566',
+        )
+
+    def test_transferencias_atualizam_o_resumo(self):
+        transferir(self.remetente, self.destinatario, Decimal('30.00'))
+        transferir(self.remetente, self.destinatario, Decimal('20.50'))
+
+        enviado = TransacaoResumoDiario.objects.get(cliente=self.remetente, tipo='transferencia_enviada')
+        recebido = TransacaoResumoDiario.objects.get(cliente=self.destinatario, tipo='transferencia_recebida')
+        self.assertEqual((enviado.quantidade, enviado.total), (2, Decimal('50.50')))
+        self.assertEqual((recebido.quantidade, recebido.total), (2, Decimal('50.50')))
+        self.assertEqual(divergencias(), [])
+
+    def test_tendencia_mensal_usa_os_mesmos_gastos_do_cliente(self):
+        registrar_transacoes([
+            Transacao(cliente=self.remetente, tipo=tipo, valor=Decimal('10.00'))
+            for tipo in ['deposito', 'compra', 'transferencia_enviada', 'pagamento_fatura']
+        ])
+
+        mes, = tendencia_mensal()
+        totais = totais_periodo(self.remetente, timezone.localdate().replace(day=1))
+        self.assertEqual((mes['total_entrada'], mes['total_saida']), (Decimal('10.00'), Decimal('20.00')))
+        self.assertEqual(mes['total_saida'], totais['total_saida'])
+
+    def test_reconstruir_corrige_divergencias(self):
+        transferir(self.remetente, self.destinatario, Decimal('10.00'))
+        TransacaoResumoDiario.objects.filter(cliente=self.remetente).update(quantidade=7)
+        Transacao.objects.create(cliente=self.destinatario, tipo='deposito', valor=Decimal('5.00'))
+
+        self.assertEqual(len(divergencias()), 2)
+        reconstruir()
+        self.assertEqual(divergencias(), [])
+
+
+class TransferenciaTests(TestCase):
+    """transferir debita, credita e registra o par enviada/recebida"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.remetente = Cliente.objects.create(
+            usuario=Usuario.objects.create_user(username='gil', password='senha-segura-123', first_name='Gil'),
+            cpf='55566677788',
+        )
+        cls.destinatario = Cliente.objects.create(
+            usuario=Usuario.objects.create_user(username='helena', password='senha-segura-123', first_name='Helena'),
+            cpf='77788899900',
+        )
+
+    def test_grava_o_par_de_transacoes(self):
+        self.assertIsNone(transferir(self.remetente, self.destinatario, Decimal('150.00'), 'Aluguel'))
+
+        enviada, recebida = Transacao.objects.order_by('id')
+
+        self.assertEqual((enviada.cliente_id, enviada.tipo, enviada.destinatario_id),
+                         (self.remetente.pk, 'transferencia_enviada', self.destinatario.pk))
+        self.assertEqual(enviada.descricao, 'Transferência para Helena (77788899900) - Aluguel')
+        self.assertEqual((recebida.cliente_id, recebida.tipo, recebida.origem_id),
+                         (self.destinatario.pk, 'transferencia_recebida', self.remetente.pk))
+        self.assertEqual(recebida.descricao, 'Transferência de Gil (55566677788) - Aluguel')
+        self.assertEqual(Transacao.objects.count(), 2)
+        self.remetente.refresh_from_db()
+        self.destinatario.refresh_from_db()
+        self.assertEqual(self.remetente.saldo, Decimal('850.00'))
+        self.assertEqual(self.destinatario.saldo, Decimal('1150.00'))
+
+    def test_saldo_insuficiente_nao_altera_nada(self):
+        with self.assertRaises(SaldoInsuficienteError):
+            transferir(self.remetente, self.destinatario, Decimal('1000.01'))
+
+        self.remetente.refresh_from_db()
+        self.destinatario.refresh_from_db()
+        self.assertEqual(self.remetente.saldo, Decimal('1000.00'))
+        self.assertEqual(self.destinatario.saldo, Decimal('1000.00'))
+        self.assertFalse(Transacao.objects.exists())
+        self.assertFalse(TransacaoResumoDiario.objects.exists())
+
+    def test_transferencia_para_a_propria_conta(self):
+        with self.assertRaises(TransferenciaError):
+            transferir(self.remetente, self.remetente, Decimal('10.00'))
+        with self.assertRaises(TransferenciaError):
+            transferir(self.remetente, self.destinatario, Decimal('0.00'))
+
+        self.remetente.refresh_from_db()
+        self.assertEqual(self.remetente.saldo, Decimal('1000.00'))
+        self.assertFalse(Transacao.objects.exists())
+
+
+class TransferenciaLoteTests(TestCase):
+    """O lote rejeita linhas inválidas, respeita o saldo e grava tudo ou nada"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='iara', password='senha-segura-123', first_name='Iara')
+        cls.remetente = Cliente.objects.create(usuario=cls.usuario, cpf='10120230340')
+        cls.funcionarios = [
+            Cliente.objects.create(
+                usuario=Usuario.objects.create_user(username=f'func{i}', password='senha-segura-123'),
+                cpf=f'9000000000{i}',
+            )
+            for i in range(3)
+        ]
+
+    def saldos(self):
+        return list(
+            Cliente.objects.filter(pk__in=[self.remetente.pk, *(f.pk for f in self.funcionarios)])
+            .order_by('cpf').values_list('cpf', 'saldo')
+        )
+
+    def test_linhas_invalidas_sao_reportadas(self):
+        linhas = ler_lote(
+            'cpf,valor,descricao\n'
+            '900.000.000-00,100,Salário\n'
+            '123,50,\n'
+            '90000000001,abc,\n'
+            '90000000001,-5,\n'
+            '90000000002,10.001,\n'
+            '90000000002,"20,50",Bônus\n',
+            'csv',
+        )
+
+        resultado = transferir_lote(self.remetente, linhas)
+
+        self.assertEqual([p['linha'] for p in resultado['processadas']], [1, 6])
+        self.assertEqual([(f['linha'], f['erro']) for f in resultado['falhas']], [
+            (2, 'CPF deve conter 11 dígitos.'),
+            (3, 'Valor inválido.'),
+            (4, 'Valor deve ser positivo.'),
+            (5, 'Valor deve ter no máximo duas casas decimais.'),
+        ])
+        self.assertEqual(resultado['total_transferido'], '120.50')
+        self.remetente.refresh_from_db()
+        self.assertEqual(self.remetente.saldo, Decimal('879.50'))
+        self.assertEqual(Transacao.objects.filter(tipo='transferencia_recebida').count(), 2)
+
+    def test_propria_conta_e_cpf_desconhecido(self):
+        resultado = transferir_lote(self.remetente, [
+            {'cpf': '10120230340', 'valor': '10'},
+            {'cpf': '99999999999', 'valor': '10'},
+            {'cpf': '90000000000', 'valor': '10'},
+        ])
+
+        self.assertEqual([(f['linha'], f['erro']) for f in resultado['falhas']], [
+            (1, 'Não é possível transferir para sua própria conta.'),
+            (2, 'Destinatário não encontrado.'),
+        ])
+        self.assertEqual(len(resultado['processadas']), 1)
+
+    def test_saldo_acumulado_entre_linhas(self):
+        resultado = transferir_lote(self.remetente, [
+            {'cpf': '90000000000', 'valor': '600'},
+            {'cpf': '90000000001', 'valor': '500'},
+            {'cpf': '90000000002', 'valor': '400'},
+        ])
+
+        self.assertEqual([p['linha'] for p in resultado['processadas']], [1, 3])
+        self.assertEqual(resultado['falhas'], [{'linha': 2, 'cpf': '90000000001', 'erro': 'Saldo insuficiente.'}])
+        self.assertEqual(self.saldos(), [
+            ('10120230340', Decimal('0.00')),
+            ('90000000000', Decimal('1600.00')),
+            ('90000000001', Decimal('1000.00')),
+            ('90000000002', Decimal('1400.00')),
+        ])
+
+    def test_erro_no_meio_desfaz_o_lote_inteiro(self):
+        antes = self.saldos()
+        linhas = [{'cpf': f.cpf, 'valor': '100'} for f in self.funcionarios]
+
+        with mock.patch('usuarios.services.registrar_transferencias', side_effect=RuntimeError('falha')):
+            with self.assertRaises(RuntimeError):
+                transferir_lote(self.remetente, linhas)
+
+        self.assertEqual(self.saldos(), antes)
+        self.assertFalse(Transacao.objects.exists())
+        self.assertFalse(TransacaoResumoDiario.objects.exists())
+
+    def test_debito_recusado_desfaz_o_lote_inteiro(self):
+        antes = self.saldos()
+        linhas = [{'cpf': f.cpf, 'valor': '100'} for f in self.funcionarios]
+        # o UPDATE condicional do débito não encontra saldo (ex.: débito concorrente)
+        filtrar = Cliente.objects.filter
+
+        def sem_saldo(*args, **kwargs):
+            if 'saldo__gte' in kwargs:
+                kwargs['saldo__gte'] = Decimal('99999999.99')
+            return filtrar(*args, **kwargs)
+
+        with mock.patch.object(Cliente.objects, 'filter', side_effect=sem_saldo):
+            with self.assertRaises(SaldoInsuficienteError):
+                transferir_lote(self.remetente, linhas)
+
+        self.assertEqual(self.saldos(), antes)
+        self.assertFalse(Transacao.objects.exists())
+
+    def test_endpoint_idempotente(self):
+        self.client.force_login(self.usuario)
+        conteudo = b'cpf,valor\n90000000000,100\n90000000001,50\n'
+
+        def enviar(conteudo):
+            arquivo = SimpleUploadedFile('folha.csv', conteudo, content_type='text/csv')
+            return self.client.post(
+                reverse('usuarios:transferencia_lote'), {'arquivo': arquivo}, HTTP_IDEMPOTENCY_KEY='folha-10'
+            )
+
+        primeira = enviar(conteudo)
+        segunda = enviar(conteudo)
+        outro_arquivo = enviar(b'cpf,valor\n90000000002,100\n')
+
+        self.assertEqual(primeira.json()['total_transferido'], '150.00')
+        self.assertEqual(segunda.content, primeira.content)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(outro_arquivo.status_code, 422)
+        self.remetente.refresh_from_db()
+        self.assertEqual(self.remetente.saldo, Decimal('850.00'))
+
+    def test_endpoint_formatos(self):
+        self.client.force_login(self.usuario)
+        url = reverse('usuarios:transferencia_lote')
+
+        response = self.client.post(url, {'formato': 'csv'})  # multipart sem o arquivo
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Arquivo obrigatório (campo "arquivo").')
+        self.assertEqual(self.client.post(url, 'cpf;valor', content_type='text/plain').status_code, 415)
+
+        response = self.client.post(url, '[{"cpf": "90000000000", "valor": "10"}]', content_type='application/json')
+        self.assertEqual(response.json()['total_transferido'], '10.00')
+        response = self.client.post(url, 'cpf,valor\n90000000001,5\n', content_type='text/csv; charset=utf-8')
+        self.assertEqual(response.json()['total_transferido'], '5.00')
+
+
+class SaldoHistoricoTests(TestCase):
+    """O saldo passado vem do saldo atual (ou de um checkpoint) e das movimentações do extrato"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='julia', password='senha-segura-123')
+        cls.cliente = Cliente.objects.create(usuario=cls.usuario, cpf='13243546576')
+        cls.agora = timezone.now()
+        Cliente.objects.filter(pk=cls.cliente.pk).update(data_cadastro=cls.agora - timedelta(days=10))
+        deposito = depositar(cls.cliente, Decimal('200.00'))
+        Transacao.objects.filter(pk=deposito.pk).update(data_transacao=cls.agora - timedelta(days=3))
+        reconstruir()
+
+    def test_saldo_em_desfaz_movimentos_posteriores(self):
+        self.assertEqual(saldo_em(self.cliente, self.agora - timedelta(days=4)), Decimal('1000.00'))
+        self.assertEqual(saldo_em(self.cliente, self.agora - timedelta(days=2)), Decimal('1200.00'))
+        self.assertEqual(saldo_em(self.cliente, timezone.now()), Decimal('1200.00'))
+
+    def test_compra_com_saldo_entra_no_historico(self):
+        produto = Produto.objects.create(titulo='Fone', descricao='Fone sem fio', preco_vista=Decimal('150.00'))
+        carrinho = CarrinhoCompras.objects.create(cliente=self.cliente)
+        ItemCarrinho.objects.create(carrinho=carrinho, produto=produto, quantidade=2)
+        antes = timezone.now()
+        self.client.force_login(self.usuario)
+
+        response = self.client.post(reverse('loja:finalizar_compra'), {'forma_pagamento': 'saldo'})
+
+        self.assertRedirects(response, reverse('loja:compras'), fetch_redirect_response=False)
+        compra = Transacao.objects.get(cliente=self.cliente, tipo='compra')
+        self.assertEqual(compra.valor, Decimal('300.00'))
+        self.assertEqual(compra.descricao, f'Compra #{self.cliente.compras.get().pk}')
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo, Decimal('900.00'))
+        self.assertEqual(saldo_em(self.cliente, antes), Decimal('1200.00'))
+        self.assertEqual(saldo_em(self.cliente, self.agora - timedelta(days=4)), Decimal('1000.00'))
+        self.assertEqual(divergencias(), [])
+
+    def test_compra_sem_saldo_nao_grava_nada(self):
+        produto = Produto.objects.create(titulo='Sofá', descricao='Sofá', preco_vista=Decimal('5000.00'))
+        carrinho = CarrinhoCompras.objects.create(cliente=self.cliente)
+        ItemCarrinho.objects.create(carrinho=carrinho, produto=produto)
+        self.client.force_login(self.usuario)
+
+        self.client.post(reverse('loja:finalizar_compra'), {'forma_pagamento': 'saldo'})
+
+        self.assertFalse(self.cliente.compras.exists())
+        self.assertFalse(Transacao.objects.filter(tipo='compra').exists())
+
+    def test_gerar_checkpoints(self):
+        novato = Cliente.objects.create(
+            usuario=Usuario.objects.create_user(username='novato', password='senha-segura-123'),
+            cpf='97867564534',
+        )
+        dia = timezone.localdate(self.agora - timedelta(days=4))
+
+        self.assertEqual(gerar_checkpoints(dia), 1)
+
+        checkpoint = CheckpointSaldo.objects.get()
+        self.assertEqual((checkpoint.cliente_id, checkpoint.data, checkpoint.saldo), (self.cliente.pk, dia, Decimal('1000.00')))
+        self.assertFalse(novato.checkpoints_saldo.exists())
+        # daqui em diante o saldo passado parte do checkpoint, não do saldo atual
+        CheckpointSaldo.objects.update(saldo=Decimal('700.00'))
+        self.assertEqual(saldo_em(self.cliente, self.agora - timedelta(days=2)), Decimal('900.00'))
+
+    def test_extrato_mostra_saldo_apos_cada_linha(self):
+        depositar(self.cliente, Decimal('50.00'))
+        self.client.force_login(self.usuario)
+
+        response = self.client.get(reverse('usuarios:extrato'))
+        saldos = [transacao.saldo_apos for transacao in response.context['transacoes']]
+        self.assertEqual(saldos, [Decimal('1250.00'), Decimal('1200.00')])
+        self.assertContains(response, 'Saldo R$ 1250,00')
+
+        # com checkpoint o cálculo parte dele, inclusive na rolagem infinita
+        gerar_checkpoints(timezone.localdate(self.agora - timedelta(days=4)))
+        CheckpointSaldo.objects.update(saldo=Decimal('700.00'))
+        response = self.client.get(reverse('usuarios:extrato_pagina'))
+        self.assertIn('Saldo R$ 950,00', response.json()['html'])
+        self.assertIn('Saldo R$ 900,00', response.json()['html'])
+
+        # com filtro de tipo as linhas não são consecutivas e o saldo some
+        response = self.client.get(reverse('usuarios:extrato'), {'tipo': 'deposito'})
+        self.assertFalse(response.context['mostrar_saldo'])
+        self.assertNotContains(response, 'Saldo R$')
+
+    def test_saldo_apos_desempata_pelo_id(self):
+        depositar(self.cliente, Decimal('50.00'))
+        Transacao.objects.update(data_transacao=self.agora - timedelta(days=3))
+        self.client.force_login(self.usuario)
+
+        for checkpoint in (False, True):
+            if checkpoint:
+                gerar_checkpoints(timezone.localdate(self.agora - timedelta(days=4)))
+            with self.subTest(checkpoint=checkpoint):
+                response = self.client.get(reverse('usuarios:extrato'))
+                valores = [(t.valor, t.saldo_apos) for t in response.context['transacoes']]
+                self.assertEqual(valores, [(Decimal('50.00'), Decimal('1250.00')), (Decimal('200.00'), Decimal('1200.00'))])
+
+    def test_saldos_no_dia(self):
+        novato = Cliente.objects.create(
+            usuario=Usuario.objects.create_user(username='novato', password='senha-segura-123'),
+            cpf='97867564534',
+        )
+        hoje = timezone.localdate()
+        dias = [timezone.localdate(self.agora - timedelta(days=n)) for n in (4, 2)] + [hoje]
+
+        self.assertEqual(saldos_no_dia(dias[0]), {self.cliente.pk: Decimal('1000.00')})
+        self.assertEqual(saldos_no_dia(dias[1]), {self.cliente.pk: Decimal('1200.00')})
+
+        gerar_checkpoints(dias[0])
+        CheckpointSaldo.objects.update(saldo=Decimal('700.00'))
+        self.assertEqual(saldos_no_dia(dias[1]), {self.cliente.pk: Decimal('900.00')})
+        # o novato não tem checkpoint na rodada e parte do saldo atual
+        self.assertEqual(saldos_no_dia(hoje), {self.cliente.pk: Decimal('900.00'), novato.pk: Decimal('1000.00')})
+        self.assertEqual(saldos_no_dia(hoje)[self.cliente.pk], saldo_em(self.cliente, timezone.now()))
+
+    def test_relatorio_saldos_apenas_gerentes(self):
+        self.client.force_login(self.usuario)
+        response = self.client.get(reverse('usuarios:relatorio_saldos'))
+        self.assertRedirects(response, reverse('usuarios:home_redirect'), fetch_redirect_response=False)
+
+        gerente = Usuario.objects.create_user(username='chefe', password='senha-segura-123', tipo_usuario='gerente')
+        Gerente.objects.create(usuario=gerente, codigo_gerente='G9', data_admissao=timezone.localdate())
+        self.client.force_login(gerente)
+        dia = timezone.localdate(self.agora - timedelta(days=2))
+
+        response = self.client.get(reverse('usuarios:relatorio_saldos'), {'dia': dia.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['relatorio']['total'], Decimal('1200.00'))
+        self.assertEqual(response.context['relatorio']['maiores_saldos'][0]['cpf'], self.cliente.cpf)
+
+        response = self.client.get(reverse('usuarios:relatorio_saldos'), {'dia': '31/12/2024'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['dia'], timezone.localdate() - timedelta(days=1))
+
+    def test_comando_gerar_checkpoints(self):
+        dia = timezone.localdate(self.agora - timedelta(days=2))
+        saida = io.StringIO()
+
+        call_command('gerar_checkpoints_saldo', '--data', dia.isoformat(), stdout=saida)
+        call_command('gerar_checkpoints_saldo', '--data', dia.isoformat(), stdout=saida)
+
+        self.assertIn(f"1 checkpoints de saldo gravados para {dia.strftime('%d/%m/%Y')}", saida.getvalue())
+        self.assertEqual(list(CheckpointSaldo.objects.values_list('data', 'saldo')), [(dia, Decimal('1200.00'))])
+        with self.assertRaises(CommandError):
+            call_command('gerar_checkpoints_saldo', '--data', timezone.localdate().isoformat())
+        with self.assertRaises(CommandError):
+            call_command('gerar_checkpoints_saldo', '--data', '31/12/2024')
+
+
+class PlanosConsultaTests(TestCase):
+    """As consultas do histórico usam os índices de Transacao, do resumo diário e do livro contábil"""
+
+    def test_consultas_criticas_usam_indices(self):
+        for nome, consulta in consultas_criticas().items():
+            with self.subTest(nome):
+                plano = consulta.explain()
+                self.assertRegex(plano, r'transacao_(cliente_data|cli_tipo_data)_idx|resumo')
+                self.assertIsNone(problema(plano))
+                self.assertNotIn('USE TEMP B-TREE', plano)
+
+    @override_settings(LIVRO_CONTABIL_TRANSFERENCIAS=True)
+    def test_consultas_do_livro_contabil_usam_indices(self):
+        consultas = consultas_criticas()
+        self.assertIs(consultas['extrato: período'].model, MovimentoCliente)
+        for nome, consulta in consultas.items():
+            with self.subTest(nome):
+                self.assertIsNone(problema(consulta.explain()))
+        plano = consultas['extrato: período'].explain()
+        self.assertIn('lancamento_debito_data_idx', plano)
+        self.assertIn('lancamento_credito_data_idx', plano)
+
+    def test_varredura_reprovada(self):
+        self.assertEqual(problema('SCAN usuarios_transacao'), 'varredura completa da tabela')
+        self.assertEqual(problema('SCAN l USING INDEX lancamento_debito_data_idx'), 'varredura completa da tabela')
+        self.assertIsNone(problema('SCAN usuarios_movimentocliente\nUSE TEMP B-TREE FOR ORDER BY'))
+
+    def test_extrato_por_tipo_usa_indice_do_tipo(self):
+        plano = consultas_criticas()['extrato: período por tipo'].explain()
+        self.assertIn('transacao_cli_tipo_data_idx', plano)
+
+    def test_comando_aprova_os_planos(self):
+        saida = io.StringIO()
+        call_command('verificar_planos_consulta', stdout=saida)
+        self.assertIn('Todas as consultas críticas usam índices', saida.getvalue())
+
+
+class ExtratoPaginacaoTests(TestCase):
+    """O extrato pagina por cursor em (data_transacao, id)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='joao', password='senha-segura-123')
+        cls.cliente = Cliente.objects.create(usuario=cls.usuario, cpf='98765432100')
+        # bulk_create grava quase todas com o mesmo instante: o id desempata
+        registrar_transacoes([
+            Transacao(cliente=cls.cliente, tipo='deposito', valor=Decimal(i + 1))
+            for i in range(120)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def test_primeira_pagina_traz_apenas_50_mais_recentes(self):
+        response = self.client.get(reverse('usuarios:extrato'))
+
+        self.assertEqual(len(response.context['transacoes']), 50)
+        self.assertEqual(response.context['quantidade_transacoes'], 120)
+        self.assertIsNotNone(response.context['proximo_cursor'])
+
+    def test_cursores_percorrem_todas_as_transacoes_sem_repetir(self):
+        transacoes = Transacao.objects.filter(cliente=self.cliente)
+        esperado = list(transacoes.order_by('-data_transacao', '-id').values_list('pk', flat=True))
+
+        vistos = []
+        itens, cursor = pagina_por_cursor(transacoes)
+        vistos.extend(t.pk for t in itens)
+        while cursor:
+            itens, cursor = pagina_por_cursor(transacoes, cursor)
+            vistos.extend(t.pk for t in itens)
+
+        self.assertEqual(vistos, esperado)
+
+    def test_endpoint_entrega_as_paginas_restantes(self):
+        response = self.client.get(reverse('usuarios:extrato'))
+        cursor = response.context['proximo_cursor']
+        quantidades = []
+
+        while cursor:
+            dados = self.client.get(reverse('usuarios:extrato_pagina'), {'cursor': cursor}).json()
+            self.assertTrue(dados['success'])
+            quantidades.append(dados['quantidade'])
+            cursor = dados['proximo_cursor']
+
+        self.assertEqual(quantidades, [50, 20])
+
+    def test_cursor_invalido(self):
+        response = self.client.get(reverse('usuarios:extrato_pagina'), {'cursor': 'lixo'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportacaoExtratoTests(TestCase):
+    """Extrato exportado em CSV/OFX por streaming, para o cliente ou para o gerente"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='lia', password='senha-segura-123')
+        cls.cliente = Cliente.objects.create(usuario=cls.usuario, cpf='31415926535')
+        gerente = Usuario.objects.create_user(username='ger', password='senha-segura-123', tipo_usuario='gerente')
+        Gerente.objects.create(usuario=gerente, codigo_gerente='G7', data_admissao=timezone.localdate())
+        cls.gerente = gerente
+        antigo = depositar(cls.cliente, Decimal('40.00'), 'Antigo')
+        Transacao.objects.filter(pk=antigo.pk).update(data_transacao=timezone.now() - timedelta(days=45))
+        depositar(cls.cliente, Decimal('10.00'), '=HYPERLINK("http://x")')
+        registrar_transacoes([
+            Transacao(cliente=cls.cliente, tipo='compra', valor=Decimal('25.50'), descricao='@SUM(A1)'),
+        ])
+        Cliente.objects.filter(pk=cls.cliente.pk).update(saldo=Decimal('1024.50'))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def exportar(self, **params):
+        response = self.client.get(reverse('usuarios:exportar_extrato'), params)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_do_ultimo_mes(self):
+        response, conteudo = self.exportar()
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        linhas = conteudo.lstrip('\ufeff').splitlines()
+        self.assertEqual(linhas[0], 'id;data;tipo;valor;descricao')
+        self.assertEqual([linha.split(';', 2)[2] for linha in linhas[1:]], [
+            'Depósito;10.00;"Depósito - =HYPERLINK(""http://x"")"',
+            "Compra;-25.50;'@SUM(A1)",
+        ])
+
+    def test_celulas_com_formula_sao_escapadas(self):
+        from .exportacao import celula_texto
+
+        for texto in ['=1+1', '+1', '-1', '@A1', '\tx', '\rx']:
+            self.assertEqual(celula_texto(texto), f"'{texto}")
+        self.assertEqual(celula_texto('Aluguel - maio'), 'Aluguel - maio')
+
+    def test_filtro_por_datas(self):
+        inicio = timezone.localdate() - timedelta(days=50)
+        fim = timezone.localdate() - timedelta(days=40)
+
+        response, conteudo = self.exportar(inicio=inicio.isoformat(), fim=fim.isoformat())
+
+        self.assertIn(f'extrato_31415926535_{inicio:%Y%m%d}_{fim:%Y%m%d}.csv', response['Content-Disposition'])
+        self.assertEqual(len(conteudo.splitlines()), 2)
+        self.assertIn('Depósito - Antigo', conteudo)
+        self.assertEqual(self.client.get(reverse('usuarios:exportar_extrato'), {'inicio': 'ontem'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('usuarios:exportar_extrato'), {
+            'inicio': fim.isoformat(), 'fim': inicio.isoformat(),
+        }).status_code, 400)
+
+    def test_ofx(self):
+        response, conteudo = self.exportar(formato='ofx')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ofx')
+        self.assertEqual(conteudo.count('<STMTTRN>'), 2)
+        self.assertIn('<TRNTYPE>DEBIT\n', conteudo)
+        self.assertIn('<TRNAMT>-25.50\n', conteudo)
+        self.assertIn('<ACCTID>31415926535', conteudo)
+        self.assertIn('<LEDGERBAL><BALAMT>1024.50', conteudo)
+
+    def test_gerente_informa_o_cpf(self):
+        self.client.force_login(self.gerente)
+
+        response, conteudo = self.exportar(cpf='31415926535')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Compra;-25.50', conteudo)
+        self.assertEqual(self.client.get(reverse('usuarios:exportar_extrato'), {'cpf': '00000000000'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('usuarios:exportar_extrato')).status_code, 404)
+
+    async def test_asgi_recebe_iterador_assincrono(self):
+        await self.async_client.aforce_login(self.usuario)
+
+        response = await self.async_client.get(reverse('usuarios:exportar_extrato'))
+
+        self.assertTrue(response.is_async)
+        conteudo = b''.join([bloco async for bloco in response.streaming_content]).decode()
+        self.assertIn('Compra;-25.50', conteudo)
+
+
+class IdempotenciaTests(TestCase):
+    """Reenvios com a mesma chave devolvem a resposta guardada sem repetir a operação"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='ana', password='senha-segura-123')
+        cls.cliente = Cliente.objects.create(usuario=cls.usuario, cpf='11122233344', saldo=Decimal('500.00'))
+        destino = Usuario.objects.create_user(username='bia', password='senha-segura-123')
+        cls.destinatario = Cliente.objects.create(usuario=destino, cpf='55566677788')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def depositar(self, valor='100.00', **extra):
+        return self.client.post(reverse('usuarios:deposito'), {'valor': valor}, **extra)
+
+    def test_reenvio_devolve_resposta_sem_repetir_deposito(self):
+        primeira = self.depositar(HTTP_IDEMPOTENCY_KEY='chave-1')
+
+        # sessão, usuário e a consulta da chave
+        with self.assertNumQueries(3):
+            segunda = self.depositar(HTTP_IDEMPOTENCY_KEY='chave-1')
+
+        self.assertEqual(segunda.status_code, primeira.status_code)
+        self.assertEqual(segunda['Location'], primeira['Location'])
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo, Decimal('600.00'))
+        self.assertEqual(Transacao.objects.filter(cliente=self.cliente).count(), 1)
+
+    def test_chave_no_formulario(self):
+        dados = {'destinatario_cpf': self.destinatario.cpf, 'valor': '50.00', 'chave_idempotencia': 'form-1'}
+        for _ in range(3):
+            self.client.post(reverse('usuarios:transferencia'), dados)
+
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.saldo, Decimal('450.00'))
+        self.assertEqual(Transacao.objects.filter(tipo='transferencia_enviada').count(), 1)
+
+    def test_mesma_chave_com_dados_diferentes(self):
+        self.depositar('100.00', HTTP_IDEMPOTENCY_KEY='chave-2')
+        response = self.depositar('200.00', HTTP_IDEMPOTENCY_KEY='chave-2')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transacao.objects.filter(cliente=self.cliente).count(), 1)
+
+    def test_reenvio_durante_processamento(self):
+        self.depositar(HTTP_IDEMPOTENCY_KEY='chave-3')
+        ChaveIdempotencia.objects.filter(chave='chave-3').update(status='processando')
+
+        response = self.depositar(HTTP_IDEMPOTENCY_KEY='chave-3')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Transacao.objects.filter(cliente=self.cliente).count(), 1)
+
+    def test_chave_expirada_executa_novamente(self):
+        self.depositar(HTTP_IDEMPOTENCY_KEY='chave-4')
+        ChaveIdempotencia.objects.update(expira_em=timezone.now() - timedelta(seconds=1))
+
+        response = self.depositar(HTTP_IDEMPOTENCY_KEY='chave-4')
+
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Transacao.objects.filter(cliente=self.cliente).count(), 2)
+
+    def test_sem_chave_mantem_comportamento(self):
+        self.depositar()
+        self.depositar()
+
+        self.assertEqual(Transacao.objects.filter(cliente=self.cliente).count(), 2)
+        self.assertFalse(ChaveIdempotencia.objects.exists())
+
+
+@override_settings(LIVRO_CONTABIL_TRANSFERENCIAS=True)
+class LivroContabilTests(TestCase):
+    """Com o livro contábil ativo, cada transferência é um único lançamento"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.remetente = Cliente.objects.create(
+            usuario=Usuario.objects.create_user(username='edu', password='senha-segura-123', first_name='Edu'),
+            cpf='44455566677',
+        )
+        cls.destinatario = Cliente.objects.create(
+            usuario=Usuario.objects.create_user(username='fabi', password='senha-segura-123', first_name='Fabi'),
+            cpf='66677788899',
+        )
+
+    def test_transferencia_grava_um_lancamento(self):
+        transferir(self.remetente, self.destinatario, Decimal('25.00'), 'Aluguel')
+
+        self.assertEqual(LancamentoContabil.objects.count(), 1)
+        self.assertFalse(Transacao.objects.exists())
+        self.assertEqual(divergencias(), [])
+
+    def test_cliente_com_lancamentos_nao_e_apagado(self):
+        transferir(self.remetente, self.destinatario, Decimal('25.00'))
+
+        with self.assertRaises(ProtectedError):
+            self.remetente.delete()
+        self.assertEqual(movimentos_do_cliente(self.destinatario).count(), 1)
+
+    def test_historico_assinado_por_cliente(self):
+        transferir(self.remetente, self.destinatario, Decimal('25.00'), 'Aluguel')
+
+        enviada, = movimentos_do_cliente(self.remetente)
+        recebida, = movimentos_do_cliente(self.destinatario)
+        self.assertEqual(enviada.tipo, 'transferencia_enviada')
+        self.assertTrue(enviada.eh_saida)
+        self.assertEqual(enviada.descricao, 'Transferência para Fabi (66677788899) - Aluguel')
+        self.assertEqual(recebida.tipo, 'transferencia_recebida')
+        self.assertEqual(recebida.descricao, 'Transferência de Edu (44455566677) - Aluguel')
+        self.assertEqual(recebida.origem_id, self.remetente.pk)
+        self.assertEqual(saldo_em(self.destinatario, timezone.now() - timedelta(hours=1)), Decimal('1000.00'))
+
+    def test_ids_unicos_na_view(self):
+        depositar(self.remetente, Decimal('10.00'))
+        transferir(self.remetente, self.destinatario, Decimal('25.00'))
+
+        ids = list(MovimentoCliente.objects.values_list('pk', flat=True))
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(set(ids)), 3)
+        enviada = movimentos_do_cliente(self.remetente).get(tipo='transferencia_enviada')
+        self.assertEqual(MovimentoCliente.objects.get(pk=enviada.pk).cliente_id, self.remetente.pk)
+
+    def test_extrato_exibe_lancamentos(self):
+        transferir(self.remetente, self.destinatario, Decimal('25.00'))
+        self.client.force_login(self.remetente.usuario)
+
+        response = self.client.get(reverse('usuarios:extrato'))
+
+        self.assertEqual(response.context['total_saida'], Decimal('25.00'))
+        self.assertContains(response, 'Transferência para Fabi (66677788899)')
+
+    def test_migracao_de_transferencias_existentes(self):
+        with override_settings(LIVRO_CONTABIL_TRANSFERENCIAS=False):
+            transferir(self.remetente, self.destinatario, Decimal('10.00'), 'Pizza')
+            transferir(self.destinatario, self.remetente, Decimal('4.00'))
+        Transacao.objects.create(cliente=self.remetente, tipo='deposito', valor=Decimal('1.00'))
+        antes = [(m.tipo, m.valor, m.descricao) for m in movimentos_do_cliente(self.remetente).order_by('tipo')]
+
+        call_command('migrar_transferencias_livro_contabil', stdout=io.StringIO())
+
+        self.assertEqual(LancamentoContabil.objects.count(), 2)
+        self.assertEqual(LancamentoContabil.objects.get(valor=Decimal('10.00')).descricao, 'Pizza')
+        self.assertEqual(list(Transacao.objects.values_list('tipo', flat=True)), ['deposito'])
+        depois = [(m.tipo, m.valor, m.descricao) for m in movimentos_do_cliente(self.remetente).order_by('tipo')]
+        self.assertEqual(depois, antes)
+
+
+class KpisGerenteTests(TestCase):
+    """Os indicadores do painel do gerente vêm de uma consulta e ficam em cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='gil', password='senha-segura-123', tipo_usuario='gerente')
+        Gerente.objects.create(usuario=cls.usuario, codigo_gerente='G001', data_admissao=timezone.localdate())
+        for i, limite in enumerate(['500.00', '1500.00', '2000.00']):
+            cliente = Cliente.objects.create(
+                usuario=Usuario.objects.create_user(username=f'cli{i}', password='senha-segura-123'),
+                cpf=f'9000000000{i}',
+                limite_credito=Decimal(limite),
+                limite_credito_aprovado=i > 0,
+            )
+        SolicitacaoCredito.objects.create(
+            cliente=cliente, valor_solicitado=Decimal('1000.00'), justificativa='Reforma', renda_mensal=Decimal('3000.00')
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_indicadores_em_uma_consulta_e_cache(self):
+        # sessão, usuário com o gerente, indicadores e tendência mensal
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('usuarios:dashboard_gerente'))
+
+        self.assertEqual(response.context['total_clientes'], 3)
+        self.assertEqual(response.context['total_credito_aprovado'], Decimal('3500.00'))
+        self.assertEqual(response.context['novos_clientes_mes'], 3)
+        self.assertEqual(response.context['solicitacoes_pendentes'], 1)
+
+        with self.assertNumQueries(1):
+            self.client.get(reverse('usuarios:dashboard_gerente'))
+
+    def test_alteracoes_invalidam_o_cache(self):
+        self.client.get(reverse('usuarios:dashboard_gerente'))
+
+        cliente = Cliente.objects.get(cpf='90000000000')
+        cliente.saldo = Decimal('1.00')
+        cliente.save(update_fields=['saldo'])
+        self.assertIsNotNone(cache.get('usuarios:kpis_gerente'))
+
+        cliente.limite_credito_aprovado = True
+        cliente.save()
+        response = self.client.get(reverse('usuarios:dashboard_gerente'))
+        self.assertEqual(response.context['total_credito_aprovado'], Decimal('4000.00'))
+
+        SolicitacaoCredito.objects.update(status='aprovada')  # UPDATE em massa não dispara sinais
+        self.assertEqual(self.client.get(reverse('usuarios:dashboard_gerente')).context['solicitacoes_pendentes'], 1)
+        cliente.solicitacoes_credito.create(
+            valor_solicitado=Decimal('10.00'), justificativa='Teste', renda_mensal=Decimal('3000.00')
+        )
+        self.assertEqual(self.client.get(reverse('usuarios:dashboard_gerente')).context['solicitacoes_pendentes'], 1)
+
+
+class GraficosTests(TestCase):
+    """Séries JSON dos gráficos, agregadas no banco e revalidadas por ETag"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='lia', password='senha-segura-123', first_name='Lia')
+        cls.cliente = Cliente.objects.create(usuario=cls.usuario, cpf='55555555555', saldo=Decimal('1070.00'))
+        registrar_transacoes([
+            Transacao(cliente=cls.cliente, tipo='deposito', valor=Decimal('100.00')),
+            Transacao(cliente=cls.cliente, tipo='compra', valor=Decimal('30.00')),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+        hoje = timezone.localdate()
+        self.parametros = {'inicio': (hoje - timedelta(days=1)).isoformat(), 'fim': hoje.isoformat()}
+
+    def test_entradas_saidas_por_dia(self):
+        response = self.client.get(reverse('usuarios:grafico_entradas_saidas'), self.parametros)
+
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual(dados['labels'], [self.parametros['inicio'], self.parametros['fim']])
+        self.assertEqual(dados['entradas'], [0.0, 100.0])
+        self.assertEqual(dados['saidas'], [0.0, 30.0])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_historico_saldo(self):
+        response = self.client.get(reverse('usuarios:grafico_saldo'), self.parametros)
+        self.assertEqual(response.json()['data'], [1000.0, 1070.0])
+
+    def test_etag_revalida_ate_nova_transacao(self):
+        url = reverse('usuarios:grafico_entradas_saidas')
+        etag = self.client.get(url, self.parametros)['ETag']
+
+        response = self.client.get(url, self.parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_transacoes([Transacao(cliente=self.cliente, tipo='deposito', valor=Decimal('5.00'))])
+        response = self.client.get(url, self.parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['entradas'][-1], 105.0)
+
+    def test_etag_vem_do_banco_e_nao_do_cache(self):
+        url = reverse('usuarios:grafico_saldo')
+        etag = self.client.get(url, self.parametros)['ETag']
+
+        # outro processo, com o cache vazio, responde com o mesmo validador
+        cache.clear()
+        self.assertEqual(self.client.get(url, self.parametros, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # e uma gravação é percebida mesmo sem a invalidação do cache (on_commit não roda aqui)
+        depositar(self.cliente, Decimal('5.00'))
+        response = self.client.get(url, self.parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'][-1], 1075.0)
+
+    def test_gastos_por_categoria_sem_compras(self):
+        response = self.client.get(reverse('usuarios:grafico_gastos_categoria'), self.parametros)
+        self.assertEqual(response.json()['labels'], [])
+
+    def test_max_pontos_reduz_serie_longa(self):
+        hoje = timezone.localdate()
+        parametros = {'inicio': (hoje - timedelta(days=99)).isoformat(), 'fim': hoje.isoformat(), 'max_pontos': 10}
+
+        saldo = self.client.get(reverse('usuarios:grafico_saldo'), parametros).json()
+        self.assertEqual(len(saldo['data']), 10)
+        self.assertEqual(saldo['labels'][-1], hoje.isoformat())
+        self.assertEqual(saldo['data'][-1], 1070.0)
+
+        movimento = self.client.get(reverse('usuarios:grafico_entradas_saidas'), parametros).json()
+        self.assertEqual(len(movimento['labels']), 10)
+        self.assertEqual(sum(movimento['entradas']), 100.0)
+        self.assertEqual(sum(movimento['saidas']), 30.0)
+
+    def test_lttb_preserva_extremos(self):
+        valores = [0.0] * 50 + [90.0] + [0.0] * 49 + [-40.0] + [0.0] * 99
+        indices = lttb(valores, 12)
+        self.assertEqual(len(indices), 12)
+        self.assertEqual((indices[0], indices[-1]), (0, 199))
+        self.assertIn(50, indices)
+        self.assertIn(100, indices)
+        self.assertEqual(list(lttb(valores[:5], 12)), [0, 1, 2, 3, 4])
+
+        inicios, somas = somar_em_grupos([1, 2, 3, 4, 5, 6, 7], 3)
+        self.assertEqual(list(inicios), [0, 2, 4])
+        self.assertEqual(list(somas), [3.0, 7.0, 18.0])
+
+    def test_parametros_invalidos(self):
+        url = reverse('usuarios:grafico_entradas_saidas')
+        self.assertEqual(self.client.get(url, {'intervalo': 'hora'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'inicio': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'inicio': '2024-02-01', 'fim': '2024-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'max_pontos': '2'}).status_code, 400)
+
+
+class EventosTempoRealTests(TestCase):
+    """Saldo e transações publicados após o commit para as conexões SSE abertas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(username='rui', password='senha-segura-123', first_name='Rui')
+        cls.cliente = Cliente.objects.create(usuario=cls.usuario, cpf='66666666666', saldo=Decimal('200.00'))
+
+    def _depositar(self, valor):
+        with self.captureOnCommitCallbacks(execute=True):
+            depositar(self.cliente, valor, 'Teste')
+
+    async def test_deposito_publicado_apos_commit(self):
+        assinatura = eventos.assinar(self.cliente.pk)
+        try:
+            await sync_to_async(self._depositar)(Decimal('50.00'))
+            tipo, transacao = await asyncio.wait_for(assinatura.fila.get(), 1)
+            self.assertEqual((tipo, transacao['tipo'], transacao['valor']), ('transacao', 'deposito', '50.00'))
+            self.assertEqual(await asyncio.wait_for(assinatura.fila.get(), 1), ('saldo', {'saldo': '250.00'}))
+        finally:
+            eventos.cancelar(assinatura)
+        self.assertEqual(eventos.total_assinaturas(), 0)
+
+    async def test_stream_envia_saldo_e_eventos(self):
+        await self.async_client.aforce_login(self.usuario)
+        response = await self.async_client.get(reverse('usuarios:eventos_cliente'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        conteudo = aiter(response.streaming_content)
+        primeiro = await anext(conteudo)
+        self.assertIn(b'retry: ', primeiro)
+        self.assertIn(b'event: saldo\ndata: {"saldo": "200.00"}', primeiro)
+        self.assertEqual(eventos.total_assinaturas(), 1)
+
+        eventos.publicar(self.cliente.pk, 'saldo', {'saldo': '10.00'})
+        self.assertEqual(await asyncio.wait_for(anext(conteudo), 1), b'event: saldo\ndata: {"saldo": "10.00"}\n\n')
+
+        # Desconexão: o handler ASGI cancela a tarefa que consome o stream
+        leitura = asyncio.ensure_future(anext(conteudo))
+        await asyncio.sleep(0)
+        leitura.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await leitura
+        self.assertEqual(eventos.total_assinaturas(), 0)
+
+    def test_wsgi_nao_abre_stream(self):
+        self.client.force_login(self.usuario)
+        response = self.client.get(reverse('usuarios:eventos_cliente'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+        dashboard = self.client.get(reverse('usuarios:dashboard_cliente'))
+        self.assertNotContains(dashboard, reverse('usuarios:eventos_cliente'))
+
+    async def test_dashboard_asgi_abre_stream(self):
+        await self.async_client.aforce_login(self.usuario)
+        response = await self.async_client.get(reverse('usuarios:dashboard_cliente'))
+        self.assertContains(response, f"new EventSource('{reverse('usuarios:eventos_cliente')}')")
+
+
+class RotaEventosTests(TransactionTestCase):
+    """/eventos/ atendido pela rota ASGI direta (a sessão é lida em outra thread)"""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='ana', password='senha-segura-123', first_name='Ana')
+        self.cliente = Cliente.objects.create(usuario=self.usuario, cpf='77777777777', saldo=Decimal('80.00'))
+        self.client.force_login(self.usuario)
+        self.enviados = []
+
+    async def _conectar(self, cookie, desconectar):
+        async def receive():
+            if not hasattr(receive, 'lido'):
+                receive.lido = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await desconectar.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(mensagem):
+            self.enviados.append(mensagem)
+
+        async def repassar(scope, receive, send):
+            self.fail('/eventos/ não deveria chegar ao Django')
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/eventos/',
+            'headers': [(b'cookie', f'sessionid={cookie}'.encode())],
+        }
+        await RotaEventos(repassar)(scope, receive, send)
+
+    async def _aguardar_mensagens(self, quantidade):
+        async def esperar():
+            while len(self.enviados) < quantidade:
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(esperar(), 2)
+
+    async def test_stream_autenticado_pela_sessao(self):
+        desconectar = asyncio.Event()
+        conexao = asyncio.ensure_future(self._conectar(self.client.cookies['sessionid'].value, desconectar))
+        await self._aguardar_mensagens(2)
+
+        self.assertEqual(self.enviados[0]['status'], 200)
+        self.assertIn(b'data: {"saldo": "80.00"}', self.enviados[1]['body'])
+
+        eventos.publicar(self.cliente.pk, 'saldo', {'saldo': '90.00'})
+        await self._aguardar_mensagens(3)
+        self.assertIn(b'"90.00"', self.enviados[2]['body'])
+
+        desconectar.set()
+        await asyncio.wait_for(conexao, 1)
+        self.assertEqual(eventos.total_assinaturas(), 0)
+
+    async def test_sem_sessao(self):
+        await self._conectar('invalida', asyncio.Event())
+        self.assertEqual(self.enviados[0]['status'], 401)
+
+
+class LoginTests(TestCase):
+    """Login por username ou email, sem diferenciar maiúsculas, usando os índices em LOWER"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='Joana', email='Joana@Galaxy.com', password='senha-segura-123'
+        )
+
+    def test_username_ou_email_em_qualquer_caixa(self):
+        for valor in ('joana', 'JOANA', 'joana@galaxy.com', 'JOANA@GALAXY.COM'):
+            self.assertEqual(authenticate(username=valor, password='senha-segura-123'), self.usuario)
+        self.assertIsNone(authenticate(username='joana', password='errada'))
+        self.assertIsNone(authenticate(username='ninguem', password='senha-segura-123'))
+
+    def test_email_com_acento(self):
+        erica = Usuario.objects.create_user(username='erica', email='ÉRICA@x.com', password='senha-segura-123')
+        # O LOWER do SQLite só converte A-Z: o "É" precisa vir como foi cadastrado
+        for valor in ('ÉRICA@x.com', 'ÉRICA@X.COM', 'Érica@x.com'):
+            self.assertEqual(authenticate(username=valor, password='senha-segura-123'), erica)
+
+    def test_busca_usa_indices(self):
+        plano = EmailOrUsernameModelBackend()._candidatos('Joana').explain()
+        self.assertIn('usuario_username_lower_idx', plano)
+        self.assertIn('usuario_email_lower_idx', plano)
+        self.assertNotIn('SCAN usuarios_usuario', plano)
+
+    def test_username_igual_ao_email_de_outro(self):
+        outro = Usuario.objects.create_user(username='joana@galaxy.com', password='outra-senha-456')
+        self.assertEqual(authenticate(username='Joana@galaxy.com', password='outra-senha-456'), outro)
+        self.assertEqual(authenticate(username='Joana@galaxy.com', password='senha-segura-123'), self.usuario)
+
+    def test_login_pela_view(self):
+        response = self.client.post(reverse('usuarios:login'), {'username': 'JOANA@galaxy.com', 'password': 'errada'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Credenciais inválidas')
+
+        response = self.client.post(reverse('usuarios:login'), {'username': 'JOANA@galaxy.com', 'password': 'senha-segura-123'})
+        self.assertEqual(response.wsgi_request.user, self.usuario)
+
+    async def test_hash_no_pool_de_senhas(self):
+        threads = []
+
+        def conferir(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return check_password(*args, **kwargs)
+
+        with mock.patch('usuarios.senhas.check_password', conferir):
+            usuario = await aauthenticate(username='joana', password='senha-segura-123')
+        self.assertEqual(usuario, self.usuario)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('hash-senha'))
+
+    async def test_credenciais_erradas_sem_repetir_o_hash(self):
+        with mock.patch('usuarios.senhas.check_password', wraps=check_password) as conferir:
+            self.assertIsNone(await aauthenticate(username='joana', password='errada'))
+        self.assertEqual(conferir.call_count, 1)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ])
+    def test_usuario_inativo_nao_tem_o_hash_regravado(self):
+        antigo = make_password('senha-segura-123', hasher='pbkdf2_sha1')
+        Usuario.objects.filter(pk=self.usuario.pk).update(password=antigo, is_active=False)
+
+        self.assertIsNone(authenticate(username='joana', password='senha-segura-123'))
+        self.client.post(reverse('usuarios:login'), {'username': 'joana', 'password': 'senha-segura-123'})
+        self.usuario.refresh_from_db()
+        self.assertEqual(self.usuario.password, antigo)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ])
+    def test_hash_antigo_regravado_no_login(self):
+        Usuario.objects.filter(pk=self.usuario.pk).update(
+            password=make_password('senha-segura-123', hasher='pbkdf2_sha1')
+        )
+        self.client.post(reverse('usuarios:login'), {'username': 'joana', 'password': 'senha-segura-123'})
+
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(self.usuario.check_password('senha-segura-123'))
+
+    def test_cadastro_faz_um_hash_e_entra(self):
+        self.client.cookies[cadastro.COOKIE] = signing.dumps({
+            'etapa1': {'first_name': 'Caio', 'last_name': 'Lima', 'email': 'Caio@Galaxy.com', 'telefone': '11999999999'},
+            'etapa2': {'cpf': '12312312312'},
+        }, salt=cadastro.SALT, compress=True)
+
+        with mock.patch('usuarios.senhas.make_password', wraps=make_password) as gerar:
+            response = self.client.post(reverse('usuarios:registro_etapa3'), {
+                'username': 'caio', 'password1': 'Senha-Forte-987', 'password2': 'Senha-Forte-987',
+                'aceitar_termos': 'on',
+            })
+
+        self.assertRedirects(response, reverse('usuarios:dashboard_cliente'), fetch_redirect_response=False)
+        self.assertEqual(gerar.call_count, 1)
+        usuario = Usuario.objects.get(username='caio')
+        self.assertEqual(usuario.email, 'Caio@galaxy.com')
+        self.assertEqual(usuario.cliente.cpf, '12312312312')
+        self.assertEqual(response.wsgi_request.user, usuario)
+        self.assertEqual(response.cookies[cadastro.COOKIE].value, '')
+
+
+class PerfilRequisicaoTests(TestCase):
+    """Usuário e perfil carregados uma vez (e em cache) e expostos em request.cliente/request.gerente"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username='rita', password='x', tipo_usuario='cliente', first_name='Rita'
+        )
+        cls.cliente = Cliente.objects.create(usuario=cls.usuario, cpf='55555555555', saldo=Decimal('100.00'))
+        gerente = Usuario.objects.create_user(username='gerente', password='x', tipo_usuario='gerente')
+        cls.gerente = Gerente.objects.create(usuario=gerente, codigo_gerente='G1', data_admissao=timezone.localdate())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_perfis_na_requisicao(self):
+        self.client.force_login(self.usuario)
+        request = self.client.get(reverse('usuarios:extrato')).wsgi_request
+        self.assertEqual(request.cliente, self.cliente)
+        self.assertIsNone(request.gerente)
+
+        self.client.force_login(self.gerente.usuario)
+        request = self.client.get(reverse('usuarios:dashboard_gerente')).wsgi_request
+        self.assertEqual(request.gerente, self.gerente)
+        self.assertIsNone(request.cliente)
+
+    def test_usuario_e_perfil_em_cache(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('loja:carrinho'))
+
+        # sessão, carrinho e itens (duas vezes): usuário e cliente não são consultados de novo
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('loja:carrinho'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_gravacoes_invalidam_o_cache(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('usuarios:dashboard_cliente'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            depositar(self.cliente, Decimal('50.00'))
+        response = self.client.get(reverse('usuarios:dashboard_cliente'))
+        self.assertEqual(response.context['cliente'].saldo, Decimal('150.00'))
+
+        self.usuario.first_name = 'Rita Maria'
+        self.usuario.save()
+        response = self.client.get(reverse('usuarios:dashboard_cliente'))
+        self.assertEqual(response.wsgi_request.user.first_name, 'Rita Maria')
+
+    def test_senha_e_desativacao_valem_na_proxima_requisicao(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('usuarios:dashboard_cliente'))
+
+        # A sessão antiga guarda o hash da senha anterior
+        self.usuario.set_password('outra-senha-segura')
+        self.usuario.save()
+        response = self.client.get(reverse('usuarios:dashboard_cliente'))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('usuarios:dashboard_cliente'))
+        self.usuario.is_active = False
+        self.usuario.save()
+        response = self.client.get(reverse('usuarios:dashboard_cliente'))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_sem_cache_compartilhado_nao_guarda_o_usuario(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('loja:carrinho'))
+
+        # sessão, usuário com o cliente, carrinho e itens (duas vezes)
+        with self.assertNumQueries(5):
+            self.client.get(reverse('loja:carrinho'))
+        self.assertIsNone(cache.get(f'usuarios:usuario:{self.usuario.pk}'))
+
+
+class CadastroTests(TestCase):
+    """Cadastro em etapas com o estado em cookie assinado, sem gravar sessões"""
+
+    ETAPA1 = {'first_name': 'Lia', 'last_name': 'Souza', 'email': 'lia@galaxy.com', 'telefone': '11988887777'}
+
+    def test_etapas_nao_tocam_a_sessao(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(reverse('usuarios:registro_etapa1'), self.ETAPA1)
+            self.assertRedirects(response, reverse('usuarios:registro_etapa2'), fetch_redirect_response=False)
+            response = self.client.get(reverse('usuarios:registro_etapa2'))
+            self.assertEqual(response.status_code, 200)
+            response = self.client.post(reverse('usuarios:registro_etapa2'), {'cpf': '32132132132'})
+            self.assertRedirects(response, reverse('usuarios:registro_etapa3'), fetch_redirect_response=False)
+
+        self.assertFalse([c for c in consultas.captured_queries if 'django_session' in c['sql']])
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(cadastro.ler(response.wsgi_request), {'etapa1': self.ETAPA1})
+        self.assertEqual(signing.loads(self.client.cookies[cadastro.COOKIE].value, salt=cadastro.SALT),
+                         {'etapa1': self.ETAPA1, 'etapa2': {'cpf': '32132132132'}})
+
+        response = self.client.post(reverse('usuarios:registro_etapa3'), {
+            'username': 'lia', 'password1': 'Senha-Forte-987', 'password2': 'Senha-Forte-987', 'aceitar_termos': 'on',
+        })
+        self.assertRedirects(response, reverse('usuarios:dashboard_cliente'), fetch_redirect_response=False)
+        self.assertEqual(Session.objects.count(), 1)
+        self.assertEqual(Usuario.objects.get(username='lia').cliente.cpf, '32132132132')
+
+    def test_cookie_reenviado_nao_repete_email_nem_cpf(self):
+        self.client.post(reverse('usuarios:registro_etapa1'), self.ETAPA1)
+        self.client.post(reverse('usuarios:registro_etapa2'), {'cpf': '32132132132'})
+        cookie = self.client.cookies[cadastro.COOKIE].value
+        senha = {'password1': 'Senha-Forte-987', 'password2': 'Senha-Forte-987', 'aceitar_termos': 'on'}
+        self.client.post(reverse('usuarios:registro_etapa3'), {'username': 'lia', **senha})
+        self.client.logout()
+
+        self.client.cookies[cadastro.COOKIE] = cookie
+        response = self.client.post(reverse('usuarios:registro_etapa3'), {'username': 'lia2', **senha})
+        self.assertRedirects(response, reverse('usuarios:registro_etapa1'), fetch_redirect_response=False)
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ['Este email já está cadastrado.'])
+
+        outro_email = {'etapa1': {**self.ETAPA1, 'email': 'lia2@galaxy.com'}, 'etapa2': {'cpf': '32132132132'}}
+        self.client.cookies[cadastro.COOKIE] = signing.dumps(outro_email, salt=cadastro.SALT, compress=True)
+        response = self.client.post(reverse('usuarios:registro_etapa3'), {'username': 'lia2', **senha})
+        self.assertRedirects(response, reverse('usuarios:registro_etapa2'), fetch_redirect_response=False)
+        self.assertFalse(Usuario.objects.filter(username='lia2').exists())
+        self.assertEqual(Usuario.objects.filter(email='lia@galaxy.com').count(), 1)
+
+    def test_cookie_adulterado_e_ignorado(self):
+        self.client.post(reverse('usuarios:registro_etapa1'), self.ETAPA1)
+        valor = self.client.cookies[cadastro.COOKIE].value
+        self.client.cookies[cadastro.COOKIE] = valor[:-1] + ('A' if valor[-1] != 'A' else 'B')
+
+        response = self.client.get(reverse('usuarios:registro_etapa2'))
+        self.assertRedirects(response, reverse('usuarios:registro_etapa1'), fetch_redirect_response=False)
+
+    def test_limpeza_das_sessoes_antigas(self):
+        usuario = Usuario.objects.create_user(username='logado', password=None)
+        orfa = Session.objects.save('orfa', {'registro_etapa1': self.ETAPA1}, timezone.now() + timedelta(days=1))
+        logada = Session.objects.save(
+            'logada', {'_auth_user_id': str(usuario.pk), 'registro_etapa1': self.ETAPA1}, timezone.now() + timedelta(days=1)
+        )
+        outra = Session.objects.save('outra', {'tema': 'escuro'}, timezone.now() + timedelta(days=1))
+
+        call_command('limpar_sessoes_cadastro', '--simular', stdout=io.StringIO())
+        self.assertEqual(Session.objects.count(), 3)
+
+        saida = io.StringIO()
+        call_command('limpar_sessoes_cadastro', stdout=saida)
+        self.assertIn('1 sessões de cadastros abandonados foram removidas', saida.getvalue())
+        self.assertFalse(Session.objects.filter(pk=orfa.pk).exists())
+        self.assertEqual(Session.objects.get(pk=logada.pk).get_decoded(), {'_auth_user_id': str(usuario.pk)})
+        self.assertEqual(Session.objects.get(pk=outra.pk).get_decoded(), {'tema': 'escuro'})
+
+
+class ValidacaoCadastroTests(TestCase):
+    """Filtro de Bloom de emails e CPFs e a validação do cadastro enquanto se digita"""
+
+    @classmethod
+    def setUpTestData(cls):
+        usuario = Usuario.objects.create_user(username='bia', email='Bia@Galaxy.com', password=None)
+        Cliente.objects.create(usuario=usuario, cpf='11122233344')
+
+    def setUp(self):
+        cache.clear()  # contagem de consultas por IP
+        unicidade.montar()
+
+    def validar(self, campo, valor):
+        return self.client.get(reverse('usuarios:validar_cadastro'), {'campo': campo, 'valor': valor})
+
+    def test_filtro_sem_falsos_negativos(self):
+        filtro = FiltroBloom(1000, 0.01)
+        for i in range(1000):
+            filtro.adicionar(f'cliente{i}@galaxy.com')
+        self.assertTrue(all(f'cliente{i}@galaxy.com' in filtro for i in range(1000)))
+        falsos_positivos = sum(f'outro{i}@galaxy.com' in filtro for i in range(10_000))
+        self.assertLess(falsos_positivos, 300)
+
+    def test_livre_sem_consultar_o_banco(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.validar('email', 'novo@galaxy.com').json(), {'success': True, 'disponivel': True})
+            self.assertTrue(self.validar('cpf', '555.666.777-88').json()['disponivel'])
+
+    def test_cadastrados_confirmados_no_banco(self):
+        with self.assertNumQueries(1):
+            dados = self.validar('email', 'BIA@galaxy.com').json()
+        self.assertEqual(dados, {'success': True, 'disponivel': False, 'message': 'Este email já está cadastrado.'})
+        self.assertFalse(self.validar('cpf', '111.222.333-44').json()['disponivel'])
+
+    def test_novos_cadastros_entram_no_filtro(self):
+        usuario = Usuario.objects.create_user(username='caio', email='caio@galaxy.com', password=None)
+        Cliente.objects.create(usuario=usuario, cpf='99988877766')
+        self.assertFalse(self.validar('email', 'caio@galaxy.com').json()['disponivel'])
+        self.assertFalse(self.validar('cpf', '99988877766').json()['disponivel'])
+
+    def test_formato_e_campo_invalidos(self):
+        self.assertEqual(self.validar('cpf', '123').json()['message'], 'CPF deve conter 11 dígitos.')
+        self.assertFalse(self.validar('email', 'sem-arroba').json()['disponivel'])
+        self.assertEqual(self.validar('senha', 'x').status_code, 400)
+
+    async def test_email_com_acento_igual_ao_banco(self):
+        # Criado pelo admin/createsuperuser, sem o EmailValidator do cadastro;
+        # o LOWER() do SQLite guarda 'Érica@galaxy.com' no índice
+        await Usuario.objects.acreate(username='erica', email='ÉRICA@Galaxy.com')
+        self.assertTrue(await unicidade.cadastrado('email', 'ÉRICA@galaxy.com'))
+        self.assertTrue(await unicidade.cadastrado('email', 'Érica@GALAXY.com'))
+
+    def test_email_com_acento(self):
+        Usuario.objects.create_user(username='erica', email='erica@GÁLAXY.com', password=None)
+
+        self.assertFalse(self.validar('email', 'Erica@GÁlaxy.com').json()['disponivel'])
+        response = self.client.post(reverse('usuarios:registro_etapa1'), {
+            'first_name': 'Érica', 'last_name': 'Reis', 'email': 'ERICA@GÁLAXY.COM', 'telefone': '11988887777',
+        })
+        self.assertContains(response, 'Este email já está cadastrado.')
+
+    @override_settings(VALIDACAO_CADASTRO_LIMITE=3)
+    def test_limite_de_consultas_por_ip(self):
+        for i in range(3):
+            self.assertEqual(self.validar('email', f'novo{i}@galaxy.com').status_code, 200)
+        response = self.validar('cpf', '555.666.777-88')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertFalse(response.json()['success'])
+
+        # Outro IP tem a própria contagem
+        response = self.client.get(
+            reverse('usuarios:validar_cadastro'), {'campo': 'email', 'valor': 'novo@galaxy.com'}, REMOTE_ADDR='10.0.0.2'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_formulario_confere_email_sem_diferenciar_maiusculas(self):
+        response = self.client.post(reverse('usuarios:registro_etapa1'), {
+            'first_name': 'Bia', 'last_name': 'Reis', 'email': 'bia@galaxy.com', 'telefone': '11988887777',
+        })
+        self.assertContains(response, 'Este email já está cadastrado.')
+
+
+class DadosSinteticosTests(TestCase):
+    """Gerador de dados sintéticos para testes de carga"""
+
+    def gerar(self, **opcoes):
+        call_command('gerar_dados_sinteticos', clientes=12, dias=120, lote=5, stdout=io.StringIO(), **opcoes)
+
+    def test_saldos_e_resumo_batem_com_as_movimentacoes(self):
+        self.gerar()
+
+        self.assertEqual(Cliente.objects.filter(usuario__username__startswith='sintetico').count(), 12)
+        self.assertEqual(divergencias(), [])
+        for cliente in Cliente.objects.all():
+            entradas = sum(m.valor for m in movimentos_do_cliente(cliente) if not m.eh_saida)
+            saidas = sum(m.valor for m in movimentos_do_cliente(cliente) if m.eh_saida)
+            self.assertEqual(cliente.saldo, entradas - saidas)
+        for fatura in Fatura.objects.prefetch_related('itens'):
+            self.assertEqual(fatura.valor_total, sum(item.valor_parcela for item in fatura.itens.all()))
+        self.assertEqual(len({u.password for u in Usuario.objects.all()}), 1)
+
+    def test_mesma_seed_gera_o_mesmo_historico(self):
+        self.gerar(seed=7)
+        self.gerar(seed=7)
+
+        def historico(usuarios):
+            return sorted(
+                (m.tipo, m.valor, m.data_transacao)
+                for m in movimentos().filter(cliente__usuario__username__in=usuarios)
+            )
+        primeira = [f'sintetico{i}' for i in range(12)]
+        segunda = [f'sintetico{i}' for i in range(12, 24)]
+        self.assertTrue(historico(primeira))
+        self.assertEqual(historico(primeira), historico(segunda))
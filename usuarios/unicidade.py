@@ -0,0 +1,122 @@
+"""
+Email e CPF já cadastrados, para a validação do cadastro enquanto o visitante
+digita (view validar_cadastro).
+
+Cada processo mantém um filtro de Bloom por campo, montado na primeira
+consulta e remontado a cada UNICIDADE_FILTRO_TTL segundos; os signals de
+Usuario e Cliente acrescentam os valores gravados pelo próprio processo. Um
+valor fora do filtro está livre com certeza e a resposta sai sem consultar o
+banco; só um possível acerto (cadastrado ou falso positivo) vai ao banco, por
+uma consulta indexada.
+
+Valores gravados por outros processos só entram no filtro na remontagem, então
+a resposta é um aviso antecipado: a validação dos formulários, no envio de
+cada etapa, continua consultando o banco.
+"""
+
+import re
+import string
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Value
+from django.db.models.functions import Lower
+
+from .bloom import FiltroBloom
+from .models import Usuario, Cliente
+
+CAMPOS = ('email', 'cpf')
+
+# Folga para os cadastros feitos entre uma remontagem e outra
+CAPACIDADE_MINIMA = 10_000
+TAXA_ERRO = 0.01
+
+# O LOWER() do SQLite só converte A-Z: além do domínio em minúsculas (como o
+# cadastro grava, ver normalize_email), o email é normalizado do mesmo jeito,
+# para que o filtro e o banco concordem sobre emails acentuados
+_MINUSCULAS_ASCII = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+_filtros = {}
+_montado_em = None
+_pendentes = None  # valores gravados durante uma remontagem
+_trava = threading.Lock()
+_trava_montagem = threading.Lock()
+
+
+def ttl():
+    return getattr(settings, 'UNICIDADE_FILTRO_TTL', 60 * 10)
+
+
+def normalizar(campo, valor):
+    """Email sem diferenciar maiúsculas (como no login); CPF só com os dígitos"""
+    if campo == 'email':
+        return Usuario.objects.normalize_email(valor.strip()).translate(_MINUSCULAS_ASCII)
+    return re.sub(r'\D', '', valor)
+
+
+def consulta(campo, valor):
+    """Cadastros com o valor (já normalizado), pelos índices de email (LOWER) e CPF"""
+    if campo == 'email':
+        return Usuario.objects.alias(email_lower=Lower('email')).filter(email_lower=Lower(Value(valor)))
+    return Cliente.objects.filter(cpf=valor)
+
+
+def _valores(campo):
+    if campo == 'email':
+        return Usuario.objects.exclude(email='').values_list('email', flat=True)
+    return Cliente.objects.values_list('cpf', flat=True)
+
+
+def montar():
+    """Remonta os filtros a partir do banco"""
+    global _montado_em, _pendentes
+    with _trava:
+        _pendentes = []
+    filtros = {}
+    for campo in CAMPOS:
+        valores = [normalizar(campo, valor) for valor in _valores(campo).iterator(chunk_size=5000)]
+        filtro = FiltroBloom(max(len(valores) * 2, CAPACIDADE_MINIMA), TAXA_ERRO)
+        for valor in valores:
+            filtro.adicionar(valor)
+        filtros[campo] = filtro
+    with _trava:
+        for campo, valor in _pendentes:
+            filtros[campo].adicionar(valor)
+        _pendentes = None
+        _filtros.update(filtros)
+        _montado_em = time.monotonic()
+
+
+def desatualizado():
+    return _montado_em is None or time.monotonic() - _montado_em > ttl()
+
+
+def garantir_filtros():
+    # Uma remontagem por vez; quem chega durante ela espera e reaproveita
+    with _trava_montagem:
+        if desatualizado():
+            montar()
+
+
+def registrar(campo, valor):
+    """Acrescenta um valor gravado (signals de Usuario e Cliente)"""
+    if not valor:
+        return
+    valor = normalizar(campo, valor)
+    with _trava:
+        if _pendentes is not None:
+            _pendentes.append((campo, valor))
+        if campo in _filtros:
+            _filtros[campo].adicionar(valor)
+
+
+async def cadastrado(campo, valor):
+    """Se o valor já está cadastrado; só consulta o banco em um possível acerto"""
+    if desatualizado():
+        await sync_to_async(garantir_filtros)()
+    valor = normalizar(campo, valor)
+    if valor not in _filtros[campo]:
+        return False
+    return await consulta(campo, valor).aexists()
@@ -8,6 +8,7 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('dashboard/cliente/', views.dashboard_cliente, name='dashboard_cliente'),
     path('dashboard/gerente/', views.dashboard_gerente, name='dashboard_gerente'),
+    path('gerente/saldos/', views.relatorio_saldos, name='relatorio_saldos'),
     
     # URLs de registro
     path('registro/', views.registro_etapa1, name='registro'),
@@ -15,6 +16,7 @@ urlpatterns = [
     path('registro/etapa2/', views.registro_etapa2, name='registro_etapa2'),
     path('registro/etapa3/', views.registro_etapa3, name='registro_etapa3'),
     path('registro/cancelar/', views.registro_cancelar, name='registro_cancelar'),
+    path('registro/validar/', views.validar_cadastro, name='validar_cadastro'),
     
     # URLs de perfil
     path('perfil/', views.perfil_view, name='perfil'),
@@ -22,8 +24,19 @@ urlpatterns = [
     
     # URLs de transações
     path('transferencia/', views.transferencia, name='transferencia'),
+    path('transferencia/lote/', views.transferencia_lote, name='transferencia_lote'),
     path('deposito/', views.deposito, name='deposito'),
     path('extrato/', views.extrato, name='extrato'),
+    path('extrato/pagina/', views.extrato_pagina, name='extrato_pagina'),
+    path('extrato/exportar/', views.exportar_extrato, name='exportar_extrato'),
+    
+    # Séries para gráficos (JSON)
+    path('graficos/saldo/', views.grafico_saldo, name='grafico_saldo'),
+    path('graficos/entradas-saidas/', views.grafico_entradas_saidas, name='grafico_entradas_saidas'),
+    path('graficos/gastos-categoria/', views.grafico_gastos_categoria, name='grafico_gastos_categoria'),
+    
+    # Eventos em tempo real (SSE, requer servidor ASGI)
+    path('eventos/', views.eventos_cliente, name='eventos_cliente'),
     
     path('', views.home_redirect, name='home_redirect'),
 ]
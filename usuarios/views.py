@@ -1,32 +1,55 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login, logout, get_user_model
+from django.contrib.auth import aauthenticate, alogin, logout, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_protect
-from django.http import HttpResponse, JsonResponse
-from django.views.decorators.http import require_POST
-from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_GET, require_POST, condition
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, transaction
+from asgiref.sync import sync_to_async
+from django.utils.cache import patch_cache_control
+from django.utils import timezone
 from decimal import Decimal
-from datetime import date, datetime, timedelta
-from .models import Cliente, Gerente, Transacao
-from .forms import RegistroUsuarioForm, RegistroClienteForm, RegistroSenhaForm
+from datetime import datetime, timedelta
+import time
+from .models import Cliente, Gerente
+from .forms import RegistroUsuarioForm, RegistroClienteForm, RegistroSenhaForm, digitos_cpf
+from .services import transferir, transferir_lote, ler_lote, depositar, TransferenciaError
+from .saldos import inicio_do_dia, saldos_apos, relatorio_saldos as montar_relatorio_saldos
+from .resumos import totais_periodo
+from .kpis import kpis_gerente
+from .paginacao import pagina_por_cursor
+from .exportacao import FORMATOS, em_async
+from .idempotencia import idempotente
+from .middleware import cliente_da_requisicao, gerente_da_requisicao
+from .senhas import gerar_hash
+from .livro_contabil import movimentos_do_cliente, ultimos_movimentos
+from .cache_dashboard import versao_dashboard, dados_dashboard, ttl as cache_dashboard_ttl
+from . import series, eventos, cadastro, unicidade
 
 User = get_user_model()
 
 @csrf_protect
-def login_view(request):
+async def login_view(request):
     """View para login do usuário"""
-    if request.user.is_authenticated:
-        return redirect_user_by_type(request.user)
+    usuario = await request.auser()
+    if usuario.is_authenticated:
+        return redirect_user_by_type(usuario)
     
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
         
         if username and password:
-            user = authenticate(request, username=username, password=password)
+            # O hash da senha roda no pool de usuarios.senhas (ver backends)
+            user = await aauthenticate(request, username=username, password=password)
             if user is not None:
-                login(request, user)
+                await alogin(request, user)
                 messages.success(request, f'Bem-vindo(a), {user.first_name}!')
                 return redirect_user_by_type(user)
             else:
@@ -55,24 +78,29 @@ def redirect_user_by_type(user):
 def dashboard_cliente(request):
     """Dashboard do cliente"""
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
-        
-        # Buscar últimas transações
-        ultimas_transacoes = cliente.transacoes_origem.order_by('-data_transacao')[:5]
+        cliente = cliente_da_requisicao(request)
         
-        # Estatísticas do mês atual
-        inicio_mes = date.today().replace(day=1)
-        transacoes_mes = cliente.transacoes_origem.filter(data_transacao__gte=inicio_mes)
+        # Últimas transações e totais do mês ficam em cache até a próxima
+        # transação do cliente
+        versao = versao_dashboard(cliente.pk)
         
-        total_gastos_mes = sum(t.valor for t in transacoes_mes if t.tipo in ['compra', 'transferencia_enviada']) or Decimal('0.00')
-        total_recebido_mes = sum(t.valor for t in transacoes_mes if t.tipo in ['deposito', 'transferencia_recebida']) or Decimal('0.00')
+        def calcular():
+            totais_mes = totais_periodo(cliente, timezone.localdate().replace(day=1))
+            return {
+                'ultimas_transacoes': list(ultimos_movimentos(cliente)),
+                'total_gastos_mes': totais_mes['total_saida'],
+                'total_recebido_mes': totais_mes['total_entrada'],
+            }
         
         context = {
             'cliente': cliente,
             'usuario': request.user,
-            'ultimas_transacoes': ultimas_transacoes,
-            'total_gastos_mes': total_gastos_mes,
-            'total_recebido_mes': total_recebido_mes,
+            **dados_dashboard(cliente, versao, calcular),
+            'versao_dashboard': versao,
+            'cache_ttl': cache_dashboard_ttl(),
+            'inicio_grafico': timezone.localdate() - timedelta(days=6),
+            # Sob WSGI não há stream de eventos (ver eventos_cliente)
+            'eventos_tempo_real': isinstance(request, ASGIRequest),
         }
         return render(request, 'usuarios/dashboard_cliente.html', context)
     except Cliente.DoesNotExist:
@@ -83,33 +111,54 @@ def dashboard_cliente(request):
 def dashboard_gerente(request):
     """Dashboard do gerente"""
     try:
-        gerente = Gerente.objects.get(usuario=request.user)
-        
-        # Estatísticas dinâmicas
-        total_clientes = Cliente.objects.count()
-        total_credito_aprovado = sum(c.limite_credito for c in Cliente.objects.filter(limite_credito_aprovado=True))
+        gerente = gerente_da_requisicao(request)
         
-        # Crescimento mensal
-        inicio_mes = date.today().replace(day=1)
-        novos_clientes_mes = Cliente.objects.filter(usuario__date_joined__gte=inicio_mes).count()
-        
-        # Solicitações pendentes de crédito
-        from credito.models import SolicitacaoCredito
-        solicitacoes_pendentes = SolicitacaoCredito.objects.filter(status='pendente').count()
+        # Indicadores e tendência mensal (uma consulta agregada, em cache)
+        kpis = kpis_gerente()
         
         context = {
             'gerente': gerente,
             'usuario': request.user,
-            'total_clientes': total_clientes,
-            'total_credito_aprovado': total_credito_aprovado,
-            'novos_clientes_mes': novos_clientes_mes,
-            'solicitacoes_pendentes': solicitacoes_pendentes,
+            'total_clientes': kpis['total_clientes'],
+            'total_credito_aprovado': kpis['total_credito_aprovado'],
+            'novos_clientes_mes': kpis['novos_clientes_mes'],
+            'solicitacoes_pendentes': kpis['solicitacoes_pendentes'],
+            'tendencia_mensal': kpis['tendencia_mensal'],
+            'kpis_atualizados_em': kpis['atualizado_em'],
         }
         return render(request, 'usuarios/dashboard_gerente.html', context)
     except Gerente.DoesNotExist:
         messages.error(request, 'Perfil de gerente não encontrado.')
         return redirect('usuarios:login')
 
+@login_required
+def relatorio_saldos(request):
+    """Saldos dos clientes no fim de um dia, a partir dos checkpoints"""
+    if request.user.tipo_usuario != 'gerente':
+        messages.error(request, 'Apenas gerentes podem ver o relatório de saldos.')
+        return redirect('usuarios:home_redirect')
+    
+    try:
+        gerente = gerente_da_requisicao(request)
+    except Gerente.DoesNotExist:
+        messages.error(request, 'Perfil de gerente não encontrado.')
+        return redirect('usuarios:home_redirect')
+    
+    hoje = timezone.localdate()
+    try:
+        dia = datetime.strptime(request.GET['dia'], '%Y-%m-%d').date() if request.GET.get('dia') else hoje - timedelta(days=1)
+    except ValueError:
+        messages.error(request, 'Data inválida. Use o formato AAAA-MM-DD.')
+        dia = hoje - timedelta(days=1)
+    dia = min(dia, hoje)
+    
+    context = {
+        'gerente': gerente,
+        'dia': dia,
+        'relatorio': montar_relatorio_saldos(dia),
+    }
+    return render(request, 'usuarios/relatorio_saldos.html', context)
+
 def home_redirect(request):
     """Redireciona para o dashboard apropriado ou login"""
     if request.user.is_authenticated:
@@ -124,12 +173,13 @@ def registro_etapa1(request):
     if request.method == 'POST':
         form = RegistroUsuarioForm(request.POST)
         if form.is_valid():
-            # Salvar dados na sessão
-            request.session['registro_etapa1'] = form.cleaned_data
-            return redirect('usuarios:registro_etapa2')
+            # Salvar dados no cookie do cadastro (ver usuarios.cadastro)
+            dados = cadastro.ler(request)
+            dados['etapa1'] = form.cleaned_data
+            return cadastro.gravar(redirect('usuarios:registro_etapa2'), dados)
     else:
-        # Preencher com dados da sessão se existirem
-        initial_data = request.session.get('registro_etapa1', {})
+        # Preencher com dados do cookie se existirem
+        initial_data = cadastro.ler(request).get('etapa1', {})
         form = RegistroUsuarioForm(initial=initial_data)
     
     context = {
@@ -145,19 +195,20 @@ def registro_etapa1(request):
 def registro_etapa2(request):
     """Segunda etapa do registro: dados específicos do cliente"""
     # Verificar se etapa 1 foi concluída
-    if 'registro_etapa1' not in request.session:
+    dados = cadastro.ler(request)
+    if 'etapa1' not in dados:
         messages.warning(request, 'Complete a primeira etapa do cadastro.')
         return redirect('usuarios:registro_etapa1')
     
     if request.method == 'POST':
         form = RegistroClienteForm(request.POST)
         if form.is_valid():
-            # Salvar dados na sessão
-            request.session['registro_etapa2'] = form.cleaned_data
-            return redirect('usuarios:registro_etapa3')
+            # Salvar dados no cookie do cadastro
+            dados['etapa2'] = form.cleaned_data
+            return cadastro.gravar(redirect('usuarios:registro_etapa3'), dados)
     else:
-        # Preencher com dados da sessão se existirem
-        initial_data = request.session.get('registro_etapa2', {})
+        # Preencher com dados do cookie se existirem
+        initial_data = dados.get('etapa2', {})
         form = RegistroClienteForm(initial=initial_data)
     
     context = {
@@ -169,59 +220,77 @@ def registro_etapa2(request):
     }
     return render(request, 'usuarios/registro_etapa2.html', context)
 
+MENSAGENS_CADASTRADO = {
+    'email': 'Este email já está cadastrado.',
+    'cpf': 'Este CPF já está cadastrado.',
+}
+ETAPA_DO_CAMPO = {'email': 'usuarios:registro_etapa1', 'cpf': 'usuarios:registro_etapa2'}
+
+def _criar_conta(dados_etapa1, dados_etapa2, username, hash_senha):
+    """
+    Cria o usuário (com a senha já em hash) e o perfil de cliente.
+
+    Email e CPF foram conferidos nas etapas 1 e 2, mas o cookie pode ser
+    reenviado depois de outro cadastro com os mesmos dados: a conferência se
+    repete dentro da transação (que já tem a trava de escrita) e levanta
+    ValidationError com o campo repetido no code.
+    """
+    with transaction.atomic():
+        for campo, valor in [('email', dados_etapa1['email']), ('cpf', dados_etapa2['cpf'])]:
+            if unicidade.consulta(campo, unicidade.normalizar(campo, valor)).exists():
+                raise ValidationError(MENSAGENS_CADASTRADO[campo], code=campo)
+        user = User.objects.create(
+            username=User.normalize_username(username),
+            email=User.objects.normalize_email(dados_etapa1['email']),
+            password=hash_senha,
+            first_name=dados_etapa1['first_name'],
+            last_name=dados_etapa1['last_name'],
+            telefone=dados_etapa1['telefone'],
+            tipo_usuario='cliente'
+        )
+        
+        # Criar perfil de cliente
+        Cliente.objects.create(
+            usuario=user,
+            cpf=dados_etapa2['cpf'],
+            score_pontos=100  # Pontos iniciais
+        )
+    return user
+
 @csrf_protect
-def registro_etapa3(request):
+async def registro_etapa3(request):
     """Terceira etapa do registro: criação de username e senha"""
     # Verificar se etapas anteriores foram concluídas
-    if 'registro_etapa1' not in request.session or 'registro_etapa2' not in request.session:
+    dados = cadastro.ler(request)
+    if 'etapa1' not in dados or 'etapa2' not in dados:
         messages.warning(request, 'Complete as etapas anteriores do cadastro.')
         return redirect('usuarios:registro_etapa1')
     
     if request.method == 'POST':
         form = RegistroSenhaForm(request.POST)
-        if form.is_valid():
+        if await sync_to_async(form.is_valid)():
             try:
-                # Recuperar dados das sessões
-                dados_etapa1 = request.session['registro_etapa1']
-                dados_etapa2 = request.session['registro_etapa2']
+                # Recuperar dados do cookie do cadastro
+                dados_etapa1 = dados['etapa1']
+                dados_etapa2 = dados['etapa2']
                 dados_etapa3 = form.cleaned_data
                 
-                # Criar usuário
-                user = User.objects.create_user(
-                    username=dados_etapa3['username'],
-                    email=dados_etapa1['email'],
-                    password=dados_etapa3['password1'],
-                    first_name=dados_etapa1['first_name'],
-                    last_name=dados_etapa1['last_name'],
-                    telefone=dados_etapa1['telefone'],
-                    tipo_usuario='cliente'
+                # Criar usuário: o hash da senha roda no pool de usuarios.senhas
+                # e é feito uma vez só (o login abaixo não autentica de novo)
+                hash_senha = await gerar_hash(dados_etapa3['password1'])
+                user = await sync_to_async(_criar_conta)(
+                    dados_etapa1, dados_etapa2, dados_etapa3['username'], hash_senha
                 )
                 
-                # Criar perfil de cliente
-                Cliente.objects.create(
-                    usuario=user,
-                    cpf=dados_etapa2['cpf'],
-                    score_pontos=100  # Pontos iniciais
-                )
-                
-                # Limpar sessão
-                del request.session['registro_etapa1']
-                del request.session['registro_etapa2']
-                
-                # Fazer login automático
-                user = authenticate(
-                    request, 
-                    username=dados_etapa3['username'], 
-                    password=dados_etapa3['password1']
-                )
-                if user:
-                    login(request, user)
-                    messages.success(request, f'Bem-vindo ao Galaxy Bank, {user.first_name}! Sua conta foi criada com sucesso.')
-                    return redirect('usuarios:dashboard_cliente')
-                else:
-                    messages.success(request, 'Conta criada com sucesso! Faça login para acessar sua conta.')
-                    return redirect('usuarios:login')
+                # Fazer login automático (a sessão nasce aqui) e apagar o cookie
+                await alogin(request, user, backend='usuarios.backends.EmailOrUsernameModelBackend')
+                messages.success(request, f'Bem-vindo ao Galaxy Bank, {user.first_name}! Sua conta foi criada com sucesso.')
+                return cadastro.apagar(redirect('usuarios:dashboard_cliente'))
                     
+            except ValidationError as e:
+                # Email ou CPF cadastrados depois da etapa em que foram conferidos
+                messages.error(request, e.messages[0])
+                return redirect(ETAPA_DO_CAMPO[e.code])
             except Exception as e:
                 messages.error(request, f'Erro ao criar conta: {str(e)}')
     else:
@@ -236,16 +305,52 @@ def registro_etapa3(request):
     }
     return render(request, 'usuarios/registro_etapa3.html', context)
 
+async def _excedeu_limite_validacao(request):
+    """
+    Conta as consultas do IP na janela atual, no cache compartilhado (ver
+    CACHES em settings), e diz se passaram de VALIDACAO_CADASTRO_LIMITE
+    """
+    janela = settings.VALIDACAO_CADASTRO_JANELA
+    chave = f"usuarios:validar_cadastro:{request.META.get('REMOTE_ADDR', '')}:{int(time.time()) // janela}"
+    await cache.aadd(chave, 0, janela)
+    try:
+        consultas = await cache.aincr(chave)
+    except ValueError:  # expirou entre o add e o incr
+        return False
+    return consultas > settings.VALIDACAO_CADASTRO_LIMITE
+
+@require_GET
+async def validar_cadastro(request):
+    """Valida email ou CPF enquanto o visitante preenche o cadastro (JSON)"""
+    if await _excedeu_limite_validacao(request):
+        response = JsonResponse(
+            {'success': False, 'message': 'Muitas consultas. Tente novamente em instantes.'}, status=429
+        )
+        response['Retry-After'] = str(settings.VALIDACAO_CADASTRO_JANELA)
+        return response
+    campo = request.GET.get('campo')
+    valor = request.GET.get('valor', '')
+    if campo not in unicidade.CAMPOS:
+        return JsonResponse({'success': False, 'message': 'Campo inválido.'}, status=400)
+    
+    try:
+        if campo == 'cpf':
+            digitos_cpf(valor)
+        else:
+            RegistroUsuarioForm.base_fields['email'].clean(valor)
+    except ValidationError as e:
+        return JsonResponse({'success': True, 'disponivel': False, 'message': e.messages[0]})
+    
+    # Livre com certeza sem ir ao banco na maioria dos casos (ver usuarios.unicidade)
+    if await unicidade.cadastrado(campo, valor):
+        return JsonResponse({'success': True, 'disponivel': False, 'message': MENSAGENS_CADASTRADO[campo]})
+    return JsonResponse({'success': True, 'disponivel': True})
+
 def registro_cancelar(request):
     """Cancelar registro e limpar sessão"""
-    # Limpar dados do registro da sessão
-    keys_to_remove = ['registro_etapa1', 'registro_etapa2', 'registro_etapa3']
-    for key in keys_to_remove:
-        if key in request.session:
-            del request.session[key]
-    
+    # Apagar o cookie com os dados do cadastro
     messages.info(request, 'Cadastro cancelado.')
-    return redirect('usuarios:login')
+    return cadastro.apagar(redirect('usuarios:login'))
 
 # ===== VIEWS DE PERFIL =====
 
@@ -254,14 +359,14 @@ def perfil_view(request):
     """View para exibir o perfil do usuário"""
     try:
         if request.user.tipo_usuario == 'cliente':
-            cliente = Cliente.objects.get(usuario=request.user)
+            cliente = cliente_da_requisicao(request)
             context = {
                 'usuario': request.user,
                 'perfil_especifico': cliente,
                 'tipo_usuario': 'cliente',
             }
         elif request.user.tipo_usuario == 'gerente':
-            gerente = Gerente.objects.get(usuario=request.user)
+            gerente = gerente_da_requisicao(request)
             context = {
                 'usuario': request.user,
                 'perfil_especifico': gerente,
@@ -282,6 +387,8 @@ def perfil_editar(request):
     """View para editar o perfil do usuário"""
     from .forms import PerfilUsuarioForm, PerfilClienteForm, PerfilGerenteForm
     
+    # Perfis lidos do banco, e não de request.cliente/request.gerente: o form
+    # regrava o registro inteiro, inclusive o saldo
     try:
         if request.user.tipo_usuario == 'cliente':
             cliente = Cliente.objects.get(usuario=request.user)
@@ -325,6 +432,7 @@ def perfil_editar(request):
 
 @login_required
 @csrf_protect
+@idempotente
 def transferencia(request):
     """View para realizar transferências entre contas"""
     if request.user.tipo_usuario != 'cliente':
@@ -332,7 +440,7 @@ def transferencia(request):
         return redirect('usuarios:dashboard_cliente')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
     except Cliente.DoesNotExist:
         messages.error(request, 'Perfil de cliente não encontrado.')
         return redirect('usuarios:login')
@@ -354,45 +462,18 @@ def transferencia(request):
             messages.error(request, 'Valor inválido. Use formato: 123.45')
             return render(request, 'usuarios/transferencia.html', {'cliente': cliente})
         
-        if valor > cliente.saldo:
-            messages.error(request, 'Saldo insuficiente para realizar a transferência.')
-            return render(request, 'usuarios/transferencia.html', {'cliente': cliente})
-        
         try:
-            destinatario = Cliente.objects.get(cpf=destinatario_cpf)
-            if destinatario == cliente:
-                messages.error(request, 'Não é possível transferir para sua própria conta.')
-                return render(request, 'usuarios/transferencia.html', {'cliente': cliente})
+            destinatario = Cliente.objects.select_related('usuario').get(cpf=destinatario_cpf)
         except Cliente.DoesNotExist:
             messages.error(request, 'Destinatário não encontrado. Verifique o CPF.')
             return render(request, 'usuarios/transferencia.html', {'cliente': cliente})
         
         # Realizar transferência
-        with transaction.atomic():
-            # Debitar do remetente
-            cliente.saldo -= valor
-            cliente.save()
-            
-            # Creditar ao destinatário
-            destinatario.saldo += valor
-            destinatario.save()
-            
-            # Registrar transações
-            Transacao.objects.create(
-                cliente=cliente,
-                tipo='transferencia_enviada',
-                valor=valor,
-                descricao=f'Transferência para {destinatario.usuario.first_name} ({destinatario.cpf}) - {descricao}' if descricao else f'Transferência para {destinatario.usuario.first_name} ({destinatario.cpf})',
-                destinatario=destinatario
-            )
-            
-            Transacao.objects.create(
-                cliente=destinatario,
-                tipo='transferencia_recebida',
-                valor=valor,
-                descricao=f'Transferência de {cliente.usuario.first_name} ({cliente.cpf}) - {descricao}' if descricao else f'Transferência de {cliente.usuario.first_name} ({cliente.cpf})',
-                origem=cliente
-            )
+        try:
+            transferir(cliente, destinatario, valor, descricao)
+        except TransferenciaError as e:
+            messages.error(request, str(e))
+            return render(request, 'usuarios/transferencia.html', {'cliente': cliente})
         
         messages.success(request, f'Transferência de R$ {valor:.2f} realizada com sucesso para {destinatario.usuario.first_name}!')
         return redirect('usuarios:dashboard_cliente')
@@ -402,8 +483,48 @@ def transferencia(request):
     }
     return render(request, 'usuarios/transferencia.html', context)
 
+FORMATOS_LOTE = {'text/csv': 'csv', 'application/json': 'json'}  # corpo da requisição
+
+@login_required
+@require_POST
+@idempotente
+def transferencia_lote(request):
+    """API de transferências em lote (folha de pagamento) via CSV ou JSON"""
+    if request.user.tipo_usuario != 'cliente':
+        return JsonResponse({'success': False, 'message': 'Apenas clientes podem realizar transferências.'}, status=403)
+    
+    try:
+        cliente = cliente_da_requisicao(request)
+    except Cliente.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Perfil de cliente não encontrado.'}, status=404)
+    
+    # Aceita upload de arquivo (campo "arquivo") ou o corpo da requisição em
+    # CSV/JSON; o corpo de um formulário já foi lido pelo Django (request.POST)
+    arquivo = request.FILES.get('arquivo')
+    if arquivo:
+        conteudo = arquivo.read()
+        formato = request.POST.get('formato') or arquivo.name.rsplit('.', 1)[-1].lower()
+    elif request.content_type in FORMATOS_LOTE:
+        conteudo = request.body
+        formato = FORMATOS_LOTE[request.content_type]
+    elif request.content_type in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        return JsonResponse({'success': False, 'message': 'Arquivo obrigatório (campo "arquivo").'}, status=400)
+    else:
+        return JsonResponse(
+            {'success': False, 'message': 'Envie o lote como arquivo, text/csv ou application/json.'}, status=415
+        )
+    
+    try:
+        linhas = ler_lote(conteudo, formato)
+        resultado = transferir_lote(cliente, linhas)
+    except (TransferenciaError, UnicodeDecodeError) as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    return JsonResponse({'success': True, **resultado})
+
 @login_required
 @csrf_protect
+@idempotente
 def deposito(request):
     """View para realizar depósitos na conta"""
     if request.user.tipo_usuario != 'cliente':
@@ -411,7 +532,7 @@ def deposito(request):
         return redirect('usuarios:dashboard_cliente')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
     except Cliente.DoesNotExist:
         messages.error(request, 'Perfil de cliente não encontrado.')
         return redirect('usuarios:login')
@@ -436,17 +557,7 @@ def deposito(request):
             return render(request, 'usuarios/deposito.html', {'cliente': cliente})
         
         # Realizar depósito
-        with transaction.atomic():
-            cliente.saldo += valor
-            cliente.save()
-            
-            # Registrar transação
-            Transacao.objects.create(
-                cliente=cliente,
-                tipo='deposito',
-                valor=valor,
-                descricao=f'Depósito - {descricao}' if descricao else 'Depósito'
-            )
+        depositar(cliente, valor, descricao)
         
         messages.success(request, f'Depósito de R$ {valor:.2f} realizado com sucesso!')
         return redirect('usuarios:dashboard_cliente')
@@ -456,6 +567,29 @@ def deposito(request):
     }
     return render(request, 'usuarios/deposito.html', context)
 
+def data_inicial_extrato(periodo):
+    """Primeiro dia do período escolhido no filtro do extrato"""
+    hoje = timezone.localdate()
+    if periodo == '7':
+        return hoje - timedelta(days=7)
+    elif periodo == '30':
+        return hoje - timedelta(days=30)
+    elif periodo == '90':
+        return hoje - timedelta(days=90)
+    else:
+        return hoje - timedelta(days=30)
+
+def transacoes_extrato(cliente, periodo, tipo_filtro):
+    """Transações do extrato filtradas por período e tipo"""
+    data_inicial = data_inicial_extrato(periodo)
+    
+    transacoes = movimentos_do_cliente(cliente).filter(data_transacao__gte=inicio_do_dia(data_inicial))
+    
+    if tipo_filtro != 'todas':
+        transacoes = transacoes.filter(tipo=tipo_filtro)
+    
+    return transacoes
+
 @login_required
 def extrato(request):
     """View para visualizar o extrato de transações"""
@@ -464,7 +598,7 @@ def extrato(request):
         return redirect('usuarios:dashboard_cliente')
     
     try:
-        cliente = Cliente.objects.get(usuario=request.user)
+        cliente = cliente_da_requisicao(request)
     except Cliente.DoesNotExist:
         messages.error(request, 'Perfil de cliente não encontrado.')
         return redirect('usuarios:login')
@@ -473,35 +607,254 @@ def extrato(request):
     periodo = request.GET.get('periodo', '30')  # últimos 30 dias por padrão
     tipo_filtro = request.GET.get('tipo', 'todas')
     
-    # Calcular data inicial
-    if periodo == '7':
-        data_inicial = date.today() - timedelta(days=7)
-    elif periodo == '30':
-        data_inicial = date.today() - timedelta(days=30)
-    elif periodo == '90':
-        data_inicial = date.today() - timedelta(days=90)
-    else:
-        data_inicial = date.today() - timedelta(days=30)
-    
-    # Buscar transações
-    transacoes = cliente.transacoes_origem.filter(data_transacao__gte=data_inicial)
-    
-    if tipo_filtro != 'todas':
-        transacoes = transacoes.filter(tipo=tipo_filtro)
+    transacoes = transacoes_extrato(cliente, periodo, tipo_filtro)
     
-    transacoes = transacoes.order_by('-data_transacao')
+    # Estatísticas do período, a partir do resumo diário
+    totais = totais_periodo(
+        cliente,
+        data_inicial_extrato(periodo),
+        tipo=None if tipo_filtro == 'todas' else tipo_filtro,
+    )
+    total_entrada = totais['total_entrada']
+    total_saida = totais['total_saida']
     
-    # Estatísticas do período
-    total_entrada = sum(t.valor for t in transacoes if t.tipo in ['deposito', 'transferencia_recebida'])
-    total_saida = sum(t.valor for t in transacoes if t.tipo in ['transferencia_enviada', 'compra'])
+    # Apenas a primeira página; as demais chegam por rolagem infinita
+    primeira_pagina, proximo_cursor = pagina_por_cursor(transacoes)
+    mostrar_saldo = _anotar_saldos(cliente, primeira_pagina, tipo_filtro)
     
     context = {
         'cliente': cliente,
-        'transacoes': transacoes,
+        'transacoes': primeira_pagina,
+        'proximo_cursor': proximo_cursor,
         'periodo_selecionado': periodo,
         'tipo_selecionado': tipo_filtro,
         'total_entrada': total_entrada,
         'total_saida': total_saida,
         'saldo_periodo': total_entrada - total_saida,
+        'quantidade_transacoes': totais['quantidade'],
+        'data_inicial': data_inicial_extrato(periodo),
+        'mostrar_saldo': mostrar_saldo,
     }
     return render(request, 'usuarios/extrato.html', context)
+
+def _anotar_saldos(cliente, itens, tipo_filtro):
+    """
+    Preenche `saldo_apos` em cada item da página. Só faz sentido sem filtro
+    de tipo, quando os itens são movimentações consecutivas da conta.
+    """
+    if tipo_filtro != 'todas':
+        return False
+    for item, saldo in zip(itens, saldos_apos(cliente, itens)):
+        item.saldo_apos = saldo
+    return True
+
+@login_required
+def extrato_pagina(request):
+    """Próxima página do extrato (JSON) para a rolagem infinita"""
+    if request.user.tipo_usuario != 'cliente':
+        return JsonResponse({'success': False, 'message': 'Apenas clientes podem visualizar o extrato.'}, status=403)
+    
+    try:
+        cliente = cliente_da_requisicao(request)
+    except Cliente.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Perfil de cliente não encontrado.'}, status=404)
+    
+    tipo_filtro = request.GET.get('tipo', 'todas')
+    transacoes = transacoes_extrato(cliente, request.GET.get('periodo', '30'), tipo_filtro)
+    
+    try:
+        itens, proximo_cursor = pagina_por_cursor(transacoes, request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Cursor inválido.'}, status=400)
+    
+    mostrar_saldo = _anotar_saldos(cliente, itens, tipo_filtro)
+    html = ''.join(
+        render_to_string('usuarios/partials/transacao_item.html', {'transacao': transacao, 'mostrar_saldo': mostrar_saldo})
+        for transacao in itens
+    )
+    return JsonResponse({
+        'success': True,
+        'html': html,
+        'quantidade': len(itens),
+        'proximo_cursor': proximo_cursor,
+    })
+
+@login_required
+def exportar_extrato(request):
+    """Download do extrato em CSV ou OFX para qualquer período (streaming)"""
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return HttpResponse('Formato inválido. Use csv ou ofx.', status=400)
+    
+    # Clientes exportam o próprio extrato; gerentes informam o CPF do cliente
+    try:
+        if request.user.tipo_usuario == 'gerente':
+            cliente = Cliente.objects.get(cpf=request.GET.get('cpf', ''))
+        else:
+            cliente = cliente_da_requisicao(request)
+    except Cliente.DoesNotExist:
+        return HttpResponse('Cliente não encontrado.', status=404)
+    
+    try:
+        hoje = timezone.localdate()
+        inicio = datetime.strptime(request.GET['inicio'], '%Y-%m-%d').date() if request.GET.get('inicio') else hoje - timedelta(days=30)
+        fim = datetime.strptime(request.GET['fim'], '%Y-%m-%d').date() if request.GET.get('fim') else hoje
+    except ValueError:
+        return HttpResponse('Datas inválidas. Use o formato AAAA-MM-DD.', status=400)
+    
+    if inicio > fim:
+        return HttpResponse('A data inicial deve ser anterior à final.', status=400)
+    
+    gerador, content_type = FORMATOS[formato]
+    blocos = gerador(cliente, inicio_do_dia(inicio), inicio_do_dia(fim + timedelta(days=1)))
+    if isinstance(request, ASGIRequest):
+        # Sob ASGI o Django consumiria o gerador síncrono de uma vez, em memória
+        blocos = em_async(blocos)
+    response = StreamingHttpResponse(blocos, content_type=content_type)
+    nome = f"extrato_{cliente.cpf}_{inicio:%Y%m%d}_{fim:%Y%m%d}.{formato}"
+    response['Content-Disposition'] = f'attachment; filename="{nome}"'
+    return response
+
+# ===== SÉRIES PARA GRÁFICOS (JSON) =====
+
+def _eh_cliente(request):
+    return request.user.is_authenticated and request.user.tipo_usuario == 'cliente'
+
+def _etag_periodo(request, *partes):
+    """ETag das séries: período resolvido (o padrão muda a cada dia) mais as partes informadas"""
+    try:
+        periodo = series.periodo_grafico(request.GET)
+        max_pontos = series.max_pontos_grafico(request.GET)
+    except ValueError:
+        return None
+    return '-'.join(str(parte) for parte in (request.user.pk, *periodo, max_pontos, *partes))
+
+def _versao_movimentos(request):
+    """Movimentações do cliente desde o início do período, lidas do banco (vale para todos os processos)"""
+    try:
+        inicio = series.periodo_grafico(request.GET)[0]
+    except ValueError:
+        return None
+    versao = series.versao_movimentos(request.user.pk, inicio)
+    return versao['quantidade'], versao['total']
+
+def _etag_movimento(request):
+    # O resumo diário muda a cada transação gravada para o cliente
+    if not _eh_cliente(request):
+        return None
+    versao = _versao_movimentos(request)
+    return versao and _etag_periodo(request, *versao)
+
+def _etag_saldo(request):
+    # O histórico parte do saldo atual menos as movimentações posteriores ao início
+    if not _eh_cliente(request):
+        return None
+    versao = _versao_movimentos(request)
+    saldo = Cliente.objects.filter(pk=request.user.pk).values_list('saldo', flat=True).first()
+    return versao and _etag_periodo(request, *versao, saldo)
+
+def _ultima_movimentacao(request):
+    if not _eh_cliente(request):
+        return None
+    datas = ultimos_movimentos(request.user.pk, 1).values_list('data_transacao', flat=True)
+    return next(iter(datas), None)
+
+def _etag_compras(request):
+    if not _eh_cliente(request):
+        return None
+    versao = series.versao_compras(request.user.pk)
+    return _etag_periodo(request, versao['quantidade'], versao['ultimo_id'])
+
+def _ultima_compra(request):
+    if not _eh_cliente(request):
+        return None
+    return series.versao_compras(request.user.pk)['ultima_data']
+
+def _resposta_grafico(request, serie):
+    """Executa `serie(cliente, inicio, fim, intervalo, max_pontos)` e devolve o JSON para o galaxy-charts.js"""
+    if request.user.tipo_usuario != 'cliente':
+        return JsonResponse({'success': False, 'message': 'Apenas clientes possuem gráficos de movimentação.'}, status=403)
+    
+    try:
+        cliente = cliente_da_requisicao(request)
+    except Cliente.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Perfil de cliente não encontrado.'}, status=404)
+    
+    try:
+        inicio, fim, intervalo = series.periodo_grafico(request.GET)
+        max_pontos = series.max_pontos_grafico(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    response = JsonResponse({
+        'success': True,
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'intervalo': intervalo,
+        **serie(cliente, inicio, fim, intervalo, max_pontos),
+    })
+    # O navegador guarda a resposta, mas revalida (ETag/Last-Modified) a cada uso
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@login_required
+@condition(etag_func=_etag_saldo, last_modified_func=_ultima_movimentacao)
+def grafico_saldo(request):
+    """Histórico de saldo por dia, semana ou mês"""
+    return _resposta_grafico(request, series.historico_saldo)
+
+@login_required
+@condition(etag_func=_etag_movimento, last_modified_func=_ultima_movimentacao)
+def grafico_entradas_saidas(request):
+    """Entradas e saídas por dia, semana ou mês"""
+    return _resposta_grafico(request, series.entradas_saidas)
+
+@login_required
+@condition(etag_func=_etag_compras, last_modified_func=_ultima_compra)
+def grafico_gastos_categoria(request):
+    """Gastos com compras por categoria de produto no período"""
+    return _resposta_grafico(request, series.gastos_por_categoria)
+
+
+# ===== EVENTOS EM TEMPO REAL (SSE) =====
+
+async def _fluxo_eventos(cliente_id):
+    """Saldo atual e, em seguida, cada evento publicado para o cliente"""
+    assinatura = eventos.assinar(cliente_id)
+    try:
+        # Assina antes de ler o saldo para não perder eventos entre os dois
+        saldo = await Cliente.objects.filter(pk=cliente_id).values_list('saldo', flat=True).afirst()
+        # Conexões ociosas não devem segurar conexões com o banco
+        await sync_to_async(connections.close_all)()
+        async for parte in eventos.fluxo(assinatura, saldo):
+            yield parte
+    finally:
+        eventos.cancelar(assinatura)
+
+@require_GET
+@login_required
+async def eventos_cliente(request):
+    """
+    Server-Sent Events com o saldo e as novas transações do cliente logado.
+
+    Em produção o /eventos/ é atendido por usuarios.rota_eventos, antes do
+    handler do Django (ver galaxybank/asgi.py); esta view cobre o runserver e
+    os testes. Sob WSGI responde 204 e o dashboard nem abre a conexão.
+    """
+    usuario = await request.auser()
+    if usuario.tipo_usuario != 'cliente':
+        return JsonResponse({'success': False, 'message': 'Apenas clientes recebem eventos.'}, status=403)
+    
+    saldo = await Cliente.objects.filter(usuario=usuario).values_list('saldo', flat=True).afirst()
+    if saldo is None:
+        return JsonResponse({'success': False, 'message': 'Perfil de cliente não encontrado.'}, status=404)
+    
+    if not isinstance(request, ASGIRequest):
+        # Sob WSGI um stream infinito prenderia um worker; o 204 faz o
+        # EventSource desistir em vez de reconectar a cada `retry` (polling)
+        return HttpResponse(status=204)
+    
+    response = StreamingHttpResponse(_fluxo_eventos(usuario.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx não deve bufferizar o stream
+    return response